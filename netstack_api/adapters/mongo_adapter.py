@@ -7,14 +7,46 @@ MongoDB 適配器
 import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import motor.motor_asyncio
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# 轉換 UE 資訊時實際讀取的欄位，避免載入金鑰等完整用戶文件
+SUBSCRIBER_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "imsi": 1,
+    "slice.sst": 1,
+    "slice.sd": 1,
+    "slice.session.name": 1,
+    "created": 1,
+}
+
+
+# Slice 識別 (sst, sd)
+SliceKey = Tuple[int, str]
+
+# 用戶 Slice 變化監聽器，接收 (原 Slice, 新 Slice) 列表；
+# 新建用戶的原 Slice 為 None，刪除用戶的新 Slice 為 None
+SliceTransitionListener = Callable[
+    [List[Tuple[Optional[SliceKey], Optional[SliceKey]]]], Awaitable[None]
+]
+
+# 只讀取預設 Slice 識別的投影
+SLICE_KEY_PROJECTION = {"_id": 0, "slice.sst": 1, "slice.sd": 1}
+
+# 啟動時確保存在的索引：集合 -> [(索引鍵, 索引選項)]
+REQUIRED_INDEXES = {
+    "subscribers": [
+        ([("imsi", ASCENDING)], {"unique": True}),
+        ([("slice.sst", ASCENDING), ("slice.sd", ASCENDING)], {}),
+    ],
+}
+
 
 class MongoAdapter:
     """MongoDB 資料庫適配器"""
@@ -29,6 +61,8 @@ class MongoAdapter:
         self.connection_string = connection_string
         self.client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
         self.db: Optional[motor.motor_asyncio.AsyncIOMotorDatabase] = None
+        self.index_state: Dict[str, Any] = {"status": "unknown", "indexes": {}}
+        self.slice_transition_listener: Optional[SliceTransitionListener] = None
 
     async def connect(self) -> None:
         """建立資料庫連接"""
@@ -49,6 +83,91 @@ class MongoAdapter:
             logger.error("MongoDB 連接失敗", error=str(e))
             raise
 
+    @staticmethod
+    def _slice_key(subscriber: Optional[Dict[str, Any]]) -> Optional[SliceKey]:
+        """取得用戶預設 (第一個) Slice 的 (sst, sd)"""
+        if not subscriber or not subscriber.get("slice"):
+            return None
+        default_slice = subscriber["slice"][0]
+        return default_slice.get("sst"), default_slice.get("sd")
+
+    async def _notify_slice_transitions(
+        self, transitions: List[Tuple[Optional[SliceKey], Optional[SliceKey]]]
+    ) -> None:
+        """通知 Slice 變化監聽器，監聽器失敗不影響資料庫操作"""
+        if self.slice_transition_listener is None or not transitions:
+            return
+        try:
+            await self.slice_transition_listener(transitions)
+        except Exception as e:
+            logger.warning(
+                "Slice 變化通知失敗", transitions=len(transitions), error=str(e)
+            )
+
+    @staticmethod
+    def _index_name(keys: List[Tuple[str, int]]) -> str:
+        """取得 MongoDB 預設的索引名稱 (例如 imsi_1)"""
+        return "_".join(f"{field}_{order}" for field, order in keys)
+
+    async def ensure_indexes(self) -> Dict[str, Any]:
+        """
+        建立並驗證 REQUIRED_INDEXES 中定義的索引
+
+        單一索引建立失敗 (例如既有資料中 IMSI 重複) 不會中斷啟動，
+        只會記錄在 index_state 中並反映於健康檢查。
+
+        Returns:
+            各索引的狀態
+        """
+        indexes: Dict[str, Any] = {}
+
+        for collection, index_specs in REQUIRED_INDEXES.items():
+            for keys, options in index_specs:
+                index_name = self._index_name(keys)
+                state_key = f"{collection}.{index_name}"
+                try:
+                    await self.db[collection].create_index(keys, **options)
+                    indexes[state_key] = {"status": "pending", **options}
+                except Exception as e:
+                    logger.error(
+                        "建立索引失敗",
+                        collection=collection,
+                        index=index_name,
+                        error=str(e),
+                    )
+                    indexes[state_key] = {"status": "error", "error": str(e)}
+
+            # 以實際存在的索引驗證結果
+            try:
+                existing = await self.db[collection].index_information()
+            except Exception as e:
+                logger.error("讀取索引資訊失敗", collection=collection, error=str(e))
+                existing = {}
+
+            for keys, options in index_specs:
+                index_name = self._index_name(keys)
+                state = indexes[f"{collection}.{index_name}"]
+                if state["status"] == "error":
+                    continue
+                index_info = existing.get(index_name)
+                if index_info is None or list(index_info["key"]) != keys:
+                    state["status"] = "missing"
+                elif options.get("unique") and not index_info.get("unique"):
+                    state["status"] = "not_unique"
+                else:
+                    state["status"] = "ok"
+
+        overall_status = (
+            "ok"
+            if all(state["status"] == "ok" for state in indexes.values())
+            else "degraded"
+        )
+        self.index_state = {"status": overall_status, "indexes": indexes}
+
+        log = logger.info if overall_status == "ok" else logger.warning
+        log("MongoDB 索引檢查完成", status=overall_status, indexes=len(indexes))
+        return self.index_state
+
     async def disconnect(self) -> None:
         """關閉資料庫連接"""
         if self.client:
@@ -66,6 +185,7 @@ class MongoAdapter:
                 "status": "healthy",
                 "response_time": response_time,
                 "database": "open5gs",
+                "indexes": self.index_state,
             }
         except Exception as e:
             return {"status": "unhealthy", "error": str(e)}
@@ -87,22 +207,93 @@ class MongoAdapter:
             logger.error("取得用戶資訊失敗", imsi=imsi, error=str(e))
             raise
 
-    async def list_subscribers(self) -> List[Dict[str, Any]]:
+    async def get_subscribers(
+        self, imsis: List[str], projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        以一次 $in 查詢取得多個用戶
+
+        Args:
+            imsis: 用戶 IMSI 列表
+            projection: 伺服器端欄位投影，None 表示回傳完整文件
+
+        Returns:
+            IMSI 對應用戶資訊的字典，不存在的 IMSI 不會出現在結果中
         """
-        列出所有用戶
+        try:
+            cursor = self.db.subscribers.find({"imsi": {"$in": imsis}}, projection)
+            subscribers = await cursor.to_list(length=None)
+            return {subscriber["imsi"]: subscriber for subscriber in subscribers}
+        except Exception as e:
+            logger.error("批次取得用戶資訊失敗", count=len(imsis), error=str(e))
+            raise
+
+    async def list_subscribers(
+        self,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        列出用戶
+
+        以 imsi 排序做 keyset 分頁：after 為上一頁最後一筆的 IMSI，
+        只回傳 imsi 大於 after 的用戶。
+
+        Args:
+            limit: 回傳筆數上限，None 表示不限制
+            after: 分頁游標 (上一頁最後一筆的 IMSI)
+            projection: 伺服器端欄位投影，None 表示回傳完整文件
 
         Returns:
             用戶資訊列表
         """
         try:
-            cursor = self.db.subscribers.find({})
+            query = {"imsi": {"$gt": after}} if after else {}
+            cursor = self.db.subscribers.find(query, projection).sort("imsi", 1)
+            if limit is not None:
+                cursor = cursor.limit(limit)
             subscribers = await cursor.to_list(length=None)
             return subscribers
         except Exception as e:
             logger.error("列出用戶失敗", error=str(e))
             raise
 
-    async def update_subscriber_slice(self, imsi: str, sst: int, sd: str) -> bool:
+    async def iter_subscriber_batches(
+        self,
+        batch_size: int = 500,
+        projection: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        以固定批次大小逐批讀取所有用戶
+
+        使用同一個 cursor 依 imsi 順序讀取，記憶體中最多只保留一個批次。
+
+        Args:
+            batch_size: 每批次的文件數量
+            projection: 伺服器端欄位投影，None 表示回傳完整文件
+
+        Yields:
+            用戶資訊批次
+        """
+        try:
+            cursor = (
+                self.db.subscribers.find({}, projection)
+                .sort("imsi", 1)
+                .batch_size(batch_size)
+            )
+            while True:
+                batch = await cursor.to_list(length=batch_size)
+                if not batch:
+                    break
+                yield batch
+        except Exception as e:
+            logger.error("批次讀取用戶失敗", batch_size=batch_size, error=str(e))
+            raise
+
+    async def update_subscriber_slice(
+        self, imsi: str, sst: int, sd: str, apn: Optional[str] = None
+    ) -> bool:
         """
         更新用戶的 Slice 配置
 
@@ -110,25 +301,33 @@ class MongoAdapter:
             imsi: 用戶 IMSI
             sst: Slice/Service Type
             sd: Slice Differentiator
+            apn: 預設會話的接入點名稱，None 表示不變更
 
         Returns:
             更新是否成功
         """
         try:
-            # 更新用戶的 slice 配置
-            result = await self.db.subscribers.update_one(
+            update_fields = {
+                "slice.0.sst": sst,
+                "slice.0.sd": sd,
+                "modified": datetime.utcnow().isoformat(),
+            }
+            if apn is not None:
+                update_fields["slice.0.session.0.name"] = apn
+
+            # 更新用戶的 slice 配置，並取回更新前的 Slice
+            previous = await self.db.subscribers.find_one_and_update(
                 {"imsi": imsi},
-                {
-                    "$set": {
-                        "slice.0.sst": sst,
-                        "slice.0.sd": sd,
-                        "modified": datetime.utcnow().isoformat(),
-                    }
-                },
+                {"$set": update_fields},
+                projection=SLICE_KEY_PROJECTION,
+                return_document=ReturnDocument.BEFORE,
             )
 
-            if result.modified_count > 0:
+            if previous is not None:
                 logger.info("用戶 Slice 更新成功", imsi=imsi, sst=sst, sd=sd)
+                await self._notify_slice_transitions(
+                    [(self._slice_key(previous), (sst, sd))]
+                )
                 return True
             else:
                 logger.warning("用戶 Slice 更新失敗 - 找不到用戶", imsi=imsi)
@@ -138,6 +337,74 @@ class MongoAdapter:
             logger.error("更新用戶 Slice 失敗", imsi=imsi, sst=sst, sd=sd, error=str(e))
             raise
 
+    async def bulk_update_subscriber_slices(
+        self,
+        imsis: List[str],
+        sst: int,
+        sd: str,
+        previous_slices: Optional[Dict[str, Optional[SliceKey]]] = None,
+        apn: Optional[str] = None,
+    ) -> int:
+        """
+        以一次 bulk_write 更新多個用戶的 Slice 配置
+
+        寫入的欄位與 update_subscriber_slice 相同。
+
+        Args:
+            imsis: 用戶 IMSI 列表
+            sst: Slice/Service Type
+            sd: Slice Differentiator
+            previous_slices: 呼叫端已知的更新前 Slice，用於通知 Slice 變化監聽器
+            apn: 預設會話的接入點名稱，None 表示不變更
+
+        Returns:
+            符合條件並被更新的用戶數量
+        """
+        if not imsis:
+            return 0
+
+        try:
+            update_fields = {
+                "slice.0.sst": sst,
+                "slice.0.sd": sd,
+                "modified": datetime.utcnow().isoformat(),
+            }
+            if apn is not None:
+                update_fields["slice.0.session.0.name"] = apn
+
+            operations = [
+                UpdateOne({"imsi": imsi}, {"$set": update_fields}) for imsi in imsis
+            ]
+            result = await self.db.subscribers.bulk_write(operations, ordered=False)
+
+            if previous_slices:
+                await self._notify_slice_transitions(
+                    [
+                        (previous_slices[imsi], (sst, sd))
+                        for imsi in imsis
+                        if imsi in previous_slices
+                    ]
+                )
+
+            logger.info(
+                "批次更新用戶 Slice 完成",
+                count=len(imsis),
+                matched=result.matched_count,
+                sst=sst,
+                sd=sd,
+            )
+            return result.matched_count
+
+        except Exception as e:
+            logger.error(
+                "批次更新用戶 Slice 失敗",
+                count=len(imsis),
+                sst=sst,
+                sd=sd,
+                error=str(e),
+            )
+            raise
+
     async def get_session_info(self, imsi: str) -> Optional[Dict[str, Any]]:
         """
         取得用戶會話資訊
@@ -156,6 +423,80 @@ class MongoAdapter:
             logger.error("取得會話資訊失敗", imsi=imsi, error=str(e))
             raise
 
+    @staticmethod
+    def _build_subscriber_document(
+        imsi: str,
+        key: str,
+        opc: str,
+        apn: str = "internet",
+        sst: int = 1,
+        sd: str = "0x111111",
+    ) -> Dict[str, Any]:
+        """
+        建立 Open5GS 用戶文件
+
+        Args:
+            imsi: 用戶 IMSI
+            key: K 金鑰
+            opc: OPc 值
+            apn: 接入點名稱
+            sst: Slice/Service Type
+            sd: Slice Differentiator
+
+        Returns:
+            用戶文件
+        """
+        return {
+            "imsi": imsi,
+            "msisdn": [],
+            "imeisv": [],
+            "mme_host": [],
+            "mme_realm": [],
+            "purge_flag": [],
+            "security": {
+                "k": key,
+                "amf": "8000",
+                "op": None,
+                "opc": opc,
+                "sqn": 64,
+            },
+            "ambr": {
+                "downlink": {"value": 1, "unit": 3},
+                "uplink": {"value": 1, "unit": 3},
+            },
+            "slice": [
+                {
+                    "sst": sst,
+                    "sd": sd,
+                    "default_indicator": True,
+                    "session": [
+                        {
+                            "name": apn,
+                            "type": 3,  # IPv4
+                            "ambr": {
+                                "downlink": {"value": 1, "unit": 3},
+                                "uplink": {"value": 1, "unit": 3},
+                            },
+                            "qos": {
+                                "index": 9,
+                                "arp": {
+                                    "priority_level": 8,
+                                    "pre_emption_capability": 1,
+                                    "pre_emption_vulnerability": 1,
+                                },
+                            },
+                        }
+                    ],
+                }
+            ],
+            "access_restriction_data": 32,
+            "subscriber_status": 0,
+            "network_access_mode": 0,
+            "subscribed_rau_tau_timer": 12,
+            "__v": 0,
+            "created": datetime.utcnow().isoformat(),
+        }
+
     async def create_subscriber(
         self,
         imsi: str,
@@ -180,61 +521,15 @@ class MongoAdapter:
             建立是否成功
         """
         try:
-            subscriber_doc = {
-                "imsi": imsi,
-                "msisdn": [],
-                "imeisv": [],
-                "mme_host": [],
-                "mme_realm": [],
-                "purge_flag": [],
-                "security": {
-                    "k": key,
-                    "amf": "8000",
-                    "op": None,
-                    "opc": opc,
-                    "sqn": 64,
-                },
-                "ambr": {
-                    "downlink": {"value": 1, "unit": 3},
-                    "uplink": {"value": 1, "unit": 3},
-                },
-                "slice": [
-                    {
-                        "sst": sst,
-                        "sd": sd,
-                        "default_indicator": True,
-                        "session": [
-                            {
-                                "name": apn,
-                                "type": 3,  # IPv4
-                                "ambr": {
-                                    "downlink": {"value": 1, "unit": 3},
-                                    "uplink": {"value": 1, "unit": 3},
-                                },
-                                "qos": {
-                                    "index": 9,
-                                    "arp": {
-                                        "priority_level": 8,
-                                        "pre_emption_capability": 1,
-                                        "pre_emption_vulnerability": 1,
-                                    },
-                                },
-                            }
-                        ],
-                    }
-                ],
-                "access_restriction_data": 32,
-                "subscriber_status": 0,
-                "network_access_mode": 0,
-                "subscribed_rau_tau_timer": 12,
-                "__v": 0,
-                "created": datetime.utcnow().isoformat(),
-            }
+            subscriber_doc = self._build_subscriber_document(
+                imsi=imsi, key=key, opc=opc, apn=apn, sst=sst, sd=sd
+            )
 
             result = await self.db.subscribers.insert_one(subscriber_doc)
 
             if result.inserted_id:
                 logger.info("用戶建立成功", imsi=imsi)
+                await self._notify_slice_transitions([(None, (sst, sd))])
                 return True
             else:
                 logger.error("用戶建立失敗", imsi=imsi)
@@ -244,6 +539,85 @@ class MongoAdapter:
             logger.error("建立用戶失敗", imsi=imsi, error=str(e))
             raise
 
+    async def bulk_create_subscribers(
+        self, subscribers: List[Dict[str, Any]], chunk_size: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        批次建立用戶
+
+        依 chunk_size 分段，每段先以一次 $in 查詢排除已存在的 IMSI，
+        再以無序 insert_many 寫入，單筆失敗不影響同段其他用戶。
+
+        Args:
+            subscribers: 用戶參數列表，每筆包含 imsi、key、opc、apn、sst、sd
+            chunk_size: 每段寫入的文件數量
+
+        Returns:
+            與輸入順序相同的逐筆結果列表
+        """
+        results: List[Dict[str, Any]] = []
+
+        for start in range(0, len(subscribers), chunk_size):
+            chunk = subscribers[start : start + chunk_size]
+            chunk_results = [{"imsi": item["imsi"], "success": True} for item in chunk]
+
+            try:
+                existing_cursor = self.db.subscribers.find(
+                    {"imsi": {"$in": [item["imsi"] for item in chunk]}},
+                    {"_id": 0, "imsi": 1},
+                )
+                existing_imsis = {
+                    doc["imsi"] for doc in await existing_cursor.to_list(length=None)
+                }
+
+                pending = []
+                for index, item in enumerate(chunk):
+                    if item["imsi"] in existing_imsis:
+                        chunk_results[index].update(success=False, error="用戶已存在")
+                    else:
+                        pending.append((index, self._build_subscriber_document(**item)))
+
+                if pending:
+                    try:
+                        await self.db.subscribers.insert_many(
+                            [doc for _, doc in pending], ordered=False
+                        )
+                    except BulkWriteError as e:
+                        for write_error in e.details.get("writeErrors", []):
+                            index = pending[write_error["index"]][0]
+                            error = (
+                                "用戶已存在"
+                                if write_error.get("code") == 11000
+                                else write_error.get("errmsg", "寫入失敗")
+                            )
+                            chunk_results[index].update(success=False, error=error)
+
+            except Exception as e:
+                logger.error(
+                    "批次建立用戶失敗", offset=start, count=len(chunk), error=str(e)
+                )
+                for result in chunk_results:
+                    if result["success"]:
+                        result.update(success=False, error=str(e))
+
+            await self._notify_slice_transitions(
+                [
+                    (None, (item.get("sst", 1), item.get("sd", "0x111111")))
+                    for item, result in zip(chunk, chunk_results)
+                    if result["success"]
+                ]
+            )
+            results.extend(chunk_results)
+
+        created = sum(1 for result in results if result["success"])
+        logger.info(
+            "批次建立用戶完成",
+            total=len(results),
+            created=created,
+            chunk_size=chunk_size,
+        )
+        return results
+
     async def delete_subscriber(self, imsi: str) -> bool:
         """
         刪除用戶
@@ -255,10 +629,13 @@ class MongoAdapter:
             刪除是否成功
         """
         try:
-            result = await self.db.subscribers.delete_one({"imsi": imsi})
+            deleted = await self.db.subscribers.find_one_and_delete(
+                {"imsi": imsi}, projection=SLICE_KEY_PROJECTION
+            )
 
-            if result.deleted_count > 0:
+            if deleted is not None:
                 logger.info("用戶刪除成功", imsi=imsi)
+                await self._notify_slice_transitions([(self._slice_key(deleted), None)])
                 return True
             else:
                 logger.warning("用戶刪除失敗 - 找不到用戶", imsi=imsi)
@@ -268,6 +645,38 @@ class MongoAdapter:
             logger.error("刪除用戶失敗", imsi=imsi, error=str(e))
             raise
 
+    async def count_subscribers_by_slice(self) -> Dict[SliceKey, int]:
+        """
+        依預設 (第一個) Slice 統計用戶數量
+
+        需掃描整個集合，僅供定期校正計數器使用。
+
+        Returns:
+            (sst, sd) 對應用戶數量的字典
+        """
+        try:
+            pipeline = [
+                {"$project": {"default_slice": {"$arrayElemAt": ["$slice", 0]}}},
+                {
+                    "$group": {
+                        "_id": {
+                            "sst": "$default_slice.sst",
+                            "sd": "$default_slice.sd",
+                        },
+                        "count": {"$sum": 1},
+                    }
+                },
+            ]
+            cursor = self.db.subscribers.aggregate(pipeline)
+            groups = await cursor.to_list(length=None)
+            return {
+                (group["_id"].get("sst"), group["_id"].get("sd")): group["count"]
+                for group in groups
+            }
+        except Exception as e:
+            logger.error("依 Slice 統計用戶失敗", error=str(e))
+            raise
+
     async def find_one(
         self, collection: str, query: Dict[str, Any]
     ) -> Optional[Dict[str, Any]]:
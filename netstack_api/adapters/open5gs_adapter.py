@@ -6,25 +6,59 @@ Open5GS 適配器
 
 import asyncio
 import subprocess
-from typing import Dict, List, Optional, Any
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import httpx
 import structlog
 
+from .mongo_adapter import MongoAdapter
+
 logger = structlog.get_logger(__name__)
 
+# 各 NF 的預設請求逾時 (秒)
+DEFAULT_NF_TIMEOUTS = {
+    "amf": 5.0,
+    "smf": 5.0,
+    "nrf": 5.0,
+    "nssf": 10.0,
+    "upf": 5.0,
+}
+
 
 class Open5GSAdapter:
     """Open5GS 核心網適配器"""
 
-    def __init__(self, mongo_host: str = "mongo"):
+    def __init__(
+        self,
+        mongo_host: str = "mongo",
+        mongo_adapter: Optional[MongoAdapter] = None,
+        dbctl_fallback: bool = False,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 2.0,
+        nf_timeouts: Optional[Dict[str, float]] = None,
+        health_check_deadline: float = 3.0,
+    ):
         """
         初始化 Open5GS 適配器
 
         Args:
             mongo_host: MongoDB 主機名稱
+            mongo_adapter: 用於直接佈建用戶的 MongoDB 適配器，
+                None 表示所有佈建操作都透過 open5gs-dbctl 執行
+            dbctl_fallback: MongoDB 直接佈建失敗時是否改用 open5gs-dbctl
+            max_connections: HTTP 連線池最大連線數
+            max_keepalive_connections: 保持 keep-alive 的最大閒置連線數
+            keepalive_expiry: 閒置連線保留時間 (秒)
+            connect_timeout: 建立 TCP 連線的逾時 (秒)
+            nf_timeouts: 各 NF 的請求逾時 (秒)，未指定者使用預設值
+            health_check_deadline: 健康檢查整體期限 (秒)
         """
         self.mongo_host = mongo_host
+        self.mongo_adapter = mongo_adapter
+        self.dbctl_fallback = dbctl_fallback
         self.services = {
             "amf": "http://netstack-amf:7777",
             "smf": "http://netstack-smf:7777",
@@ -32,24 +66,86 @@ class Open5GSAdapter:
             "nssf": "http://netstack-nssf:7777",
             "upf": "http://netstack-upf:8080",
         }
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.nf_timeouts = {**DEFAULT_NF_TIMEOUTS, **(nf_timeouts or {})}
+        self.health_check_deadline = health_check_deadline
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def connect(self) -> None:
+        """建立共用的 HTTP 連線池"""
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=httpx.Timeout(5.0, connect=self.connect_timeout),
+            )
+            logger.info(
+                "Open5GS HTTP 連線池已建立",
+                max_connections=self.limits.max_connections,
+                max_keepalive_connections=self.limits.max_keepalive_connections,
+            )
 
-    async def health_check(self) -> Dict[str, Any]:
-        """檢查 Open5GS 服務健康狀態"""
-        service_status = {}
-        healthy_count = 0
-
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            for service_name, service_url in self.services.items():
-                try:
-                    response = await client.get(f"{service_url}/health")
-                    if response.status_code == 200:
-                        service_status[service_name] = "healthy"
-                        healthy_count += 1
-                    else:
-                        service_status[service_name] = "unhealthy"
-                except Exception as e:
-                    service_status[service_name] = f"error: {str(e)}"
+    async def disconnect(self) -> None:
+        """關閉共用的 HTTP 連線池"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            logger.info("Open5GS HTTP 連線池已關閉")
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """取得共用 HTTP client，尚未建立時自動建立"""
+        if self.client is None:
+            await self.connect()
+        return self.client
+
+    def _timeout(self, service_name: str) -> httpx.Timeout:
+        """取得指定 NF 的請求逾時設定"""
+        return httpx.Timeout(
+            self.nf_timeouts.get(service_name, 5.0), connect=self.connect_timeout
+        )
+
+    async def health_check(self, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        並行檢查 Open5GS 服務健康狀態
+
+        所有 NF 同時探測，每個 NF 受自身逾時限制，整體則受 deadline 限制；
+        期限內未回應的 NF 標記為 timeout。
+
+        Args:
+            deadline: 整體期限 (秒)，None 表示使用 health_check_deadline
+
+        Returns:
+            各 NF 的狀態與延遲
+        """
+        deadline = self.health_check_deadline if deadline is None else deadline
+        start_time = time.perf_counter()
+
+        probes = {
+            service_name: asyncio.create_task(
+                self._probe_service(service_name, service_url)
+            )
+            for service_name, service_url in self.services.items()
+        }
+        await asyncio.wait(probes.values(), timeout=deadline)
 
+        service_status = {}
+        for service_name, probe in probes.items():
+            if probe.done():
+                service_status[service_name] = probe.result()
+            else:
+                probe.cancel()
+                service_status[service_name] = {
+                    "status": "timeout",
+                    "latency_ms": deadline * 1000,
+                }
+
+        healthy_count = sum(
+            1 for result in service_status.values() if result["status"] == "healthy"
+        )
         overall_status = (
             "healthy" if healthy_count == len(self.services) else "degraded"
         )
@@ -59,19 +155,43 @@ class Open5GSAdapter:
             "services": service_status,
             "services_count": len(self.services),
             "healthy_count": healthy_count,
+            "response_time": time.perf_counter() - start_time,
         }
 
+    async def _probe_service(
+        self, service_name: str, service_url: str
+    ) -> Dict[str, Any]:
+        """探測單一 NF 的 /health 並記錄延遲"""
+        start_time = time.perf_counter()
+        try:
+            client = await self._get_client()
+            response = await client.get(
+                f"{service_url}/health", timeout=self._timeout(service_name)
+            )
+            status = "healthy" if response.status_code == 200 else "unhealthy"
+            return {
+                "status": status,
+                "latency_ms": (time.perf_counter() - start_time) * 1000,
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "error": str(e),
+                "latency_ms": (time.perf_counter() - start_time) * 1000,
+            }
+
     async def get_amf_status(self) -> Dict[str, Any]:
         """取得 AMF 狀態"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"{self.services['amf']}/namf-comm/v1/status"
-                )
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {"error": f"AMF 回應錯誤: {response.status_code}"}
+            client = await self._get_client()
+            response = await client.get(
+                f"{self.services['amf']}/namf-comm/v1/status",
+                timeout=self._timeout("amf"),
+            )
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"AMF 回應錯誤: {response.status_code}"}
         except Exception as e:
             logger.error("取得 AMF 狀態失敗", error=str(e))
             return {"error": str(e)}
@@ -79,14 +199,15 @@ class Open5GSAdapter:
     async def get_smf_sessions(self) -> List[Dict[str, Any]]:
         """取得 SMF 會話列表"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    f"{self.services['smf']}/nsmf-pdusession/v1/sessions"
-                )
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return []
+            client = await self._get_client()
+            response = await client.get(
+                f"{self.services['smf']}/nsmf-pdusession/v1/sessions",
+                timeout=self._timeout("smf"),
+            )
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return []
         except Exception as e:
             logger.error("取得 SMF 會話失敗", error=str(e))
             return []
@@ -116,30 +237,31 @@ class Open5GSAdapter:
                 "tai": {"plmnId": {"mcc": "999", "mnc": "70"}, "tac": "1"},
             }
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    f"{self.services['nssf']}/nnssf-nsselection/v1/network-slice-information",
-                    json=slice_selection_request,
-                    headers={"Content-Type": "application/json"},
-                )
+            client = await self._get_client()
+            response = await client.post(
+                f"{self.services['nssf']}/nnssf-nsselection/v1/network-slice-information",
+                json=slice_selection_request,
+                headers={"Content-Type": "application/json"},
+                timeout=self._timeout("nssf"),
+            )
 
-                if response.status_code in [200, 201]:
-                    result = response.json()
-                    logger.info(
-                        "NSSF Slice 選擇成功", imsi=imsi, sst=sst, sd=sd, result=result
-                    )
-                    return {"success": True, "result": result}
-                else:
-                    logger.error(
-                        "NSSF Slice 選擇失敗",
-                        imsi=imsi,
-                        status_code=response.status_code,
-                        response=response.text,
-                    )
-                    return {
-                        "success": False,
-                        "error": f"NSSF 回應錯誤: {response.status_code}",
-                    }
+            if response.status_code in [200, 201]:
+                result = response.json()
+                logger.info(
+                    "NSSF Slice 選擇成功", imsi=imsi, sst=sst, sd=sd, result=result
+                )
+                return {"success": True, "result": result}
+            else:
+                logger.error(
+                    "NSSF Slice 選擇失敗",
+                    imsi=imsi,
+                    status_code=response.status_code,
+                    response=response.text,
+                )
+                return {
+                    "success": False,
+                    "error": f"NSSF 回應錯誤: {response.status_code}",
+                }
 
         except Exception as e:
             logger.error(
@@ -210,11 +332,44 @@ class Open5GSAdapter:
             logger.warning("執行 open5gs-dbctl 命令失敗", command=command, error=str(e))
             return {"success": False, "error": str(e), "command": command}
 
+    async def _provision(
+        self,
+        command: str,
+        native_operation: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        執行用戶佈建操作
+
+        有 MongoDB 適配器時直接寫入 MongoDB；僅在未設定適配器，
+        或直接寫入失敗且啟用 dbctl_fallback 時才改用 open5gs-dbctl。
+
+        Args:
+            command: 對應的 open5gs-dbctl 命令
+            native_operation: 透過 MongoDB 適配器執行的操作
+
+        Returns:
+            佈建結果
+        """
+        if self.mongo_adapter is not None:
+            try:
+                result = await native_operation()
+            except Exception as e:
+                logger.warning("MongoDB 直接佈建失敗", command=command, error=str(e))
+                result = {"success": False, "error": str(e)}
+
+            result = {**result, "command": command, "engine": "mongo"}
+            if result["success"] or not self.dbctl_fallback:
+                return result
+
+            logger.info("改用 open5gs-dbctl 執行佈建", command=command)
+
+        return {**await self.execute_dbctl_command(command), "engine": "dbctl"}
+
     async def add_subscriber_with_slice(
         self, imsi: str, key: str, opc: str, apn: str, sst: int, sd: str
     ) -> Dict[str, Any]:
         """
-        使用 dbctl 新增帶有 Slice 的用戶
+        新增帶有 Slice 的用戶
 
         Args:
             imsi: UE IMSI
@@ -227,8 +382,15 @@ class Open5GSAdapter:
         Returns:
             新增結果
         """
+
+        async def native_operation() -> Dict[str, Any]:
+            created = await self.mongo_adapter.create_subscriber(
+                imsi=imsi, key=key, opc=opc, apn=apn, sst=sst, sd=sd
+            )
+            return {"success": created}
+
         command = f"add_ue_with_slice {imsi} {key} {opc} {apn} {sst} {sd}"
-        return await self.execute_dbctl_command(command)
+        return await self._provision(command, native_operation)
 
     async def update_subscriber_slice(
         self, imsi: str, apn: str, sst: int, sd: str
@@ -245,8 +407,17 @@ class Open5GSAdapter:
         Returns:
             更新結果
         """
+
+        async def native_operation() -> Dict[str, Any]:
+            updated = await self.mongo_adapter.update_subscriber_slice(
+                imsi=imsi, sst=sst, sd=sd, apn=apn
+            )
+            if updated:
+                return {"success": True}
+            return {"success": False, "error": f"找不到用戶 {imsi}"}
+
         command = f"update_slice {imsi} {apn} {sst} {sd}"
-        return await self.execute_dbctl_command(command)
+        return await self._provision(command, native_operation)
 
     async def remove_subscriber(self, imsi: str) -> Dict[str, Any]:
         """
@@ -258,8 +429,15 @@ class Open5GSAdapter:
         Returns:
             移除結果
         """
+
+        async def native_operation() -> Dict[str, Any]:
+            deleted = await self.mongo_adapter.delete_subscriber(imsi)
+            if deleted:
+                return {"success": True}
+            return {"success": False, "error": f"找不到用戶 {imsi}"}
+
         command = f"remove {imsi}"
-        return await self.execute_dbctl_command(command)
+        return await self._provision(command, native_operation)
 
     async def show_all_subscribers(self) -> Dict[str, Any]:
         """
@@ -268,35 +446,48 @@ class Open5GSAdapter:
         Returns:
             用戶列表
         """
+
+        async def native_operation() -> Dict[str, Any]:
+            subscribers = await self.mongo_adapter.list_subscribers(
+                projection={"_id": 0, "security": 0}
+            )
+            return {
+                "success": True,
+                "subscribers": subscribers,
+                "count": len(subscribers),
+            }
+
         command = "showall"
-        return await self.execute_dbctl_command(command)
+        return await self._provision(command, native_operation)
 
     async def get_upf_metrics(self) -> Dict[str, Any]:
         """取得 UPF 指標"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.services['upf']}/metrics")
-                if response.status_code == 200:
-                    # 解析 Prometheus 格式的指標
-                    metrics_text = response.text
-                    metrics = {}
-
-                    for line in metrics_text.split("\n"):
-                        if line.startswith("#") or not line.strip():
-                            continue
-                        if " " in line:
-                            metric_name, metric_value = line.split(" ", 1)
-                            try:
-                                metrics[metric_name] = float(metric_value)
-                            except ValueError:
-                                metrics[metric_name] = metric_value
-
-                    return {"success": True, "metrics": metrics}
-                else:
-                    return {
-                        "success": False,
-                        "error": f"UPF 指標取得失敗: {response.status_code}",
-                    }
+            client = await self._get_client()
+            response = await client.get(
+                f"{self.services['upf']}/metrics", timeout=self._timeout("upf")
+            )
+            if response.status_code == 200:
+                # 解析 Prometheus 格式的指標
+                metrics_text = response.text
+                metrics = {}
+
+                for line in metrics_text.split("\n"):
+                    if line.startswith("#") or not line.strip():
+                        continue
+                    if " " in line:
+                        metric_name, metric_value = line.split(" ", 1)
+                        try:
+                            metrics[metric_name] = float(metric_value)
+                        except ValueError:
+                            metrics[metric_name] = metric_value
+
+                return {"success": True, "metrics": metrics}
+            else:
+                return {
+                    "success": False,
+                    "error": f"UPF 指標取得失敗: {response.status_code}",
+                }
         except Exception as e:
             logger.error("取得 UPF 指標失敗", error=str(e))
             return {"success": False, "error": str(e)}
@@ -355,14 +546,14 @@ class Open5GSAdapter:
         """
         try:
             # 使用 MongoDB 直接更新用戶的 Slice 配置
-            command = f"update_slice {imsi} internet {sst} {sd}"
-            result = await self.execute_dbctl_command(command)
+            result = await self.update_subscriber_slice(imsi, "internet", sst, sd)
 
             logger.info(
                 "UE Slice 配置更新完成",
                 imsi=imsi,
                 sst=sst,
                 sd=sd,
+                engine=result.get("engine"),
                 success=result.get("success", False),
             )
 
@@ -5,28 +5,154 @@ Redis 適配器
 """
 
 import json
+import math
+import uuid
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
 import redis.asyncio as redis
+from redis.exceptions import WatchError
 import structlog
 
+from ..utils.cache import LocalTTLCache
+from .redis_serializers import decode_payload, get_serializer
+
 logger = structlog.get_logger(__name__)
 
+# RTT 分位數草圖：每分鐘一個視窗，保留 1 小時
+RTT_SKETCH_WINDOW_SECONDS = 60
+RTT_SKETCH_RETENTION_SECONDS = 3600
+RTT_QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99, "p999": 0.999}
+
+# 時間序列解析度：桶寬、每個 hash 涵蓋的區塊長度與保留時間 (秒)
+TIMESERIES_RESOLUTIONS = {
+    "1s": {"step": 1, "block": 60, "retention": 3600},
+    "1m": {"step": 60, "block": 3600, "retention": 86400},
+    "1h": {"step": 3600, "block": 86400, "retention": 30 * 86400},
+}
+TIMESERIES_MAX_POINTS = 1440
+TRAFFIC_TIMESERIES_FIELDS = ("bytes_uploaded", "bytes_downloaded")
+
+# 跨實例的 UE 資訊快取失效通知頻道
+UE_INFO_INVALIDATION_CHANNEL = "ue:info:invalidate"
+# UE 資訊版本號的存活時間 (秒)，需長於 UE 資訊快取本身
+UE_INFO_VERSION_TTL = 3600
+
+
+class RTTSketch:
+    """
+    對數分桶的可合併分位數草圖 (DDSketch 風格)
+    
+    數值 x 落入索引 ceil(log_gamma(x)) 的桶，以桶中點估計分位數，
+    相對誤差不超過 relative_accuracy。各桶只是計數，因此不同時間視窗
+    或不同實例的草圖可直接相加合併，Redis 中以 HINCRBY 累加即可。
+    """
+    
+    ZERO_BUCKET = "z"
+    COUNT_FIELD = "count"
+    SUM_FIELD = "sum"
+    
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[str, int] = {}
+        self.count = 0
+        self.total = 0.0
+        
+    def bucket_of(self, value: float) -> str:
+        """取得數值所屬的桶欄位名稱"""
+        if value <= 1e-9:
+            return self.ZERO_BUCKET
+        return str(math.ceil(math.log(value) / self._log_gamma))
+        
+    def bucket_value(self, bucket: str) -> float:
+        """桶的代表值 (相對誤差最小的中點)"""
+        if bucket == self.ZERO_BUCKET:
+            return 0.0
+        return 2 * self.gamma ** int(bucket) / (self.gamma + 1)
+        
+    def merge_fields(self, fields: Dict[str, Any]) -> None:
+        """合併一個以 Redis hash 儲存的草圖"""
+        for field, value in fields.items():
+            if field == self.COUNT_FIELD:
+                self.count += int(value)
+            elif field == self.SUM_FIELD:
+                self.total += float(value)
+            else:
+                self.buckets[field] = self.buckets.get(field, 0) + int(value)
+                
+    def quantile(self, q: float) -> float:
+        """估計第 q 分位數"""
+        if not self.buckets:
+            return 0.0
+            
+        ordered = sorted(
+            self.buckets.items(),
+            key=lambda item: (
+                -math.inf if item[0] == self.ZERO_BUCKET else int(item[0])
+            )
+        )
+        rank = q * (sum(count for _, count in ordered) - 1)
+        seen = 0
+        for bucket, count in ordered:
+            seen += count
+            if seen > rank:
+                return self.bucket_value(bucket)
+        return self.bucket_value(ordered[-1][0])
+        
+    def summary(self) -> Dict[str, float]:
+        """輸出平均值、極值與分位數"""
+        if not self.count:
+            return {
+                "avg": 0.0, "min": 0.0, "max": 0.0, "count": 0,
+                **{name: 0.0 for name in RTT_QUANTILES}
+            }
+            
+        return {
+            "avg": self.total / self.count,
+            "min": self.quantile(0.0),
+            "max": self.quantile(1.0),
+            "count": self.count,
+            **{name: self.quantile(q) for name, q in RTT_QUANTILES.items()}
+        }
+
 
 class RedisAdapter:
     """Redis 快取適配器"""
     
-    def __init__(self, connection_string: str):
+    def __init__(
+        self,
+        connection_string: str,
+        ue_info_l1_max_entries: int = 10000,
+        ue_info_l1_ttl: float = 5.0,
+        payload_format: str = "json"
+    ):
         """
         初始化 Redis 適配器
         
         Args:
             connection_string: Redis 連接字串
+            ue_info_l1_max_entries: 行程內 UE 資訊快取的項目上限，0 表示停用
+            ue_info_l1_ttl: 行程內 UE 資訊快取的存活時間 (秒)，用於限制
+                遺漏失效通知時的最長不一致時間
+            payload_format: 寫入 UE 資訊與切換歷史時使用的序列化格式
+                (json 或 msgpack)；json 不加標籤以相容舊版實例，讀取時自動判斷格式
         """
         self.connection_string = connection_string
         self.client: Optional[redis.Redis] = None
+        # 序列化內容以位元組存取，使用不解碼回應的連線
+        self.binary_client: Optional[redis.Redis] = None
+        self.serializer = get_serializer(payload_format)
+        self.ue_info_l1: Optional[LocalTTLCache] = (
+            LocalTTLCache(ue_info_l1_max_entries, ue_info_l1_ttl)
+            if ue_info_l1_max_entries > 0 else None
+        )
+        self._invalidation_task: Optional[asyncio.Task] = None
+        # L1 每次寫入或清除時遞增，讀取 Redis 期間若有變動便不回填
+        self._ue_info_l1_generation = 0
+        # 失效通知附帶的實例識別碼，用於略過本實例自己發布的通知
+        self.instance_id = uuid.uuid4().hex
         
     async def connect(self) -> None:
         """建立 Redis 連接"""
@@ -37,6 +163,12 @@ class RedisAdapter:
                 socket_connect_timeout=5,
                 socket_timeout=5
             )
+            self.binary_client = redis.from_url(
+                self.connection_string,
+                decode_responses=False,
+                socket_connect_timeout=5,
+                socket_timeout=5
+            )
             
             # 測試連接
             await self.client.ping()
@@ -51,6 +183,8 @@ class RedisAdapter:
         """關閉 Redis 連接"""
         if self.client:
             await self.client.close()
+            if self.binary_client:
+                await self.binary_client.close()
             logger.info("Redis 連接已關閉")
             
     async def health_check(self) -> Dict[str, Any]:
@@ -75,6 +209,17 @@ class RedisAdapter:
                 "error": str(e)
             }
             
+    @staticmethod
+    def _ue_info_version_key(imsi: str) -> str:
+        """取得 UE 資訊版本號鍵值"""
+        return f"ue:info:ver:{imsi}"
+        
+    def _queue_ue_info_version_bump(self, pipe: Any, imsi: str) -> None:
+        """將 UE 資訊版本號遞增指令加入 pipeline"""
+        version_key = self._ue_info_version_key(imsi)
+        pipe.incr(version_key)
+        pipe.expire(version_key, UE_INFO_VERSION_TTL)
+        
     async def cache_ue_info(
         self, 
         imsi: str, 
@@ -84,43 +229,360 @@ class RedisAdapter:
         """
         快取 UE 資訊
         
+        同時寫入行程內快取 (L1) 與 Redis (L2)。
+        
         Args:
             imsi: UE IMSI
             ue_info: UE 資訊
             ttl: 快取存活時間 (秒)
         """
+        payload = self.serializer.encode(ue_info)
+        self._store_local_ue_infos({imsi: payload}, self._ue_info_l1_generation)
+            
         try:
             key = f"ue:info:{imsi}"
-            await self.client.setex(
-                key,
-                ttl,
-                json.dumps(ue_info, default=str)
-            )
+            await self.binary_client.setex(key, ttl, payload)
             logger.debug("UE 資訊已快取", imsi=imsi, ttl=ttl)
         except Exception as e:
             logger.error("快取 UE 資訊失敗", imsi=imsi, error=str(e))
             
+    async def get_ue_info_version(self, imsi: str) -> Optional[str]:
+        """
+        取得 UE 資訊目前的版本號
+        
+        冷路徑載入前先讀取版本號，寫回快取時再以
+        cache_ue_info_if_unchanged 確認期間沒有新的寫入或失效。
+        
+        Args:
+            imsi: UE IMSI
+            
+        Returns:
+            版本號，尚未有任何寫入時為 None
+        """
+        try:
+            return await self.client.get(self._ue_info_version_key(imsi))
+        except Exception as e:
+            logger.error("取得 UE 資訊版本失敗", imsi=imsi, error=str(e))
+            return None
+            
+    async def cache_ue_info_if_unchanged(
+        self,
+        imsi: str,
+        ue_info: Dict[str, Any],
+        version: Optional[str],
+        ttl: int = 300
+    ) -> bool:
+        """
+        僅在版本號未變時快取 UE 資訊
+        
+        以 WATCH 監看版本號，若載入期間有 write-through 或失效發生，
+        交易會放棄寫入，避免較舊的資料覆蓋較新的快取。
+        
+        Args:
+            imsi: UE IMSI
+            ue_info: UE 資訊
+            version: 載入前讀取的版本號
+            ttl: 快取存活時間 (秒)
+            
+        Returns:
+            是否已寫入快取
+        """
+        version_key = self._ue_info_version_key(imsi)
+        payload = self.serializer.encode(ue_info)
+        generation = self._ue_info_l1_generation
+        try:
+            async with self.binary_client.pipeline(transaction=True) as pipe:
+                await pipe.watch(version_key)
+                current = await pipe.get(version_key)
+                if (current.decode() if current is not None else None) != version:
+                    logger.debug("UE 資訊版本已變更，略過快取", imsi=imsi)
+                    return False
+                    
+                pipe.multi()
+                pipe.setex(f"ue:info:{imsi}", ttl, payload)
+                await pipe.execute()
+        except WatchError:
+            logger.debug("UE 資訊版本已變更，略過快取", imsi=imsi)
+            return False
+        except Exception as e:
+            logger.error("快取 UE 資訊失敗", imsi=imsi, error=str(e))
+            return False
+            
+        self._store_local_ue_infos({imsi: payload}, generation)
+        logger.debug("UE 資訊已快取", imsi=imsi, ttl=ttl, version=version)
+        return True
+        
+    async def update_cached_ue_info(
+        self,
+        imsi: str,
+        changes: Dict[str, Any],
+        ttl: int = 300
+    ) -> bool:
+        """
+        以樂觀鎖更新 Redis 中已快取的 UE 資訊欄位
+        
+        WATCH 版本號與快取鍵後讀取 Redis 中的現值 (不經 L1)，合併變更後
+        在交易中遞增版本號、寫回並發布失效通知。期間若有 write-through
+        或失效發生，交易會放棄寫入，避免以舊內容覆蓋較新的快取。
+        
+        Args:
+            imsi: UE IMSI
+            changes: 要更新的欄位
+            ttl: 快取存活時間 (秒)
+            
+        Returns:
+            是否已寫入；快取不存在或版本已變更時回傳 False，
+            呼叫端應改為清除快取
+        """
+        key = f"ue:info:{imsi}"
+        generation = self._ue_info_l1_generation
+        try:
+            async with self.binary_client.pipeline(transaction=True) as pipe:
+                await pipe.watch(self._ue_info_version_key(imsi), key)
+                cached_data = await pipe.get(key)
+                if not cached_data:
+                    return False
+                    
+                payload = self.serializer.encode(
+                    {**decode_payload(cached_data), **changes}
+                )
+                pipe.multi()
+                self._queue_ue_info_version_bump(pipe, imsi)
+                pipe.setex(key, ttl, payload)
+                pipe.publish(
+                    UE_INFO_INVALIDATION_CHANNEL,
+                    self._invalidation_message([imsi])
+                )
+                await pipe.execute()
+        except WatchError:
+            logger.debug("UE 資訊版本已變更，略過更新", imsi=imsi)
+            return False
+        except Exception as e:
+            logger.error("更新快取 UE 資訊失敗", imsi=imsi, error=str(e))
+            return False
+            
+        self._store_local_ue_infos({imsi: payload}, generation)
+        return True
+        
+    async def write_through_ue_info(
+        self,
+        ue_infos: Dict[str, Dict[str, Any]],
+        ttl: int = 300,
+        chunk_size: int = 1000
+    ) -> None:
+        """
+        以新的 UE 資訊直接覆寫快取 (write-through)
+        
+        每筆寫入都會遞增版本號，讓進行中的冷路徑載入放棄寫回；
+        同時發布失效通知，讓其他實例的 L1 改由 Redis 讀取新值。
+        
+        Args:
+            ue_infos: IMSI 對應 UE 資訊的字典
+            ttl: 快取存活時間 (秒)
+            chunk_size: 每個交易 pipeline 的 UE 數量
+        """
+        if not ue_infos:
+            return
+            
+        imsis = list(ue_infos)
+        payloads = {
+            imsi: self.serializer.encode(ue_info)
+            for imsi, ue_info in ue_infos.items()
+        }
+        generation = self._ue_info_l1_generation
+        try:
+            for start in range(0, len(imsis), chunk_size):
+                chunk = imsis[start:start + chunk_size]
+                async with self.binary_client.pipeline(transaction=True) as pipe:
+                    for imsi in chunk:
+                        self._queue_ue_info_version_bump(pipe, imsi)
+                        pipe.setex(f"ue:info:{imsi}", ttl, payloads[imsi])
+                    pipe.publish(
+                        UE_INFO_INVALIDATION_CHANNEL,
+                        self._invalidation_message(chunk)
+                    )
+                    await pipe.execute()
+                    
+            self._store_local_ue_infos(payloads, generation)
+                
+            logger.debug("UE 資訊已寫入快取", count=len(ue_infos))
+        except Exception as e:
+            logger.error("寫入 UE 資訊快取失敗", count=len(ue_infos), error=str(e))
+            # 寫入失敗時退回清除，避免留下舊資料
+            await self.invalidate_ue_info(imsis)
+            
+    async def invalidate_ue_info(
+        self,
+        imsis: List[str],
+        chunk_size: int = 1000
+    ) -> int:
+        """
+        批次清除 UE 資訊快取
+
+        先清除本行程的 L1 快取，再以 chunk_size 分段組成多鍵 DEL、遞增
+        版本號，並在同一個 pipeline 中發布失效通知，讓其他實例清除各自的 L1。
+        本實例會略過自己的通知，因此 pipeline 完成後再清除一次 L1，
+        避免期間並行讀取回填的舊內容留在 L1。
+
+        Args:
+            imsis: UE IMSI 列表
+            chunk_size: 每個 DEL 指令包含的鍵數量
+
+        Returns:
+            實際刪除的鍵數量
+        """
+        if not imsis:
+            return 0
+
+        self._evict_local_ue_info(imsis)
+
+        try:
+            deleted = 0
+            for start in range(0, len(imsis), chunk_size):
+                chunk = imsis[start:start + chunk_size]
+                async with self.client.pipeline(transaction=False) as pipe:
+                    pipe.delete(*[f"ue:info:{imsi}" for imsi in chunk])
+                    for imsi in chunk:
+                        self._queue_ue_info_version_bump(pipe, imsi)
+                    pipe.publish(
+                        UE_INFO_INVALIDATION_CHANNEL,
+                        self._invalidation_message(chunk)
+                    )
+                    results = await pipe.execute()
+                deleted += results[0]
+
+            logger.debug("UE 資訊快取已批次清除", count=len(imsis), deleted=deleted)
+            return deleted
+        except Exception as e:
+            logger.error("批次清除 UE 資訊快取失敗", count=len(imsis), error=str(e))
+            return 0
+        finally:
+            self._evict_local_ue_info(imsis)
+
     async def get_cached_ue_info(self, imsi: str) -> Optional[Dict[str, Any]]:
         """
         取得快取的 UE 資訊
         
+        優先讀取行程內快取，未命中時才查詢 Redis 並回填。L1 保存序列化後的
+        內容，每次讀取都解碼出新的字典，呼叫端修改結果不會影響快取。
+        
         Args:
             imsi: UE IMSI
             
         Returns:
             快取的 UE 資訊，如果不存在則回傳 None
         """
+        if self.ue_info_l1 is not None:
+            payload = self.ue_info_l1.get(imsi)
+            if payload is not None:
+                return decode_payload(payload)
+                
+        generation = self._ue_info_l1_generation
         try:
             key = f"ue:info:{imsi}"
-            cached_data = await self.client.get(key)
+            cached_data = await self.binary_client.get(key)
             
             if cached_data:
-                return json.loads(cached_data)
+                self._store_local_ue_infos({imsi: cached_data}, generation)
+                return decode_payload(cached_data)
             return None
         except Exception as e:
             logger.error("取得快取 UE 資訊失敗", imsi=imsi, error=str(e))
             return None
             
+    def _invalidation_message(self, imsis: List[str]) -> str:
+        """組成帶有來源實例識別碼的失效通知"""
+        return json.dumps({"origin": self.instance_id, "imsis": imsis})
+        
+    def _handle_invalidation_message(self, data: str) -> None:
+        """
+        處理失效通知
+        
+        本實例發布的通知會略過，避免清除剛寫入的 L1 項目；
+        舊版實例發布的 IMSI 列表格式仍會照常處理。
+        """
+        message = json.loads(data)
+        if isinstance(message, list):
+            self._evict_local_ue_info(message)
+        elif message.get("origin") != self.instance_id:
+            self._evict_local_ue_info(message.get("imsis", []))
+            
+    def _store_local_ue_infos(self, payloads: Dict[str, bytes], generation: int) -> None:
+        """
+        將序列化後的 UE 資訊寫入本行程 L1 快取
+        
+        generation 為存取 Redis 前讀取的 L1 世代，若期間 L1 已有其他寫入
+        或清除，這些內容可能已過期，改為移除對應項目。
+        """
+        if self.ue_info_l1 is None:
+            return
+        if generation != self._ue_info_l1_generation:
+            self._evict_local_ue_info(list(payloads))
+            return
+        for imsi, payload in payloads.items():
+            self.ue_info_l1.set(imsi, payload)
+        self._ue_info_l1_generation += 1
+        
+    def _evict_local_ue_info(self, imsis: List[str]) -> None:
+        """清除本行程 L1 快取中的 UE 資訊"""
+        if self.ue_info_l1 is not None:
+            for imsi in imsis:
+                self.ue_info_l1.pop(imsi)
+            self._ue_info_l1_generation += 1
+            
+    def _clear_local_ue_info(self) -> None:
+        """清空本行程 L1 快取"""
+        self.ue_info_l1.clear()
+        self._ue_info_l1_generation += 1
+                
+    async def start_invalidation_listener(self) -> None:
+        """啟動 UE 資訊失效通知的訂閱任務"""
+        if self.ue_info_l1 is None or self._invalidation_task is not None:
+            return
+            
+        self._invalidation_task = asyncio.create_task(self._invalidation_loop())
+        logger.info(
+            "UE 資訊快取失效訂閱已啟動",
+            channel=UE_INFO_INVALIDATION_CHANNEL,
+            max_entries=self.ue_info_l1.max_entries,
+            ttl=self.ue_info_l1.ttl
+        )
+        
+    async def stop_invalidation_listener(self) -> None:
+        """停止 UE 資訊失效通知的訂閱任務"""
+        if self._invalidation_task is not None:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+            logger.info("UE 資訊快取失效訂閱已停止")
+            
+    async def _invalidation_loop(self) -> None:
+        """
+        訂閱失效通知並清除 L1 快取
+        
+        訂閱中斷期間可能遺漏通知，因此每次 (重新) 訂閱前都會清空 L1。
+        """
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(UE_INFO_INVALIDATION_CHANNEL)
+                    self._clear_local_ue_info()
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message and message["type"] == "message":
+                            self._handle_invalidation_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("UE 資訊快取失效訂閱中斷，稍後重試", error=str(e))
+                self._clear_local_ue_info()
+                await asyncio.sleep(1)
+                
     async def update_ue_stats(
         self, 
         imsi: str, 
@@ -129,28 +591,107 @@ class RedisAdapter:
         """
         更新 UE 統計資料
         
+        HSET 本身即會合併欄位，與 EXPIRE 一起在單一交易 pipeline 中送出；
+        值為 None 的欄位會被略過。累加型計數器請使用 increment_ue_stats。
+        
         Args:
             imsi: UE IMSI
             stats: 統計資料
         """
         try:
             key = f"ue:stats:{imsi}"
+            mapping = {
+                field: value for field, value in stats.items() if value is not None
+            }
+            mapping["last_updated"] = datetime.now().isoformat()
             
-            # 取得現有統計資料
-            existing_stats = await self.client.hgetall(key)
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=mapping)
+                # 設定過期時間 (24 小時)
+                pipe.expire(key, 86400)
+                await pipe.execute()
             
-            # 更新統計資料
-            updated_stats = {**existing_stats, **stats}
-            updated_stats["last_updated"] = datetime.now().isoformat()
+            logger.debug("UE 統計資料已更新", imsi=imsi)
+        except Exception as e:
+            logger.error("更新 UE 統計資料失敗", imsi=imsi, error=str(e))
             
-            await self.client.hset(key, mapping=updated_stats)
+    @classmethod
+    def _queue_ue_stats_increments(
+        cls,
+        pipe: Any,
+        imsi: str,
+        increments: Dict[str, int],
+        now: datetime
+    ) -> None:
+        """將單一 UE 的計數器累加指令 (含流量時間序列) 加入 pipeline"""
+        key = f"ue:stats:{imsi}"
+        for field, delta in increments.items():
+            if delta:
+                pipe.hincrby(key, field, int(delta))
+        pipe.hset(key, "last_updated", now.isoformat())
+        pipe.expire(key, 86400)
+        
+        traffic = {
+            field: int(increments[field])
+            for field in TRAFFIC_TIMESERIES_FIELDS
+            if increments.get(field)
+        }
+        if traffic:
+            series: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+            cls._add_timeseries_sample(series, "ue", imsi, now, traffic)
+            cls._queue_timeseries(pipe, series)
             
-            # 設定過期時間 (24 小時)
-            await self.client.expire(key, 86400)
+    async def increment_ue_stats(
+        self, 
+        imsi: str, 
+        increments: Dict[str, int]
+    ) -> None:
+        """
+        以 HINCRBY 原子累加 UE 計數器
+        
+        所有累加、last_updated 與 EXPIRE 在單一交易 pipeline 中送出，
+        併發更新不會互相覆蓋。
+        
+        Args:
+            imsi: UE IMSI
+            increments: 欄位對應增量 (例如 bytes_uploaded、connection_time)
+        """
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                self._queue_ue_stats_increments(pipe, imsi, increments, datetime.now())
+                await pipe.execute()
             
-            logger.debug("UE 統計資料已更新", imsi=imsi)
+            logger.debug("UE 計數器已累加", imsi=imsi, **increments)
         except Exception as e:
-            logger.error("更新 UE 統計資料失敗", imsi=imsi, error=str(e))
+            logger.error("累加 UE 計數器失敗", imsi=imsi, error=str(e))
+            
+    async def increment_ue_stats_batch(
+        self, 
+        increments_by_imsi: Dict[str, Dict[str, int]]
+    ) -> None:
+        """
+        以單一 pipeline 原子累加多個 UE 的計數器
+        
+        每個 HINCRBY 皆為原子操作，整批只需一次往返。
+        
+        Args:
+            increments_by_imsi: IMSI 對應欄位增量的字典
+        """
+        if not increments_by_imsi:
+            return
+            
+        try:
+            now = datetime.now()
+            async with self.client.pipeline(transaction=False) as pipe:
+                for imsi, increments in increments_by_imsi.items():
+                    self._queue_ue_stats_increments(pipe, imsi, increments, now)
+                await pipe.execute()
+            
+            logger.debug("UE 計數器已批次累加", count=len(increments_by_imsi))
+        except Exception as e:
+            logger.error(
+                "批次累加 UE 計數器失敗", count=len(increments_by_imsi), error=str(e)
+            )
             
     async def get_ue_stats(self, imsi: str) -> Optional[Dict[str, Any]]:
         """
@@ -181,6 +722,42 @@ class RedisAdapter:
             logger.error("取得 UE 統計資料失敗", imsi=imsi, error=str(e))
             return None
             
+    def _queue_slice_switches(
+        self,
+        pipe: Any,
+        switches: List[Tuple[str, str, str]],
+        timestamp: str
+    ) -> None:
+        """
+        將 Slice 切換事件加入 pipeline
+        
+        同一 IMSI 的歷史記錄合併為一次多值 LPUSH，同一切換方向的
+        全域計數合併為一次 INCRBY。
+        """
+        history: Dict[str, List[bytes]] = {}
+        switch_counts: Dict[str, int] = {}
+        for imsi, from_slice, to_slice in switches:
+            history.setdefault(imsi, []).append(self.serializer.encode({
+                "imsi": imsi,
+                "from_slice": from_slice,
+                "to_slice": to_slice,
+                "timestamp": timestamp
+            }))
+            global_key = f"global:slice_switches:{from_slice}:{to_slice}"
+            switch_counts[global_key] = switch_counts.get(global_key, 0) + 1
+            
+        for imsi, records in history.items():
+            history_key = f"slice:switches:{imsi}"
+            pipe.lpush(history_key, *records)
+            # 只保留最近 100 筆記錄
+            pipe.ltrim(history_key, 0, 99)
+            # 更新統計計數器
+            pipe.hincrby(f"ue:stats:{imsi}", "slice_switches", len(records))
+            
+        for global_key, count in switch_counts.items():
+            pipe.incrby(global_key, count)
+            pipe.expire(global_key, 86400)  # 24 小時過期
+            
     async def record_slice_switch(
         self, 
         imsi: str, 
@@ -190,38 +767,19 @@ class RedisAdapter:
         """
         記錄 Slice 切換事件
         
+        歷史、UE 計數與全域計數在單一交易 pipeline 中寫入。
+        
         Args:
             imsi: UE IMSI
             from_slice: 原始 Slice
             to_slice: 目標 Slice
         """
         try:
-            # 記錄切換歷史
-            switch_record = {
-                "imsi": imsi,
-                "from_slice": from_slice,
-                "to_slice": to_slice,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # 加入切換歷史列表
-            history_key = f"slice:switches:{imsi}"
-            await self.client.lpush(
-                history_key,
-                json.dumps(switch_record)
-            )
-            
-            # 只保留最近 100 筆記錄
-            await self.client.ltrim(history_key, 0, 99)
-            
-            # 更新統計計數器
-            stats_key = f"ue:stats:{imsi}"
-            await self.client.hincrby(stats_key, "slice_switches", 1)
-            
-            # 全域統計
-            global_key = f"global:slice_switches:{from_slice}:{to_slice}"
-            await self.client.incr(global_key)
-            await self.client.expire(global_key, 86400)  # 24 小時過期
+            async with self.binary_client.pipeline(transaction=True) as pipe:
+                self._queue_slice_switches(
+                    pipe, [(imsi, from_slice, to_slice)], datetime.now().isoformat()
+                )
+                await pipe.execute()
             
             logger.info(
                 "Slice 切換已記錄",
@@ -238,6 +796,37 @@ class RedisAdapter:
                 error=str(e)
             )
             
+    async def record_slice_switches(
+        self, 
+        switches: List[Tuple[str, str, str]],
+        chunk_size: int = 1000
+    ) -> None:
+        """
+        批次記錄 Slice 切換事件
+        
+        每 chunk_size 筆事件組成一個交易 pipeline，大量換手時
+        每個區塊只需一次往返。
+        
+        Args:
+            switches: (imsi, from_slice, to_slice) 列表
+            chunk_size: 每個 pipeline 的事件數量
+        """
+        if not switches:
+            return
+            
+        try:
+            timestamp = datetime.now().isoformat()
+            for start in range(0, len(switches), chunk_size):
+                async with self.binary_client.pipeline(transaction=True) as pipe:
+                    self._queue_slice_switches(
+                        pipe, switches[start:start + chunk_size], timestamp
+                    )
+                    await pipe.execute()
+            
+            logger.info("Slice 切換已批次記錄", count=len(switches))
+        except Exception as e:
+            logger.error("批次記錄 Slice 切換失敗", count=len(switches), error=str(e))
+            
     async def get_slice_switch_history(
         self, 
         imsi: str, 
@@ -255,14 +844,14 @@ class RedisAdapter:
         """
         try:
             key = f"slice:switches:{imsi}"
-            history_data = await self.client.lrange(key, 0, limit - 1)
+            history_data = await self.binary_client.lrange(key, 0, limit - 1)
             
             history = []
-            for record_str in history_data:
+            for payload in history_data:
                 try:
-                    record = json.loads(record_str)
+                    record = decode_payload(payload)
                     history.append(record)
-                except json.JSONDecodeError:
+                except ValueError:
                     continue
                     
             return history
@@ -270,6 +859,60 @@ class RedisAdapter:
             logger.error("取得 Slice 切換歷史失敗", imsi=imsi, error=str(e))
             return []
             
+    @staticmethod
+    def _rtt_sketch_key(slice_type: str, window_start: int) -> str:
+        """取得 Slice RTT 草圖視窗鍵值"""
+        return f"slice:rtt_sketch:{slice_type}:{window_start}"
+        
+    @classmethod
+    def _queue_rtt_measurements(
+        cls,
+        pipe: Any,
+        samples: List[Tuple[str, float, str]],
+        now: datetime
+    ) -> None:
+        """
+        將 RTT 樣本加入 pipeline
+        
+        樣本先在本地依 Slice 分桶，每個 (Slice, 桶) 只送出一次 HINCRBY。
+        """
+        timestamp = now.isoformat()
+        window_start = int(now.timestamp()) // RTT_SKETCH_WINDOW_SECONDS
+        sketch = RTTSketch()
+        latest: Dict[str, float] = {}
+        slice_buckets: Dict[str, Dict[str, int]] = {}
+        slice_sums: Dict[str, float] = {}
+        for imsi, rtt_ms, slice_type in samples:
+            latest[imsi] = rtt_ms
+            buckets = slice_buckets.setdefault(slice_type, {})
+            bucket = sketch.bucket_of(rtt_ms)
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+            slice_sums[slice_type] = slice_sums.get(slice_type, 0.0) + rtt_ms
+            
+        # 更新 UE 統計 (每個 UE 只保留最後一筆)
+        for imsi, rtt_ms in latest.items():
+            pipe.hset(f"ue:stats:{imsi}", mapping={
+                "rtt_ms": rtt_ms,
+                "last_rtt_test": timestamp
+            })
+            
+        # 累加 UE 與 Slice 的 RTT 時間序列
+        series: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for imsi, rtt_ms, slice_type in samples:
+            sample = {"rtt_sum": float(rtt_ms), "rtt_count": 1}
+            cls._add_timeseries_sample(series, "ue", imsi, now, sample)
+            cls._add_timeseries_sample(series, "slice", slice_type, now, sample)
+        cls._queue_timeseries(pipe, series)
+            
+        # 累加 Slice 類型的 RTT 草圖
+        for slice_type, buckets in slice_buckets.items():
+            key = cls._rtt_sketch_key(slice_type, window_start)
+            for bucket, count in buckets.items():
+                pipe.hincrby(key, bucket, count)
+            pipe.hincrby(key, RTTSketch.COUNT_FIELD, sum(buckets.values()))
+            pipe.hincrbyfloat(key, RTTSketch.SUM_FIELD, slice_sums[slice_type])
+            pipe.expire(key, RTT_SKETCH_RETENTION_SECONDS + RTT_SKETCH_WINDOW_SECONDS)
+            
     async def update_rtt_measurement(
         self, 
         imsi: str, 
@@ -279,23 +922,19 @@ class RedisAdapter:
         """
         更新 RTT 測量結果
         
+        UE 統計與 Slice RTT 草圖在單一交易 pipeline 中寫入。
+        
         Args:
             imsi: UE IMSI
             rtt_ms: RTT 延遲 (毫秒)
             slice_type: Slice 類型
         """
         try:
-            # 更新 UE 統計
-            stats_key = f"ue:stats:{imsi}"
-            await self.client.hset(stats_key, mapping={
-                "rtt_ms": rtt_ms,
-                "last_rtt_test": datetime.now().isoformat()
-            })
-            
-            # 記錄 Slice 類型的 RTT 統計
-            slice_rtt_key = f"slice:rtt:{slice_type}"
-            await self.client.lpush(slice_rtt_key, rtt_ms)
-            await self.client.ltrim(slice_rtt_key, 0, 999)  # 保留最近 1000 筆
+            async with self.client.pipeline(transaction=True) as pipe:
+                self._queue_rtt_measurements(
+                    pipe, [(imsi, rtt_ms, slice_type)], datetime.now()
+                )
+                await pipe.execute()
             
             logger.debug(
                 "RTT 測量已更新",
@@ -312,35 +951,287 @@ class RedisAdapter:
                 error=str(e)
             )
             
-    async def get_slice_rtt_stats(self, slice_type: str) -> Dict[str, float]:
+    async def update_rtt_measurements(
+        self, 
+        samples: List[Tuple[str, float, str]],
+        chunk_size: int = 1000
+    ) -> None:
+        """
+        批次更新 RTT 測量結果
+        
+        Args:
+            samples: (imsi, rtt_ms, slice_type) 列表
+            chunk_size: 每個交易 pipeline 的樣本數量
+        """
+        if not samples:
+            return
+            
+        try:
+            now = datetime.now()
+            for start in range(0, len(samples), chunk_size):
+                async with self.client.pipeline(transaction=True) as pipe:
+                    self._queue_rtt_measurements(
+                        pipe, samples[start:start + chunk_size], now
+                    )
+                    await pipe.execute()
+            
+            logger.debug("RTT 測量已批次更新", count=len(samples))
+        except Exception as e:
+            logger.error("批次更新 RTT 測量失敗", count=len(samples), error=str(e))
+            
+    async def get_slice_rtt_stats(
+        self, 
+        slice_type: str,
+        window_seconds: int = 300
+    ) -> Dict[str, float]:
         """
         取得 Slice RTT 統計
         
+        合併最近 window_seconds 內的每分鐘草圖，成本只與視窗數及桶數
+        相關，與樣本數量無關。
+        
         Args:
             slice_type: Slice 類型
+            window_seconds: 統計視窗 (秒)，上限為草圖保留時間
             
         Returns:
-            RTT 統計資料 (平均值、最小值、最大值)
+            RTT 統計資料 (平均值、極值與 p50/p95/p99/p99.9)
         """
+        window_seconds = max(
+            RTT_SKETCH_WINDOW_SECONDS,
+            min(window_seconds, RTT_SKETCH_RETENTION_SECONDS)
+        )
+        sketch = RTTSketch()
         try:
-            key = f"slice:rtt:{slice_type}"
-            rtt_values = await self.client.lrange(key, 0, -1)
+            current = int(datetime.now().timestamp()) // RTT_SKETCH_WINDOW_SECONDS
+            windows = window_seconds // RTT_SKETCH_WINDOW_SECONDS
+            
+            async with self.client.pipeline(transaction=False) as pipe:
+                for offset in range(windows):
+                    pipe.hgetall(self._rtt_sketch_key(slice_type, current - offset))
+                for fields in await pipe.execute():
+                    sketch.merge_fields(fields)
+        except Exception as e:
+            logger.error("取得 Slice RTT 統計失敗", slice_type=slice_type, error=str(e))
+            sketch = RTTSketch()
             
-            if not rtt_values:
-                return {"avg": 0.0, "min": 0.0, "max": 0.0, "count": 0}
+        return {**sketch.summary(), "window_seconds": window_seconds}
+            
+    @staticmethod
+    def _timeseries_key(scope: str, entity_id: str, resolution: str, block: int) -> str:
+        """取得時間序列區塊鍵值"""
+        return f"ts:{scope}:{entity_id}:{resolution}:{block}"
+        
+    @classmethod
+    def _add_timeseries_sample(
+        cls,
+        series: Dict[str, Tuple[int, Dict[str, Any]]],
+        scope: str,
+        entity_id: str,
+        now: datetime,
+        values: Dict[str, Any]
+    ) -> None:
+        """
+        將一筆樣本累加到所有解析度的時間序列桶
+        
+        每個解析度以區塊為單位存成一個 hash，欄位為「桶起點:指標」。
+        樣本在寫入時即同時累加到 1s/1m/1h 桶，因此彙總不需背景工作，
+        各區塊依解析度的保留時間自動過期。
+        
+        Args:
+            series: 待寫入的累加結果，鍵為 Redis 鍵值，值為 (TTL, 欄位增量)
+            scope: 序列範圍 (ue 或 slice)
+            entity_id: IMSI 或 Slice 類型
+            now: 樣本時間
+            values: 指標增量
+        """
+        ts = int(now.timestamp())
+        for resolution, spec in TIMESERIES_RESOLUTIONS.items():
+            bucket = ts - ts % spec["step"]
+            block = ts - ts % spec["block"]
+            key = cls._timeseries_key(scope, entity_id, resolution, block)
+            _, fields = series.setdefault(
+                key, (spec["retention"] + spec["block"], {})
+            )
+            for metric, value in values.items():
+                field = f"{bucket}:{metric}"
+                fields[field] = fields.get(field, 0) + value
                 
-            rtt_floats = [float(val) for val in rtt_values]
+    @staticmethod
+    def _queue_timeseries(
+        pipe: Any,
+        series: Dict[str, Tuple[int, Dict[str, Any]]]
+    ) -> None:
+        """將累加後的時間序列增量加入 pipeline"""
+        for key, (ttl, fields) in series.items():
+            for field, value in fields.items():
+                if isinstance(value, float):
+                    pipe.hincrbyfloat(key, field, value)
+                else:
+                    pipe.hincrby(key, field, value)
+            pipe.expire(key, ttl)
+            
+    @staticmethod
+    def select_timeseries_resolution(start: int, end: int, now: int) -> str:
+        """
+        選擇能涵蓋查詢範圍且點數不超過上限的最細解析度
+        
+        Args:
+            start: 起始時間 (epoch 秒)
+            end: 結束時間 (epoch 秒)
+            now: 目前時間 (epoch 秒)
+        """
+        for resolution, spec in TIMESERIES_RESOLUTIONS.items():
+            covers = now - start <= spec["retention"]
+            points = (end - start) // spec["step"] + 1
+            if covers and points <= TIMESERIES_MAX_POINTS:
+                return resolution
+        return list(TIMESERIES_RESOLUTIONS)[-1]
+        
+    async def get_timeseries(
+        self,
+        scope: str,
+        entity_id: str,
+        start: int,
+        end: int,
+        resolution: str
+    ) -> List[Dict[str, Any]]:
+        """
+        查詢時間序列
+        
+        只讀取與查詢範圍重疊的區塊 hash，並在單一 pipeline 中取得。
+        
+        Args:
+            scope: 序列範圍 (ue 或 slice)
+            entity_id: IMSI 或 Slice 類型
+            start: 起始時間 (epoch 秒，含)
+            end: 結束時間 (epoch 秒，含)
+            resolution: 解析度 (1s、1m 或 1h)
+            
+        Returns:
+            依時間排序的非空桶列表，每筆包含 timestamp 與各指標累加值
+        """
+        spec = TIMESERIES_RESOLUTIONS[resolution]
+        start -= start % spec["step"]
+        first_block = start - start % spec["block"]
+        keys = [
+            self._timeseries_key(scope, entity_id, resolution, block)
+            for block in range(first_block, end + 1, spec["block"])
+        ]
+        
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hgetall(key)
+                blocks = await pipe.execute()
+        except Exception as e:
+            logger.error(
+                "查詢時間序列失敗",
+                scope=scope,
+                entity_id=entity_id,
+                resolution=resolution,
+                error=str(e)
+            )
+            return []
             
+        buckets: Dict[int, Dict[str, Any]] = {}
+        for fields in blocks:
+            for field, value in fields.items():
+                bucket_str, metric = field.split(":", 1)
+                bucket = int(bucket_str)
+                if start <= bucket <= end:
+                    point = buckets.setdefault(bucket, {"timestamp": bucket})
+                    point[metric] = float(value) if metric == "rtt_sum" else int(value)
+                    
+        return [buckets[bucket] for bucket in sorted(buckets)]
+        
+    @staticmethod
+    def _switch_count_key(slice_type: str, hour: datetime) -> str:
+        """取得 Slice 每小時切換計數器的鍵"""
+        return f"slice:switch_count:{slice_type}:{hour.strftime('%Y%m%d%H')}"
+
+    async def apply_slice_counter_deltas(
+        self,
+        active_deltas: Dict[str, int],
+        switch_counts: Dict[str, int]
+    ) -> None:
+        """
+        以一個 pipeline 累加 Slice 計數器
+
+        Args:
+            active_deltas: Slice 類型對應活躍 UE 數量的增減
+            switch_counts: Slice 類型對應切入次數 (累加至目前小時的計數器)
+        """
+        try:
+            now = datetime.utcnow()
+            async with self.client.pipeline(transaction=True) as pipe:
+                for slice_type, delta in active_deltas.items():
+                    if delta:
+                        pipe.incrby(f"slice:active_ues:{slice_type}", delta)
+                for slice_type, count in switch_counts.items():
+                    if count:
+                        key = self._switch_count_key(slice_type, now)
+                        pipe.incrby(key, count)
+                        pipe.expire(key, 25 * 3600)  # 保留 24 小時視窗 + 1 小時
+                await pipe.execute()
+        except Exception as e:
+            logger.error(
+                "更新 Slice 計數器失敗",
+                active_deltas=active_deltas,
+                switch_counts=switch_counts,
+                error=str(e)
+            )
+
+    async def get_slice_counters(self, slice_type: str) -> Dict[str, int]:
+        """
+        取得 Slice 計數器
+
+        活躍 UE 數量與最近 24 小時切換次數 (24 個每小時計數器) 以一個
+        pipeline 取得，成本與用戶數量無關。
+
+        Args:
+            slice_type: Slice 類型
+
+        Returns:
+            包含 active_ues 與 switches_24h 的字典
+        """
+        try:
+            now = datetime.utcnow()
+            hour_keys = [
+                self._switch_count_key(slice_type, now - timedelta(hours=offset))
+                for offset in range(24)
+            ]
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(f"slice:active_ues:{slice_type}")
+                pipe.mget(hour_keys)
+                active_ues, hourly_counts = await pipe.execute()
+
             return {
-                "avg": sum(rtt_floats) / len(rtt_floats),
-                "min": min(rtt_floats),
-                "max": max(rtt_floats),
-                "count": len(rtt_floats)
+                "active_ues": max(0, int(active_ues or 0)),
+                "switches_24h": sum(int(count) for count in hourly_counts if count),
             }
         except Exception as e:
-            logger.error("取得 Slice RTT 統計失敗", slice_type=slice_type, error=str(e))
-            return {"avg": 0.0, "min": 0.0, "max": 0.0, "count": 0}
-            
+            logger.error("取得 Slice 計數器失敗", slice_type=slice_type, error=str(e))
+            return {"active_ues": 0, "switches_24h": 0}
+
+    async def set_slice_active_counts(self, counts: Dict[str, int]) -> None:
+        """
+        覆寫 Slice 活躍 UE 計數器 (供定期校正使用)
+
+        Args:
+            counts: Slice 類型對應活躍 UE 數量
+        """
+        try:
+            if counts:
+                await self.client.mset(
+                    {
+                        f"slice:active_ues:{slice_type}": count
+                        for slice_type, count in counts.items()
+                    }
+                )
+        except Exception as e:
+            logger.error("校正 Slice 計數器失敗", counts=counts, error=str(e))
+
     async def set_ue_online_status(self, imsi: str, online: bool) -> None:
         """
         設定 UE 線上狀態
@@ -377,4 +1268,41 @@ class RedisAdapter:
             return bool(result)
         except Exception as e:
             logger.error("檢查 UE 線上狀態失敗", imsi=imsi, error=str(e))
-            return False 
\ No newline at end of file
+            return False
+
+    async def get_ue_online_statuses(
+        self,
+        imsis: List[str],
+        chunk_size: int = 1000
+    ) -> Dict[str, bool]:
+        """
+        批次檢查多個 UE 的線上狀態
+
+        以 MGET 一次取得多個 ue:online 鍵值，並依 chunk_size 分段
+        放入同一個 pipeline，整批查詢只需一次往返。
+
+        Args:
+            imsis: UE IMSI 列表
+            chunk_size: 每個 MGET 指令包含的鍵數量
+
+        Returns:
+            IMSI 對應線上狀態的字典
+        """
+        if not imsis:
+            return {}
+
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for start in range(0, len(imsis), chunk_size):
+                    chunk = imsis[start:start + chunk_size]
+                    pipe.mget([f"ue:online:{imsi}" for imsi in chunk])
+                results = await pipe.execute()
+
+            values = [value for chunk_values in results for value in chunk_values]
+            return {
+                imsi: value is not None
+                for imsi, value in zip(imsis, values)
+            }
+        except Exception as e:
+            logger.error("批次檢查 UE 線上狀態失敗", count=len(imsis), error=str(e))
+            return {imsi: False for imsi in imsis}
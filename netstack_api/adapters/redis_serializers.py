@@ -0,0 +1,129 @@
+"""
+Redis 快取內容的序列化器
+
+JSON 格式寫入不加標籤的純 JSON，與舊版程式的 json.loads 相容，
+滾動更新期間新舊實例可以共用同一份快取。msgpack 等二進位格式在內容
+前加上一個格式標籤位元組，讀取端依標籤選擇解碼器；沒有已知標籤的
+內容一律視為 JSON。
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import structlog
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack 為選用相依套件
+    msgpack = None
+
+logger = structlog.get_logger(__name__)
+
+# 曾以標籤寫入 JSON 的版本所使用的標籤，讀取時仍視為 JSON
+TAGGED_JSON_TAG = b"\x01"
+
+
+class PayloadSerializer(ABC):
+    """序列化器基底類別"""
+
+    name = ""
+    # 格式標籤，空字串表示不加標籤
+    tag = b""
+
+    def encode(self, value: Any) -> bytes:
+        """將資料編碼為位元組 (有標籤時加在開頭)"""
+        return self.tag + self._dumps(value)
+
+    @abstractmethod
+    def _dumps(self, value: Any) -> bytes:
+        """將資料編碼為不含標籤的位元組"""
+
+    @abstractmethod
+    def loads(self, body: bytes) -> Any:
+        """解碼不含標籤的內容"""
+
+
+class JSONSerializer(PayloadSerializer):
+    """JSON 序列化器 (預設，不加標籤，與舊版內容相容)"""
+
+    name = "json"
+
+    def _dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+    def loads(self, body: bytes) -> Any:
+        return json.loads(body)
+
+
+class MsgpackSerializer(PayloadSerializer):
+    """MessagePack 序列化器 (需要 msgpack 套件)"""
+
+    name = "msgpack"
+    tag = b"\x02"
+
+    def _dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=str, use_bin_type=True)
+
+    def loads(self, body: bytes) -> Any:
+        return msgpack.unpackb(body, raw=False)
+
+
+SERIALIZERS: Dict[str, PayloadSerializer] = {
+    serializer.name: serializer
+    for serializer in (JSONSerializer(), MsgpackSerializer())
+}
+_SERIALIZERS_BY_TAG = {
+    serializer.tag: serializer for serializer in SERIALIZERS.values() if serializer.tag
+}
+_SERIALIZERS_BY_TAG[TAGGED_JSON_TAG] = SERIALIZERS[JSONSerializer.name]
+
+
+def get_serializer(name: str) -> PayloadSerializer:
+    """
+    依名稱取得序列化器
+
+    msgpack 未安裝時退回 JSON，並記錄警告。
+
+    Raises:
+        ValueError: 未知的序列化格式
+    """
+    if name not in SERIALIZERS:
+        raise ValueError(
+            f"不支援的序列化格式: {name}，可用值為 {', '.join(SERIALIZERS)}"
+        )
+
+    if name == MsgpackSerializer.name and msgpack is None:
+        logger.warning("未安裝 msgpack，改用 JSON 序列化")
+        return SERIALIZERS[JSONSerializer.name]
+
+    return SERIALIZERS[name]
+
+
+def decode_payload(payload: Optional[bytes]) -> Any:
+    """
+    解碼任一格式的內容
+
+    Args:
+        payload: Redis 中的原始位元組
+
+    Returns:
+        解碼後的資料，payload 為 None 時回傳 None
+
+    Raises:
+        ValueError: 無法辨識的格式或內容損壞
+    """
+    if payload is None:
+        return None
+
+    serializer = _SERIALIZERS_BY_TAG.get(payload[:1])
+    if serializer is None:
+        # 沒有已知標籤的內容為不加標籤的 JSON
+        try:
+            return json.loads(payload)
+        except ValueError as e:
+            raise ValueError(f"無法辨識的快取內容格式: {payload[:1]!r}") from e
+    if serializer.name == MsgpackSerializer.name and msgpack is None:
+        raise ValueError("內容為 msgpack 格式，但未安裝 msgpack")
+
+    return serializer.loads(payload[1:])
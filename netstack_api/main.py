@@ -8,20 +8,26 @@ NetStack API - Open5GS + UERANSIM 雙 Slice 管理 API
 import asyncio
 import json
 import logging
+import math
 import os
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import structlog
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from prometheus_client import Counter, Histogram, generate_latest, CollectorRegistry
 from prometheus_client.exposition import generate_latest
 from fastapi import Response
 
+try:
+    import orjson
+except ImportError:  # orjson 為選用相依套件
+    orjson = None
+
 from .adapters.mongo_adapter import MongoAdapter
 from .adapters.redis_adapter import RedisAdapter
 from .adapters.open5gs_adapter import Open5GSAdapter
@@ -29,12 +35,25 @@ from .services.ue_service import UEService
 from .services.slice_service import SliceService, SliceType
 from .services.health_service import HealthService
 from .services.ueransim_service import UERANSIMConfigService
-from .models.requests import SliceSwitchRequest
-from .models.ueransim_models import UERANSIMConfigRequest, UERANSIMConfigResponse
+from .models.requests import (
+    BulkSliceSwitchRequest,
+    BulkUERegistrationRequest,
+    SliceSwitchRequest,
+)
+from .models.ueransim_models import (
+    SatellitePassSimulationRequest,
+    UERANSIMBatchConfigRequest,
+    UERANSIMConfigRequest,
+    UERANSIMConfigResponse,
+)
 from .models.responses import (
+    BulkSliceSwitchResponse,
+    BulkUERegistrationResponse,
     HealthResponse,
     UEInfoResponse,
+    UEListResponse,
     UEStatsResponse,
+    UETimeSeriesResponse,
     SliceSwitchResponse,
     ErrorResponse,
 )
@@ -61,6 +80,53 @@ class CustomJSONResponse(JSONResponse):
         ).encode("utf-8")
 
 
+def _replace_non_finite(content):
+    """將 NaN 與 ±Infinity 轉為 None，其餘內容保持不變"""
+    if isinstance(content, float) and not math.isfinite(content):
+        return None
+    if isinstance(content, dict):
+        return {key: _replace_non_finite(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [_replace_non_finite(value) for value in content]
+    return content
+
+
+def dumps_json(content) -> bytes:
+    """
+    將內容序列化為 UTF-8 JSON
+
+    已安裝 orjson 時使用 orjson (原生處理 datetime 與 Enum)，
+    否則退回與 CustomJSONResponse 相同的標準函式庫實作。
+
+    與 CustomJSONResponse 的差異：
+    - NaN 與 ±Infinity 一律輸出為 null (CustomJSONResponse 會拋出 ValueError)；
+    - orjson 的浮點數指數寫法不同 (1e16 / 1e-5 對 1e+16 / 1e-05)，數值相同。
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    try:
+        return _dumps_stdlib_json(content)
+    except ValueError:
+        # allow_nan=False 遇到非有限浮點數時，比照 orjson 改為 null
+        return _dumps_stdlib_json(_replace_non_finite(content))
+
+
+def _dumps_stdlib_json(content) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        cls=CustomJSONEncoder,
+    ).encode("utf-8")
+
+
+# 高頻端點使用的快速 JSONResponse 類
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps_json(content)
+
+
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
 logger = structlog.get_logger(__name__)
@@ -119,15 +185,48 @@ async def lifespan(app: FastAPI):
         connection_string=os.getenv("DATABASE_URL", "mongodb://mongo:27017/open5gs")
     )
     redis_adapter = RedisAdapter(
-        connection_string=os.getenv("REDIS_URL", "redis://redis:6379")
+        connection_string=os.getenv("REDIS_URL", "redis://redis:6379"),
+        ue_info_l1_max_entries=int(os.getenv("UE_INFO_L1_MAX_ENTRIES", "10000")),
+        ue_info_l1_ttl=float(os.getenv("UE_INFO_L1_TTL", "5")),
+        payload_format=os.getenv("REDIS_PAYLOAD_FORMAT", "json"),
+    )
+    open5gs_adapter = Open5GSAdapter(
+        mongo_host=os.getenv("MONGO_HOST", "mongo"),
+        mongo_adapter=mongo_adapter,
+        dbctl_fallback=os.getenv("OPEN5GS_DBCTL_FALLBACK", "false").lower() == "true",
+        max_connections=int(os.getenv("OPEN5GS_HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(
+            os.getenv("OPEN5GS_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+        ),
+        keepalive_expiry=float(os.getenv("OPEN5GS_HTTP_KEEPALIVE_EXPIRY", "30")),
+        nf_timeouts={
+            nf: float(os.environ[f"OPEN5GS_{nf.upper()}_TIMEOUT"])
+            for nf in ("amf", "smf", "nrf", "nssf", "upf")
+            if f"OPEN5GS_{nf.upper()}_TIMEOUT" in os.environ
+        },
     )
-    open5gs_adapter = Open5GSAdapter(mongo_host=os.getenv("MONGO_HOST", "mongo"))
 
     # 初始化服務
     ue_service = UEService(mongo_adapter, redis_adapter)
     slice_service = SliceService(mongo_adapter, open5gs_adapter, redis_adapter)
-    health_service = HealthService(mongo_adapter, redis_adapter)
-    ueransim_service = UERANSIMConfigService()
+    health_service = HealthService(
+        mongo_adapter,
+        redis_adapter,
+        open5gs_adapter,
+        refresh_interval=float(os.getenv("HEALTH_REFRESH_INTERVAL", "5")),
+        max_staleness=float(os.getenv("HEALTH_MAX_STALENESS", "15")),
+    )
+    ueransim_service = UERANSIMConfigService(
+        config_cache_max_entries=int(
+            os.getenv("UERANSIM_CONFIG_CACHE_MAX_ENTRIES", "1024")
+        ),
+        config_cache_ttl=float(os.getenv("UERANSIM_CONFIG_CACHE_TTL", "300")),
+        max_workers=(
+            int(os.getenv("UERANSIM_WORKER_PROCESSES"))
+            if os.getenv("UERANSIM_WORKER_PROCESSES")
+            else None
+        ),
+    )
 
     # 儲存到應用程式狀態
     app.state.mongo_adapter = mongo_adapter
@@ -141,6 +240,22 @@ async def lifespan(app: FastAPI):
     # 連接外部服務
     await mongo_adapter.connect()
     await redis_adapter.connect()
+    await open5gs_adapter.connect()
+
+    # 訂閱 UE 資訊快取失效通知，維持各實例行程內快取一致
+    await redis_adapter.start_invalidation_listener()
+
+    # 確保查詢所需的 MongoDB 索引存在
+    await mongo_adapter.ensure_indexes()
+
+    # 以 Redis 計數器維護切片統計，並定期與 MongoDB 校正
+    mongo_adapter.slice_transition_listener = slice_service.record_slice_transitions
+    await slice_service.start_counter_reconciliation(
+        interval=float(os.getenv("SLICE_COUNTER_RECONCILE_INTERVAL", "300"))
+    )
+
+    # 啟動健康快照背景更新
+    await health_service.start_background_refresh()
 
     logger.info("✅ NetStack API 啟動完成")
 
@@ -148,8 +263,13 @@ async def lifespan(app: FastAPI):
 
     # 清理資源
     logger.info("🛑 NetStack API 關閉中...")
+    await health_service.stop_background_refresh()
+    await slice_service.stop_counter_reconciliation()
+    await redis_adapter.stop_invalidation_listener()
+    ueransim_service.shutdown()
     await mongo_adapter.disconnect()
     await redis_adapter.disconnect()
+    await open5gs_adapter.disconnect()
     logger.info("✅ NetStack API 已關閉")
 
 
@@ -236,6 +356,31 @@ async def get_metrics():
 # ===== UE 管理端點 =====
 
 
+@app.get("/api/v1/ue/export", tags=["UE 管理"])
+async def export_ues(
+    batch_size: int = Query(500, ge=1, le=5000, description="每批次讀取的 UE 數量"),
+):
+    """
+    以 NDJSON 串流匯出所有 UE
+
+    逐批讀取 MongoDB cursor 並即時寫出，每行一筆 UE 資訊，
+    伺服器端記憶體用量只與 batch_size 有關，與 UE 總數無關。
+
+    Args:
+        batch_size: 每批次讀取的 UE 數量
+
+    Returns:
+        application/x-ndjson 串流回應
+    """
+    ue_service = app.state.ue_service
+
+    async def ndjson_lines():
+        async for ue_batch in ue_service.iter_ue_batches(batch_size=batch_size):
+            yield b"".join(dumps_json(ue_info) + b"\n" for ue_info in ue_batch)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @app.get("/api/v1/ue/{imsi}", tags=["UE 管理"])
 async def get_ue_info(imsi: str):
     """
@@ -257,7 +402,7 @@ async def get_ue_info(imsi: str):
                 detail=f"找不到 IMSI {imsi} 的 UE",
             )
 
-        return CustomJSONResponse(content=ue_info)
+        return FastJSONResponse(content=ue_info)
 
     except HTTPException:
         raise
@@ -302,19 +447,78 @@ async def get_ue_stats(imsi: str):
         )
 
 
-@app.get("/api/v1/ue", tags=["UE 管理"])
-async def list_ues():
+@app.get(
+    "/api/v1/ue/{imsi}/timeseries",
+    response_model=UETimeSeriesResponse,
+    tags=["UE 管理"],
+)
+async def get_ue_timeseries(
+    imsi: str,
+    start: Optional[datetime] = Query(
+        None, description="起始時間，預設為 end 前 1 小時"
+    ),
+    end: Optional[datetime] = Query(None, description="結束時間，預設為現在"),
+    resolution: Optional[str] = Query(
+        None, description="解析度 (1s/1m/1h)，未指定時依範圍自動選擇"
+    ),
+):
     """
-    列出所有已註冊的 UE
+    取得指定 UE 的 RTT 與流量時間序列
+
+    Args:
+        imsi: UE 的 IMSI 號碼
+        start: 起始時間
+        end: 結束時間
+        resolution: 解析度
 
     Returns:
-        所有 UE 的資訊列表
+        依時間排序的 RTT 平均值與吞吐量資料點
     """
     try:
         ue_service = app.state.ue_service
-        ues = await ue_service.list_all_ues()
+        timeseries = await ue_service.get_ue_timeseries(
+            imsi, start=start, end=end, resolution=resolution
+        )
+        return UETimeSeriesResponse(**timeseries)
 
-        return CustomJSONResponse(content=ues)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "時間序列查詢參數無效", "message": str(e)},
+        )
+    except Exception as e:
+        logger.error("取得 UE 時間序列失敗", imsi=imsi, error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "取得 UE 時間序列失敗", "message": str(e)},
+        )
+
+
+@app.get("/api/v1/ue", response_model=UEListResponse, tags=["UE 管理"])
+async def list_ues(
+    limit: int = Query(100, ge=1, le=1000, description="每頁筆數"),
+    after: Optional[str] = Query(
+        None, description="分頁游標，傳入上一頁回應的 next_cursor"
+    ),
+):
+    """
+    分頁列出已註冊的 UE
+
+    以 IMSI 排序做 keyset 分頁，回應中的 next_cursor 可作為下一次
+    請求的 after 參數，為 null 時表示已列出全部 UE。
+
+    Args:
+        limit: 每頁筆數 (1-1000)
+        after: 分頁游標
+
+    Returns:
+        本頁 UE 資訊列表與下一頁游標
+    """
+    try:
+        ue_service = app.state.ue_service
+        page = await ue_service.list_ues(limit=limit, after=after)
+
+        return FastJSONResponse(content=page)
 
     except Exception as e:
         logger.error("列出 UE 失敗", error=str(e))
@@ -324,6 +528,38 @@ async def list_ues():
         )
 
 
+@app.post(
+    "/api/v1/ue/bulk", response_model=BulkUERegistrationResponse, tags=["UE 管理"]
+)
+async def bulk_register_ues(request: BulkUERegistrationRequest):
+    """
+    批次註冊 UE
+
+    整批請求先完成格式驗證 (IMSI、K/OPc、Slice 類型、批次內 IMSI 不重複)，
+    再分段以無序批次寫入 MongoDB，單筆失敗不影響其他 UE。
+
+    Args:
+        request: 批次註冊請求
+
+    Returns:
+        批次註冊統計與逐筆結果
+    """
+    try:
+        ue_service = app.state.ue_service
+        result = await ue_service.bulk_register_ues(
+            [subscriber.dict() for subscriber in request.subscribers]
+        )
+
+        return CustomJSONResponse(content=result)
+
+    except Exception as e:
+        logger.error("批次註冊 UE 失敗", count=len(request.subscribers), error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "批次註冊 UE 失敗", "message": str(e)},
+        )
+
+
 # ===== Slice 管理端點 =====
 
 
@@ -441,6 +677,86 @@ async def switch_slice(request: SliceSwitchRequest):
         )
 
 
+@app.post(
+    "/api/v1/slice/switch/bulk",
+    response_model=BulkSliceSwitchResponse,
+    tags=["Slice 管理"],
+)
+async def bulk_switch_slice(request: BulkSliceSwitchRequest):
+    """
+    批次切換多個 UE 的 Network Slice
+
+    適用於整個 UAV 編隊在 eMBB 與 uRLLC 之間切換，
+    回傳每個 IMSI 的切換結果。
+
+    Args:
+        request: 批次 Slice 切換請求，包含 IMSI 列表和目標 Slice
+
+    Returns:
+        批次切換統計與逐筆結果
+    """
+    try:
+        slice_service = app.state.slice_service
+
+        logger.info(
+            "收到批次 Slice 切換請求",
+            count=len(request.imsis),
+            target_slice=request.target_slice,
+        )
+
+        result = await slice_service.bulk_switch_slice(
+            imsis=request.imsis, target_slice=SliceType(request.target_slice)
+        )
+
+        for item in result["results"]:
+            SLICE_SWITCH_COUNT.labels(
+                from_slice=item.get("previous_slice") or "unknown",
+                to_slice=request.target_slice,
+                status="success" if item["success"] else "error",
+            ).inc()
+
+        return CustomJSONResponse(content=result)
+
+    except Exception as e:
+        logger.error(
+            "批次 Slice 切換失敗",
+            count=len(request.imsis),
+            target_slice=request.target_slice,
+            error=str(e),
+        )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "批次 Slice 切換失敗", "message": str(e)},
+        )
+
+
+@app.get("/api/v1/slice/statistics", tags=["Slice 管理"])
+async def get_slice_statistics(
+    slice_type: Optional[SliceType] = Query(
+        None, description="指定 Slice 類型，未指定時回傳所有 Slice"
+    ),
+):
+    """
+    取得 Slice 統計資訊
+
+    Args:
+        slice_type: Slice 類型
+
+    Returns:
+        各 Slice 的活躍 UE 數、24 小時切換次數與 RTT 分位數
+    """
+    slice_service = app.state.slice_service
+    result = await slice_service.get_slice_statistics(slice_type)
+
+    if not result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "取得 Slice 統計失敗", "message": result.get("error")},
+        )
+
+    return FastJSONResponse(content=result)
+
+
 @app.get("/api/v1/slice/types", tags=["Slice 管理"])
 async def get_slice_types():
     """
@@ -522,6 +838,63 @@ async def generate_ueransim_config(request: UERANSIMConfigRequest):
         )
 
 
+@app.post("/api/v1/ueransim/config/generate/batch", tags=["UERANSIM 配置"])
+async def generate_ueransim_configs(request: UERANSIMBatchConfigRequest):
+    """
+    批次生成UERANSIM配置，以 NDJSON 串流回傳
+
+    幾何計算與YAML序列化在行程池中平行執行，結果依完成順序逐行寫出，
+    每行包含該請求在列表中的索引 (index) 與生成結果。
+
+    Args:
+        request: 批次配置生成請求
+
+    Returns:
+        application/x-ndjson 串流回應
+    """
+    ueransim_service = app.state.ueransim_service
+
+    logger.info("收到UERANSIM批次配置生成請求", count=len(request.requests))
+
+    async def ndjson_lines():
+        async for index, result in ueransim_service.generate_configs(request.requests):
+            yield dumps_json({"index": index, **result.dict()}) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/api/v1/ueransim/satellite-pass/simulate", tags=["UERANSIM 配置"])
+async def simulate_satellite_pass(request: SatellitePassSimulationRequest):
+    """
+    以 NDJSON 串流回傳LEO衛星過境的時序配置
+
+    依軌道參數與時間窗，以固定步長產生整個過境期間每個時間步的
+    gNB/UE 參數（距離、路徑損耗、調整後的發射功率），每行一個時間步。
+    一次請求即可取得完整過境序列，不需逐時間點呼叫配置生成端點。
+
+    Args:
+        request: 過境模擬請求
+
+    Returns:
+        application/x-ndjson 串流回應
+    """
+    ueransim_service = app.state.ueransim_service
+
+    logger.info(
+        "收到衛星過境模擬請求",
+        satellite_id=request.satellite_id,
+        uav_id=request.uav.id,
+        duration_seconds=request.duration_seconds,
+        step_ms=request.step_ms,
+    )
+
+    async def ndjson_lines():
+        async for steps in ueransim_service.iter_satellite_pass(request):
+            yield b"".join(dumps_json(step) + b"\n" for step in steps)
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
 @app.get("/api/v1/ueransim/templates", tags=["UERANSIM 配置"])
 async def get_ueransim_templates():
     """
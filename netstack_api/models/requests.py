@@ -4,7 +4,7 @@ NetStack API 請求模型
 定義 API 端點的請求資料結構
 """
 
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, validator
 
 
@@ -43,6 +43,42 @@ class SliceSwitchRequest(BaseModel):
         return v
 
 
+class BulkSliceSwitchRequest(BaseModel):
+    """批次 Slice 切換請求"""
+    
+    imsis: List[str] = Field(
+        ...,
+        description="UE 的 IMSI 號碼列表",
+        example=["999700000000001", "999700000000002"],
+        min_items=1,
+        max_items=10000
+    )
+    
+    target_slice: str = Field(
+        ...,
+        description="目標 Slice 類型",
+        example="uRLLC"
+    )
+    
+    @validator('imsis')
+    def validate_imsis(cls, v):
+        """驗證 IMSI 格式並移除重複項目"""
+        for imsi in v:
+            if len(imsi) != 15 or not imsi.isdigit():
+                raise ValueError(f'IMSI 必須為 15 位數字: {imsi}')
+            if not imsi.startswith('999700'):
+                raise ValueError(f'IMSI 必須以 999700 開頭: {imsi}')
+        return list(dict.fromkeys(v))
+    
+    @validator('target_slice')
+    def validate_target_slice(cls, v):
+        """驗證目標 Slice"""
+        allowed_slices = ['eMBB', 'uRLLC']
+        if v not in allowed_slices:
+            raise ValueError(f'目標 Slice 必須為 {allowed_slices} 之一')
+        return v
+
+
 class UERegistrationRequest(BaseModel):
     """UE 註冊請求"""
     
@@ -76,6 +112,24 @@ class UERegistrationRequest(BaseModel):
         example="eMBB"
     )
     
+    @validator('imsi')
+    def validate_imsi(cls, v):
+        """驗證 IMSI 格式"""
+        if len(v) != 15 or not v.isdigit():
+            raise ValueError('IMSI 必須為 15 位數字')
+        return v
+    
+    @validator('key', 'opc')
+    def validate_hex_key(cls, v):
+        """驗證 K / OPc 為 128-bit 十六進位字串"""
+        if len(v) != 32:
+            raise ValueError('K 與 OPc 必須為 32 個十六進位字元')
+        try:
+            int(v, 16)
+        except ValueError:
+            raise ValueError('K 與 OPc 必須為十六進位字串')
+        return v
+    
     @validator('slice_type')
     def validate_slice_type(cls, v):
         """驗證 Slice 類型"""
@@ -85,6 +139,30 @@ class UERegistrationRequest(BaseModel):
         return v
 
 
+class BulkUERegistrationRequest(BaseModel):
+    """批次 UE 註冊請求"""
+    
+    subscribers: List[UERegistrationRequest] = Field(
+        ...,
+        description="要註冊的 UE 列表",
+        min_items=1,
+        max_items=50000
+    )
+    
+    @validator('subscribers')
+    def validate_unique_imsi(cls, v):
+        """驗證批次內 IMSI 不重複"""
+        seen = set()
+        duplicates = set()
+        for subscriber in v:
+            if subscriber.imsi in seen:
+                duplicates.add(subscriber.imsi)
+            seen.add(subscriber.imsi)
+        if duplicates:
+            raise ValueError(f'批次內 IMSI 重複: {sorted(duplicates)}')
+        return v
+
+
 class UEUpdateRequest(BaseModel):
     """UE 更新請求"""
     
@@ -19,6 +19,10 @@ class HealthResponse(BaseModel):
         description="檢查時間 (ISO 8601 格式)",
     )
 
+    snapshot_age: Optional[float] = Field(
+        None, description="健康快照產生至今的秒數", example=1.234
+    )
+
     services: Dict[str, Dict[str, Any]] = Field(
         ...,
         description="各服務健康狀態",
@@ -62,6 +66,44 @@ class UEInfoResponse(BaseModel):
     created_at: str = Field(..., description="註冊時間 (ISO 8601 格式)")
 
 
+class UEListResponse(BaseModel):
+    """UE 分頁列表回應"""
+
+    ues: List[UEInfoResponse] = Field(..., description="本頁 UE 資訊列表")
+
+    count: int = Field(..., description="本頁 UE 數量", example=100)
+
+    limit: int = Field(..., description="每頁筆數上限", example=100)
+
+    next_cursor: Optional[str] = Field(
+        None,
+        description="下一頁游標 (傳入 after 參數)，為 null 表示已無下一頁",
+        example="999700000000100",
+    )
+
+
+class BulkItemResult(BaseModel):
+    """批次操作的單筆結果"""
+
+    imsi: str = Field(..., description="UE 的 IMSI 號碼", example="999700000000001")
+
+    success: bool = Field(..., description="是否成功", example=True)
+
+    error: Optional[str] = Field(None, description="失敗原因")
+
+
+class BulkUERegistrationResponse(BaseModel):
+    """批次 UE 註冊回應"""
+
+    total: int = Field(..., description="請求的 UE 數量", example=1000)
+
+    created: int = Field(..., description="成功建立的 UE 數量", example=998)
+
+    failed: int = Field(..., description="建立失敗的 UE 數量", example=2)
+
+    results: List[BulkItemResult] = Field(..., description="逐筆結果 (與請求順序相同)")
+
+
 class UEStatsResponse(BaseModel):
     """UE 統計資訊回應"""
 
@@ -84,6 +126,40 @@ class UEStatsResponse(BaseModel):
     )
 
 
+class TimeSeriesPoint(BaseModel):
+    """時間序列資料點"""
+
+    timestamp: str = Field(..., description="桶起始時間 (ISO 8601 格式)")
+
+    rtt_avg_ms: Optional[float] = Field(
+        None, description="平均往返延遲 (毫秒)，無樣本時為 null", example=12.5
+    )
+
+    rtt_samples: int = Field(0, description="RTT 樣本數", example=60)
+
+    bytes_uploaded: int = Field(0, description="上傳位元組數", example=1048576)
+
+    bytes_downloaded: int = Field(0, description="下載位元組數", example=5242880)
+
+    throughput_bps: float = Field(0, description="平均吞吐量 (bps)", example=699050.7)
+
+
+class UETimeSeriesResponse(BaseModel):
+    """UE 時間序列回應"""
+
+    imsi: str = Field(..., description="UE IMSI", example="999700000000001")
+
+    resolution: str = Field(..., description="解析度 (1s/1m/1h)", example="1m")
+
+    step_seconds: int = Field(..., description="桶寬 (秒)", example=60)
+
+    start: str = Field(..., description="查詢起始時間")
+
+    end: str = Field(..., description="查詢結束時間")
+
+    points: List[TimeSeriesPoint] = Field(..., description="依時間排序的非空資料點")
+
+
 class SliceSwitchResponse(BaseModel):
     """Slice 切換回應"""
 
@@ -103,6 +179,34 @@ class SliceSwitchResponse(BaseModel):
     message: str = Field(..., description="切換結果訊息", example="Slice 切換成功")
 
 
+class BulkSliceSwitchItemResult(BulkItemResult):
+    """批次 Slice 切換的單筆結果"""
+
+    previous_slice: Optional[str] = Field(None, description="切換前的 Slice 類型")
+
+    current_slice: Optional[str] = Field(None, description="目前的 Slice 類型")
+
+    message: Optional[str] = Field(None, description="結果訊息")
+
+
+class BulkSliceSwitchResponse(BaseModel):
+    """批次 Slice 切換回應"""
+
+    target_slice: str = Field(..., description="目標 Slice 類型", example="uRLLC")
+
+    total: int = Field(..., description="請求的 UE 數量", example=100)
+
+    succeeded: int = Field(..., description="切換成功的 UE 數量", example=99)
+
+    failed: int = Field(..., description="切換失敗的 UE 數量", example=1)
+
+    switch_time: float = Field(..., description="批次切換耗時 (秒)", example=0.12)
+
+    results: List[BulkSliceSwitchItemResult] = Field(
+        ..., description="逐筆結果 (與請求順序相同)"
+    )
+
+
 class ErrorResponse(BaseModel):
     """錯誤回應"""
 
@@ -2,8 +2,9 @@
 UERANSIM動態配置相關的數據模型
 """
 
+from datetime import datetime
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from enum import Enum
 
 
@@ -60,6 +61,14 @@ class HandoverParameters(BaseModel):
     time_to_trigger: int = Field(320, description="觸發時間(ms)")
 
 
+class DeltaThresholds(BaseModel):
+    """增量配置的鏈路參數變更閾值，變化低於閾值時不回傳"""
+
+    path_loss_db: float = Field(0.5, ge=0, description="路徑損耗變化閾值(dB)")
+    distance_km: float = Field(1.0, ge=0, description="斜距變化閾值(公里)")
+    elevation_deg: float = Field(0.5, ge=0, description="仰角變化閾值(度)")
+
+
 class UERANSIMConfigRequest(BaseModel):
     """UERANSIM配置生成請求"""
 
@@ -73,8 +82,25 @@ class UERANSIMConfigRequest(BaseModel):
     )
     uav: Optional[UAVPosition] = Field(None, description="無人機位置")
     uav_formation: Optional[List[UAVPosition]] = Field(None, description="無人機編隊")
+    visible_satellites: Optional[List[SatellitePosition]] = Field(
+        None, description="可見衛星列表(編隊場景依此為每架無人機選擇服務衛星)"
+    )
     network_params: Optional[NetworkParameters] = Field(None, description="網絡參數")
     handover_params: Optional[HandoverParameters] = Field(None, description="切換參數")
+    delta: bool = Field(
+        False, description="位置更新場景只回傳相對上次配置的差異(增量模式)"
+    )
+    delta_thresholds: Optional[DeltaThresholds] = Field(
+        None, description="增量模式的變更閾值"
+    )
+
+
+class UERANSIMBatchConfigRequest(BaseModel):
+    """UERANSIM批次配置生成請求"""
+
+    requests: List[UERANSIMConfigRequest] = Field(
+        ..., min_items=1, max_items=5000, description="配置生成請求列表"
+    )
 
 
 class GNBConfig(BaseModel):
@@ -126,9 +152,56 @@ class UERANSIMConfigResponse(BaseModel):
     ue_configs: Optional[List[UEConfig]] = Field(None, description="多個UE配置")
     scenario_info: ScenarioInfo = Field(..., description="場景信息")
     config_yaml: Optional[str] = Field(None, description="生成的YAML配置")
+    config_patch: Optional[Dict[str, Any]] = Field(
+        None, description="增量模式下相對上次配置的變更欄位，空物件表示無需變更"
+    )
     message: Optional[str] = Field(None, description="回應消息")
 
 
+# 單次過境模擬允許的最大時間步數 (含起點，約 1 小時 @ 10 ms)
+MAX_PASS_SIMULATION_STEPS = 360000
+
+
+def pass_simulation_step_count(duration_seconds: float, step_ms: int) -> int:
+    """過境模擬的時間步數，包含起點與終點"""
+    return int(duration_seconds * 1000 // step_ms) + 1
+
+
+class OrbitParameters(BaseModel):
+    """圓軌道參數"""
+
+    altitude: float = Field(550, gt=0, le=2000, description="軌道高度(公里)")
+    inclination: float = Field(53, ge=0, le=180, description="軌道傾角(度)")
+    raan: float = Field(0, ge=0, lt=360, description="起始時間的升交點經度(度)")
+    arg_latitude: float = Field(0, ge=0, lt=360, description="起始時間的緯度幅角(度)")
+
+
+class SatellitePassSimulationRequest(BaseModel):
+    """LEO衛星過境時序模擬請求"""
+
+    satellite_id: str = Field("SAT-LEO-001", description="衛星識別碼")
+    orbit: OrbitParameters = Field(..., description="軌道參數")
+    uav: UAVPosition = Field(..., description="無人機位置")
+    network_params: Optional[NetworkParameters] = Field(None, description="網絡參數")
+    start_time: Optional[datetime] = Field(None, description="起始時間(預設為目前時間)")
+    duration_seconds: float = Field(600, gt=0, le=3600, description="模擬時長(秒)")
+    step_ms: int = Field(100, ge=10, le=60000, description="時間步長(毫秒)")
+    min_elevation: float = Field(10, ge=0, le=90, description="視為可見的最低仰角(度)")
+
+    @validator("step_ms")
+    def validate_step_count(cls, v, values):
+        """限制單次模擬的時間步數"""
+        duration = values.get("duration_seconds")
+        if (
+            duration is not None
+            and pass_simulation_step_count(duration, v) > MAX_PASS_SIMULATION_STEPS
+        ):
+            raise ValueError(
+                f"時間步數超過上限 {MAX_PASS_SIMULATION_STEPS}，請增加步長或縮短時長"
+            )
+        return v
+
+
 class ConfigTemplateInfo(BaseModel):
     """配置模板信息"""
 
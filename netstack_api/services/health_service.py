@@ -4,52 +4,188 @@
 整合各適配器的健康狀態檢查
 """
 
+import asyncio
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Awaitable, Dict, Optional
 
 import structlog
 
 from ..adapters.mongo_adapter import MongoAdapter
+from ..adapters.open5gs_adapter import Open5GSAdapter
 from ..adapters.redis_adapter import RedisAdapter
 
 logger = structlog.get_logger(__name__)
 
+# 決定整體健康狀態的必要服務；其餘服務 (例如 open5gs) 僅回報狀態
+CRITICAL_SERVICES = ("mongodb", "redis")
+
 
 class HealthService:
     """健康檢查服務"""
 
-    def __init__(self, mongo_adapter: MongoAdapter, redis_adapter: RedisAdapter):
+    def __init__(
+        self,
+        mongo_adapter: MongoAdapter,
+        redis_adapter: RedisAdapter,
+        open5gs_adapter: Optional[Open5GSAdapter] = None,
+        check_timeout: float = 5.0,
+        refresh_interval: float = 5.0,
+        max_staleness: float = 15.0,
+    ):
         """
         初始化健康檢查服務
 
         Args:
             mongo_adapter: MongoDB 適配器
             redis_adapter: Redis 適配器
+            open5gs_adapter: Open5GS 適配器，None 表示不檢查核心網服務
+            check_timeout: 單一服務健康檢查的期限 (秒)
+            refresh_interval: 背景更新健康快照的間隔 (秒)
+            max_staleness: 健康快照可被使用的最長時間 (秒)，超過則同步重新檢查
         """
         self.mongo_adapter = mongo_adapter
         self.redis_adapter = redis_adapter
+        self.open5gs_adapter = open5gs_adapter
+        self.check_timeout = check_timeout
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start_background_refresh(self) -> None:
+        """建立第一份健康快照並啟動背景更新任務"""
+        await self.refresh_snapshot()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+            logger.info(
+                "健康快照背景更新已啟動",
+                refresh_interval=self.refresh_interval,
+                max_staleness=self.max_staleness,
+            )
+
+    async def stop_background_refresh(self) -> None:
+        """停止背景更新任務"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+            logger.info("健康快照背景更新已停止")
+
+    async def _refresh_loop(self) -> None:
+        """定期更新健康快照"""
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh_snapshot()
+            except Exception as e:
+                logger.error("更新健康快照失敗", error=str(e))
+
+    async def refresh_snapshot(self) -> Dict[str, Any]:
+        """
+        立即檢查系統健康狀態並更新快照
+
+        Returns:
+            最新的系統健康狀態報告
+        """
+        snapshot = await self._compute_system_health()
+        self._snapshot = snapshot
+        self._snapshot_at = time.monotonic()
+        return snapshot
+
+    async def _get_snapshot(self) -> Dict[str, Any]:
+        """
+        取得健康快照
+
+        快照未超過 max_staleness 時直接回傳；否則同步重新檢查，
+        並以鎖確保同時只有一個請求觸發後端檢查。
+        """
+        if self._is_snapshot_fresh():
+            return self._snapshot
+
+        async with self._refresh_lock:
+            if self._is_snapshot_fresh():
+                return self._snapshot
+            return await self.refresh_snapshot()
+
+    def _is_snapshot_fresh(self) -> bool:
+        """檢查快照是否仍在有效期限內"""
+        return (
+            self._snapshot is not None
+            and time.monotonic() - self._snapshot_at <= self.max_staleness
+        )
+
+    async def _check_with_deadline(
+        self, service_name: str, check: Awaitable[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """在期限內執行單一服務的健康檢查，逾時或異常時回傳 unhealthy"""
+        try:
+            return await asyncio.wait_for(check, timeout=self.check_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "服務健康檢查逾時", service=service_name, timeout=self.check_timeout
+            )
+            return {"status": "unhealthy", "error": "timeout"}
+        except Exception as e:
+            return {"status": "unhealthy", "error": str(e)}
+
+    async def _gather_service_health(self) -> Dict[str, Dict[str, Any]]:
+        """並行檢查 MongoDB、Redis 與 Open5GS 的健康狀態"""
+        checks = {
+            "mongodb": self.mongo_adapter.health_check(),
+            "redis": self.redis_adapter.health_check(),
+        }
+        if self.open5gs_adapter is not None:
+            checks["open5gs"] = self.open5gs_adapter.health_check()
+
+        results = await asyncio.gather(
+            *(
+                self._check_with_deadline(service_name, check)
+                for service_name, check in checks.items()
+            )
+        )
+        return dict(zip(checks.keys(), results))
 
     async def check_system_health(self) -> Dict[str, Any]:
         """
         檢查整個系統的健康狀態
 
+        由健康快照提供，快照的更新時間見 timestamp 與 snapshot_age 欄位。
+
         Returns:
             系統健康狀態報告
         """
-        try:
-            # 檢查各服務健康狀態
-            mongo_health = await self.mongo_adapter.health_check()
-            redis_health = await self.redis_adapter.health_check()
+        snapshot = await self._get_snapshot()
+        return {
+            **snapshot,
+            "snapshot_age": round(time.monotonic() - self._snapshot_at, 3),
+        }
+
+    async def _compute_system_health(self) -> Dict[str, Any]:
+        """
+        實際檢查各服務並產生系統健康狀態報告
 
-            # 計算整體健康狀態
-            services = {"mongodb": mongo_health, "redis": redis_health}
+        Returns:
+            系統健康狀態報告
+        """
+        try:
+            # 並行檢查各服務健康狀態
+            services = await self._gather_service_health()
 
-            # 判斷整體狀態
+            # 判斷整體狀態 (僅計入必要服務)
             healthy_services = sum(
-                1 for service in services.values() if service.get("status") == "healthy"
+                1
+                for service_name in CRITICAL_SERVICES
+                if services[service_name].get("status") == "healthy"
             )
 
-            total_services = len(services)
+            total_services = len(CRITICAL_SERVICES)
 
             if healthy_services == total_services:
                 overall_status = "healthy"
@@ -84,13 +220,15 @@ class HealthService:
             資料庫連接狀態
         """
         try:
-            mongo_health = await self.mongo_adapter.health_check()
+            snapshot = await self._get_snapshot()
+            mongo_health = snapshot.get("services", {}).get("mongodb", {})
 
             return {
                 "status": mongo_health.get("status", "unknown"),
                 "response_time": mongo_health.get("response_time", 0),
                 "database": mongo_health.get("database", "open5gs"),
-                "timestamp": datetime.now().isoformat(),
+                "indexes": mongo_health.get("indexes", {}),
+                "timestamp": snapshot["timestamp"],
             }
 
         except Exception as e:
@@ -109,7 +247,8 @@ class HealthService:
             快取連接狀態
         """
         try:
-            redis_health = await self.redis_adapter.health_check()
+            snapshot = await self._get_snapshot()
+            redis_health = snapshot.get("services", {}).get("redis", {})
 
             return {
                 "status": redis_health.get("status", "unknown"),
@@ -117,7 +256,7 @@ class HealthService:
                 "version": redis_health.get("version", "unknown"),
                 "memory_usage": redis_health.get("memory_usage", "unknown"),
                 "connected_clients": redis_health.get("connected_clients", 0),
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": snapshot["timestamp"],
             }
 
         except Exception as e:
@@ -136,17 +275,18 @@ class HealthService:
             服務指標資料
         """
         try:
-            # 取得 MongoDB 統計
-            mongo_health = await self.mongo_adapter.health_check()
-
-            # 取得 Redis 統計
-            redis_health = await self.redis_adapter.health_check()
+            # 由健康快照取得 MongoDB 與 Redis 統計
+            snapshot = await self._get_snapshot()
+            services = snapshot.get("services", {})
+            mongo_health = services.get("mongodb", {})
+            redis_health = services.get("redis", {})
 
             return {
                 "mongodb": {
                     "status": mongo_health.get("status"),
                     "response_time_ms": mongo_health.get("response_time", 0) * 1000,
                     "database": mongo_health.get("database"),
+                    "index_status": mongo_health.get("indexes", {}).get("status"),
                 },
                 "redis": {
                     "status": redis_health.get("status"),
@@ -155,7 +295,7 @@ class HealthService:
                     "connected_clients": redis_health.get("connected_clients"),
                     "version": redis_health.get("version"),
                 },
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": snapshot["timestamp"],
             }
 
         except Exception as e:
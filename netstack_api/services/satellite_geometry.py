@@ -0,0 +1,258 @@
+"""
+衛星-UAV 批次幾何計算
+
+以 NumPy 一次計算 N 顆衛星 × M 架 UAV 的斜距、仰角、方位角、
+大圓地面距離與自由空間路徑損耗。座標以 WGS84 橢球轉換為 ECEF，
+所有函式皆接受任意可廣播的陣列。
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from ..models.ueransim_models import SatellitePosition, UAVPosition
+
+# WGS84 橢球參數 (公里)
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+# 平均地球半徑 (公里)，用於大圓距離
+EARTH_MEAN_RADIUS_KM = 6371.0088
+# 地心引力常數 (km^3/s^2) 與地球自轉角速度 (rad/s)
+EARTH_MU_KM3_S2 = 398600.4418
+EARTH_ROTATION_RAD_S = 7.2921159e-5
+
+
+def geodetic_to_ecef(
+    latitude_deg: np.ndarray, longitude_deg: np.ndarray, altitude_km: np.ndarray
+) -> np.ndarray:
+    """
+    將大地座標轉換為 ECEF 座標
+
+    Args:
+        latitude_deg: 緯度 (度)
+        longitude_deg: 經度 (度)
+        altitude_km: 橢球高 (公里)
+
+    Returns:
+        形狀為 (..., 3) 的 ECEF 座標 (公里)
+    """
+    lat = np.radians(latitude_deg)
+    lon = np.radians(longitude_deg)
+    sin_lat = np.sin(lat)
+    cos_lat = np.cos(lat)
+    # 卯酉圈曲率半徑
+    n = WGS84_A_KM / np.sqrt(1 - WGS84_E2 * sin_lat**2)
+
+    x = (n + altitude_km) * cos_lat * np.cos(lon)
+    y = (n + altitude_km) * cos_lat * np.sin(lon)
+    z = (n * (1 - WGS84_E2) + altitude_km) * sin_lat
+    return np.stack(np.broadcast_arrays(x, y, z), axis=-1)
+
+
+def great_circle_distance_km(
+    lat1_deg: np.ndarray,
+    lon1_deg: np.ndarray,
+    lat2_deg: np.ndarray,
+    lon2_deg: np.ndarray,
+) -> np.ndarray:
+    """以 haversine 公式計算大圓地面距離 (公里)"""
+    lat1 = np.radians(lat1_deg)
+    lat2 = np.radians(lat2_deg)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2_deg) - np.radians(lon1_deg)
+
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_MEAN_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def free_space_path_loss_db(
+    distance_km: np.ndarray, frequency_mhz: float
+) -> np.ndarray:
+    """
+    計算自由空間路徑損耗 (dB)
+
+    FSPL = 20·log10(d[m]) + 20·log10(f[MHz]) - 27.55，
+    等同於 20·log10(d[km]) + 20·log10(f[MHz]) + 32.45。距離不大於 0 時回傳 0。
+    """
+    distance_km = np.asarray(distance_km, dtype=float)
+    with np.errstate(divide="ignore"):
+        loss = 20 * np.log10(distance_km * 1000) + 20 * np.log10(frequency_mhz) - 27.55
+    return np.where(distance_km > 0, loss, 0.0)
+
+
+def link_geometry_from_ecef(
+    sat_ecef: np.ndarray,
+    ue_lat: np.ndarray,
+    ue_lon: np.ndarray,
+    ue_alt_km: np.ndarray,
+    frequency_mhz: float,
+) -> Dict[str, np.ndarray]:
+    """
+    由衛星 ECEF 座標計算到終端的斜距、仰角、方位角與路徑損耗
+
+    Args:
+        sat_ecef: 形狀為 (..., 3) 的衛星 ECEF 座標 (公里)
+        ue_lat, ue_lon, ue_alt_km: 可與 sat_ecef[..., 0] 廣播的終端位置
+        frequency_mhz: 載波頻率 (MHz)
+
+    Returns:
+        distance_km、elevation_deg、azimuth_deg 與 path_loss_db 陣列
+    """
+    # 視線向量
+    los = sat_ecef - geodetic_to_ecef(ue_lat, ue_lon, ue_alt_km)
+    distance_km = np.linalg.norm(los, axis=-1)
+
+    # 終端所在位置的東-北-天 (ENU) 單位向量
+    lat = np.radians(ue_lat)
+    lon = np.radians(ue_lon)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    los_east = -sin_lon * los[..., 0] + cos_lon * los[..., 1]
+    los_north = (
+        -sin_lat * cos_lon * los[..., 0]
+        - sin_lat * sin_lon * los[..., 1]
+        + cos_lat * los[..., 2]
+    )
+    los_up = (
+        cos_lat * cos_lon * los[..., 0]
+        + cos_lat * sin_lon * los[..., 1]
+        + sin_lat * los[..., 2]
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        elevation_deg = np.degrees(np.arcsin(np.clip(los_up / distance_km, -1.0, 1.0)))
+    elevation_deg = np.where(distance_km > 0, elevation_deg, 90.0)
+    azimuth_deg = np.degrees(np.arctan2(los_east, los_north)) % 360
+
+    return {
+        "distance_km": distance_km,
+        "elevation_deg": elevation_deg,
+        "azimuth_deg": azimuth_deg,
+        "path_loss_db": free_space_path_loss_db(distance_km, frequency_mhz),
+    }
+
+
+def compute_link_geometry(
+    sat_lat: np.ndarray,
+    sat_lon: np.ndarray,
+    sat_alt_km: np.ndarray,
+    ue_lat: np.ndarray,
+    ue_lon: np.ndarray,
+    ue_alt_km: np.ndarray,
+    frequency_mhz: float,
+) -> Dict[str, np.ndarray]:
+    """
+    計算 N 顆衛星 × M 個地面/空中終端的鏈路幾何
+
+    Args:
+        sat_lat, sat_lon, sat_alt_km: 長度為 N 的衛星緯度、經度 (度) 與高度 (公里)
+        ue_lat, ue_lon, ue_alt_km: 長度為 M 的終端緯度、經度 (度) 與高度 (公里)
+        frequency_mhz: 載波頻率 (MHz)
+
+    Returns:
+        各項形狀為 (N, M) 的陣列：distance_km (斜距)、elevation_deg、
+        azimuth_deg、ground_distance_km 與 path_loss_db
+    """
+    sat_lat = np.atleast_1d(np.asarray(sat_lat, dtype=float))[:, None]
+    sat_lon = np.atleast_1d(np.asarray(sat_lon, dtype=float))[:, None]
+    sat_alt_km = np.atleast_1d(np.asarray(sat_alt_km, dtype=float))[:, None]
+    ue_lat = np.atleast_1d(np.asarray(ue_lat, dtype=float))[None, :]
+    ue_lon = np.atleast_1d(np.asarray(ue_lon, dtype=float))[None, :]
+    ue_alt_km = np.atleast_1d(np.asarray(ue_alt_km, dtype=float))[None, :]
+
+    links = link_geometry_from_ecef(
+        geodetic_to_ecef(sat_lat, sat_lon, sat_alt_km),
+        ue_lat,
+        ue_lon,
+        ue_alt_km,
+        frequency_mhz,
+    )
+    links["ground_distance_km"] = great_circle_distance_km(
+        sat_lat, sat_lon, ue_lat, ue_lon
+    )
+    return links
+
+
+def compute_position_links(
+    satellites: Sequence[SatellitePosition],
+    uavs: Sequence[UAVPosition],
+    frequency_mhz: float,
+) -> Dict[str, np.ndarray]:
+    """
+    由位置模型計算 N 顆衛星 × M 架 UAV 的鏈路幾何
+
+    衛星高度單位為公里，UAV 高度單位為公尺。
+    """
+    return compute_link_geometry(
+        [sat.latitude for sat in satellites],
+        [sat.longitude for sat in satellites],
+        [sat.altitude for sat in satellites],
+        [uav.latitude for uav in uavs],
+        [uav.longitude for uav in uavs],
+        np.asarray([uav.altitude for uav in uavs], dtype=float) / 1000,
+        frequency_mhz,
+    )
+
+
+def propagate_circular_orbit(
+    t_seconds: np.ndarray,
+    altitude_km: float,
+    inclination_deg: float,
+    raan_deg: float,
+    arg_latitude_deg: float,
+) -> np.ndarray:
+    """
+    以二體圓軌道一次傳播所有時間點的衛星位置
+
+    t=0 時慣性座標與 ECEF 對齊，之後依地球自轉角速度旋轉。
+
+    Args:
+        t_seconds: 相對起始時間的時間點 (秒)
+        altitude_km: 軌道高度 (公里，以赤道半徑為基準)
+        inclination_deg: 軌道傾角 (度)
+        raan_deg: 升交點赤經 (度)
+        arg_latitude_deg: 起始時間的緯度幅角 (度)
+
+    Returns:
+        形狀為 (T, 3) 的 ECEF 座標 (公里)
+    """
+    t = np.asarray(t_seconds, dtype=float)
+    radius = WGS84_A_KM + altitude_km
+    mean_motion = np.sqrt(EARTH_MU_KM3_S2 / radius**3)
+
+    u = np.radians(arg_latitude_deg) + mean_motion * t
+    inc = np.radians(inclination_deg)
+    # 升交點經度隨地球自轉向西漂移
+    node = np.radians(raan_deg) - EARTH_ROTATION_RAD_S * t
+
+    cos_u, sin_u = np.cos(u), np.sin(u)
+    cos_node, sin_node = np.cos(node), np.sin(node)
+    x = radius * (cos_node * cos_u - sin_node * sin_u * np.cos(inc))
+    y = radius * (sin_node * cos_u + cos_node * sin_u * np.cos(inc))
+    z = radius * sin_u * np.sin(inc)
+    return np.stack([x, y, z], axis=-1)
+
+
+def ecef_to_geodetic(ecef: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    將 ECEF 座標轉換為大地座標 (Bowring 近似)
+
+    Returns:
+        緯度 (度)、經度 (度) 與橢球高 (公里)
+    """
+    x, y, z = ecef[..., 0], ecef[..., 1], ecef[..., 2]
+    b = WGS84_A_KM * (1 - WGS84_F)
+    ep2 = (WGS84_A_KM**2 - b**2) / b**2
+    p = np.hypot(x, y)
+    theta = np.arctan2(z * WGS84_A_KM, p * b)
+
+    lat = np.arctan2(
+        z + ep2 * b * np.sin(theta) ** 3,
+        p - WGS84_E2 * WGS84_A_KM * np.cos(theta) ** 3,
+    )
+    lon = np.arctan2(y, x)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    # 不除以 cos(lat)，在極區仍保持數值穩定 (a²/N = a·sqrt(1 - e²·sin²φ))
+    alt = p * cos_lat + z * sin_lat - WGS84_A_KM * np.sqrt(1 - WGS84_E2 * sin_lat**2)
+    return np.degrees(lat), np.degrees(lon), alt
@@ -7,14 +7,14 @@ NetStack Slice Service - 5G 網路切片管理服務
 
 import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum
 
 import structlog
 from prometheus_client import Counter, Histogram
 
-from ..adapters.mongo_adapter import MongoAdapter
+from ..adapters.mongo_adapter import SUBSCRIBER_SUMMARY_PROJECTION, MongoAdapter
 from ..adapters.open5gs_adapter import Open5GSAdapter
 from ..adapters.redis_adapter import RedisAdapter
 
@@ -107,6 +107,7 @@ class SliceService:
         self.open5gs_adapter = open5gs_adapter
         self.redis_adapter = redis_adapter
         self.logger = logger.bind(service="slice_service")
+        self._reconcile_task: Optional[asyncio.Task] = None
 
     async def switch_slice(
         self, imsi: str, target_slice: SliceType, force: bool = False
@@ -156,7 +157,10 @@ class SliceService:
                 )
 
             # 4. 更新 UE 記錄
-            await self._update_ue_slice_info(imsi, target_slice, switch_result)
+            await self._update_ue_slice_info(imsi, target_slice, switch_result, ue_info)
+            await self.redis_adapter.record_slice_switch(
+                imsi, current_slice or "none", target_slice.value
+            )
 
             # 5. 記錄指標
             SLICE_SWITCH_COUNTER.labels(
@@ -188,7 +192,7 @@ class SliceService:
         except Exception as e:
             # 記錄失敗指標
             SLICE_SWITCH_COUNTER.labels(
-                from_slice=current_slice or "unknown",
+                from_slice=current_slice or "none",
                 to_slice=target_slice.value,
                 status="error",
             ).inc()
@@ -205,6 +209,189 @@ class SliceService:
                 "error": str(e),
             }
 
+    async def bulk_switch_slice(
+        self,
+        imsis: List[str],
+        target_slice: SliceType,
+        force: bool = False,
+        max_concurrency: int = 50,
+    ) -> Dict:
+        """
+        批次切換多個 UE 的網路切片
+
+        以一次 $in 查詢取得所有 UE，NF 呼叫以有限併發數並行執行，
+        MongoDB 以一次 bulk_write 寫入，UE 資訊快取以交易 pipeline 直接刷新。
+
+        Args:
+            imsis: UE 的 IMSI 列表
+            target_slice: 目標切片類型
+            force: 是否強制切換（忽略當前狀態）
+            max_concurrency: NF 呼叫的最大併發數
+
+        Returns:
+            批次切換結果字典，包含逐筆結果
+        """
+        start_time = datetime.utcnow()
+        target_config = SliceConfig.get_config(target_slice)
+        results: Dict[str, Dict] = {
+            imsi: {"imsi": imsi, "success": False} for imsi in imsis
+        }
+        switched: List[str] = []
+
+        self.logger.info(
+            "開始批次切片切換", count=len(imsis), target_slice=target_slice.value
+        )
+
+        try:
+            # 1. 一次取得所有 UE
+            subscribers = await self.mongo_adapter.get_subscribers(
+                imsis, projection=SUBSCRIBER_SUMMARY_PROJECTION
+            )
+
+            to_switch = []
+            previous_slices = {}
+            ue_infos = {}
+            for imsi in imsis:
+                subscriber = subscribers.get(imsi)
+                if not subscriber:
+                    results[imsi]["error"] = f"UE {imsi} 不存在"
+                    continue
+
+                ue_info = self._convert_subscriber_to_ue_info(subscriber)
+                ue_infos[imsi] = ue_info
+                current_slice = ue_info.get("slice", {}).get("slice_type")
+                results[imsi]["previous_slice"] = current_slice
+                previous_slices[imsi] = (
+                    ue_info.get("slice", {}).get("sst"),
+                    ue_info.get("slice", {}).get("sd"),
+                )
+
+                if current_slice == target_slice.value and not force:
+                    results[imsi].update(
+                        success=True,
+                        current_slice=current_slice,
+                        message="UE 已在目標切片",
+                    )
+                    continue
+
+                to_switch.append((imsi, current_slice))
+
+            # 2. 以有限併發數執行 NF 更新
+            semaphore = asyncio.Semaphore(max_concurrency)
+
+            async def update_network_functions(
+                imsi: str, current_slice: Optional[str]
+            ) -> Optional[str]:
+                async with semaphore:
+                    try:
+                        smf_result = (
+                            await self.open5gs_adapter.update_smf_session_config(
+                                imsi=imsi, slice_config=target_config
+                            )
+                        )
+                        if not smf_result.get("success", False):
+                            return smf_result.get("error", "SMF 會話配置更新失敗")
+
+                        if current_slice and current_slice != target_slice.value:
+                            await self.open5gs_adapter.trigger_ue_reregistration(imsi)
+                        return None
+                    except Exception as e:
+                        return str(e)
+
+            nf_errors = await asyncio.gather(
+                *(
+                    update_network_functions(imsi, current_slice)
+                    for imsi, current_slice in to_switch
+                )
+            )
+
+            for (imsi, _), error in zip(to_switch, nf_errors):
+                if error:
+                    results[imsi]["error"] = error
+                else:
+                    switched.append(imsi)
+
+            # 3. 一次寫入所有 Slice 更新並直接刷新快取
+            # (與單筆切換經由 update_ue_slice_config 寫入的欄位相同，含預設 APN)
+            if switched:
+                await self.mongo_adapter.bulk_update_subscriber_slices(
+                    switched,
+                    sst=target_config["sst"],
+                    sd=target_config["sd"],
+                    previous_slices=previous_slices,
+                    apn="internet",
+                )
+                online_statuses = await self.redis_adapter.get_ue_online_statuses(
+                    switched
+                )
+                await self.redis_adapter.write_through_ue_info(
+                    {
+                        imsi: self._build_switched_ue_info(
+                            ue_infos[imsi], target_slice, online_statuses.get(imsi)
+                        )
+                        for imsi in switched
+                    }
+                )
+                await self.redis_adapter.record_slice_switches(
+                    [
+                        (
+                            imsi,
+                            results[imsi]["previous_slice"] or "none",
+                            target_slice.value,
+                        )
+                        for imsi in switched
+                    ]
+                )
+
+            for imsi in switched:
+                results[imsi].update(
+                    success=True,
+                    current_slice=target_slice.value,
+                    message="切片切換成功",
+                )
+
+        except Exception as e:
+            self.logger.error(
+                "批次切片切換失敗",
+                count=len(imsis),
+                target_slice=target_slice.value,
+                error=str(e),
+            )
+            for result in results.values():
+                if not result["success"] and "error" not in result:
+                    result["error"] = str(e)
+
+        # 4. 記錄指標 (已在目標切片的 UE 未實際切換，與單筆切換相同不計入)
+        switched_imsis = set(switched)
+        for imsi, result in results.items():
+            if result["success"] and imsi not in switched_imsis:
+                continue
+            SLICE_SWITCH_COUNTER.labels(
+                from_slice=result.get("previous_slice") or "none",
+                to_slice=target_slice.value,
+                status="success" if result["success"] else "error",
+            ).inc()
+
+        succeeded = sum(1 for result in results.values() if result["success"])
+        switch_time = (datetime.utcnow() - start_time).total_seconds()
+
+        self.logger.info(
+            "批次切片切換完成",
+            total=len(imsis),
+            succeeded=succeeded,
+            target_slice=target_slice.value,
+            switch_time=switch_time,
+        )
+
+        return {
+            "target_slice": target_slice.value,
+            "total": len(imsis),
+            "succeeded": succeeded,
+            "failed": len(imsis) - succeeded,
+            "switch_time": switch_time,
+            "results": [results[imsi] for imsi in imsis],
+        }
+
     async def get_slice_types(self) -> Dict:
         """取得支援的切片類型和配置"""
         return {
@@ -265,6 +452,23 @@ class SliceService:
             self.logger.error("查詢 UE 資訊失敗", imsi=imsi, error=str(e))
             return None
 
+    @staticmethod
+    def _build_switched_ue_info(
+        ue_info: Dict, target_slice: SliceType, is_online: bool
+    ) -> Dict:
+        """由切換前的 UE 資訊建立切換後、與 UE service 快取格式相同的 UE 資訊"""
+        target_config = SliceConfig.get_config(target_slice)
+        switched = {
+            key: value for key, value in ue_info.items() if key != "current_slice"
+        }
+        switched["slice"] = {
+            "sst": target_config["sst"],
+            "sd": target_config["sd"],
+            "slice_type": target_slice.value,
+        }
+        switched["status"] = "online" if is_online else "registered"
+        return switched
+
     def _convert_subscriber_to_ue_info(
         self, subscriber: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -353,7 +557,11 @@ class SliceService:
         }
 
     async def _update_ue_slice_info(
-        self, imsi: str, target_slice: SliceType, switch_result: Dict
+        self,
+        imsi: str,
+        target_slice: SliceType,
+        switch_result: Dict,
+        ue_info: Dict,
     ) -> None:
         """更新 UE 的切片資訊記錄"""
 
@@ -367,12 +575,15 @@ class SliceService:
         if not success:
             self.logger.warning("MongoDB 更新失敗，用戶可能不存在", imsi=imsi)
 
-        # 清除 UE 資訊緩存，強制下次查詢時重新載入
+        # 以切換後的 UE 資訊直接刷新緩存，切換後的查詢即可命中
         try:
-            await self.redis_adapter.client.delete(f"ue:info:{imsi}")
-            self.logger.debug("已清除 UE 資訊緩存", imsi=imsi)
+            is_online = await self.redis_adapter.is_ue_online(imsi)
+            await self.redis_adapter.write_through_ue_info(
+                {imsi: self._build_switched_ue_info(ue_info, target_slice, is_online)}
+            )
+            self.logger.debug("已刷新 UE 資訊緩存", imsi=imsi)
         except Exception as e:
-            self.logger.warning("清除 UE 資訊緩存失敗", imsi=imsi, error=str(e))
+            self.logger.warning("刷新 UE 資訊緩存失敗", imsi=imsi, error=str(e))
 
         # 記錄切換歷史（如果 mongo_adapter 支持的話）
         try:
@@ -394,35 +605,119 @@ class SliceService:
             "UE 切片資訊已更新", imsi=imsi, target_slice=target_slice.value
         )
 
+    async def record_slice_transitions(
+        self, transitions: List[Tuple[Optional[Tuple], Optional[Tuple]]]
+    ) -> None:
+        """
+        依用戶 Slice 變化累加 Redis 中的切片計數器
+
+        作為 MongoAdapter 的 slice_transition_listener，在建立、刪除用戶
+        或切換 Slice 時被呼叫。
+
+        Args:
+            transitions: (原 (sst, sd), 新 (sst, sd)) 列表，
+                新建用戶的原 Slice 為 None，刪除用戶的新 Slice 為 None
+        """
+        active_deltas: Dict[str, int] = {}
+        switch_counts: Dict[str, int] = {}
+
+        for previous, current in transitions:
+            if previous == current:
+                continue
+
+            previous_type = self._slice_type_from_key(previous)
+            current_type = self._slice_type_from_key(current)
+
+            if previous_type:
+                active_deltas[previous_type] = active_deltas.get(previous_type, 0) - 1
+            if current_type:
+                active_deltas[current_type] = active_deltas.get(current_type, 0) + 1
+                if previous is not None:
+                    switch_counts[current_type] = switch_counts.get(current_type, 0) + 1
+
+        if active_deltas or switch_counts:
+            await self.redis_adapter.apply_slice_counter_deltas(
+                active_deltas, switch_counts
+            )
+
+    async def reconcile_slice_counters(self) -> Dict[str, int]:
+        """
+        以 MongoDB 的實際資料校正活躍 UE 計數器
+
+        涵蓋未經 API 的變更 (例如直接以 open5gs-dbctl 註冊的用戶)。
+
+        Returns:
+            校正後的各切片活躍 UE 數量
+        """
+        counts_by_key = await self.mongo_adapter.count_subscribers_by_slice()
+        counts = {
+            slice_type.value: counts_by_key.get((config["sst"], config["sd"]), 0)
+            for slice_type, config in SliceConfig.get_all_configs().items()
+        }
+        await self.redis_adapter.set_slice_active_counts(counts)
+
+        self.logger.info("切片計數器已校正", counts=counts)
+        return counts
+
+    async def start_counter_reconciliation(self, interval: float = 300.0) -> None:
+        """
+        啟動切片計數器的定期校正任務
+
+        Args:
+            interval: 校正間隔 (秒)
+        """
+        if self._reconcile_task is None:
+            self._reconcile_task = asyncio.create_task(self._reconcile_loop(interval))
+            self.logger.info("切片計數器定期校正已啟動", interval=interval)
+
+    async def stop_counter_reconciliation(self) -> None:
+        """停止切片計數器的定期校正任務"""
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            try:
+                await self._reconcile_task
+            except asyncio.CancelledError:
+                pass
+            self._reconcile_task = None
+            self.logger.info("切片計數器定期校正已停止")
+
+    async def _reconcile_loop(self, interval: float) -> None:
+        """啟動後立即校正一次，之後依間隔定期校正"""
+        while True:
+            try:
+                await self.reconcile_slice_counters()
+            except Exception as e:
+                self.logger.error("校正切片計數器失敗", error=str(e))
+            await asyncio.sleep(interval)
+
+    @staticmethod
+    def _slice_type_from_key(slice_key: Optional[Tuple]) -> Optional[str]:
+        """將 (sst, sd) 對應至已知的切片類型"""
+        if slice_key is None:
+            return None
+        for slice_type, config in SliceConfig.get_all_configs().items():
+            if (config["sst"], config["sd"]) == tuple(slice_key):
+                return slice_type.value
+        return None
+
     async def _get_slice_stats(self, slice_type: SliceType) -> Dict:
         """取得特定切片的統計資訊"""
 
-        # 查詢使用該切片的 UE 數量
-        ue_count = await self.mongo_adapter.count_documents(
-            "subscribers", {"current_slice": slice_type.value}
-        )
-
-        # 查詢最近24小時的切換次數
-        yesterday = datetime.utcnow() - timedelta(hours=24)
-        switch_count = await self.mongo_adapter.count_documents(
-            "subscribers",
-            {
-                "slice_history.timestamp": {"$gte": yesterday},
-                "slice_history.target_slice": slice_type.value,
-            },
-        )
+        # 由 Redis 計數器取得活躍 UE 數量與最近24小時的切換次數
+        counters = await self.redis_adapter.get_slice_counters(slice_type.value)
 
         # 取得切片配置
         config = SliceConfig.get_config(slice_type)
 
         return {
             "slice_type": slice_type.value,
-            "active_ues": ue_count,
-            "switches_24h": switch_count,
+            "active_ues": counters["active_ues"],
+            "switches_24h": counters["switches_24h"],
             "configuration": config,
             "performance_metrics": await self._get_slice_performance_metrics(
                 slice_type
             ),
+            "rtt_ms": await self.redis_adapter.get_slice_rtt_stats(slice_type.value),
         }
 
     async def _get_slice_performance_metrics(self, slice_type: SliceType) -> Dict:
@@ -4,13 +4,19 @@ UE 管理服務
 處理 UE 資訊查詢、統計和狀態管理
 """
 
+import asyncio
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import structlog
 
-from ..adapters.mongo_adapter import MongoAdapter
-from ..adapters.redis_adapter import RedisAdapter
+from ..adapters.mongo_adapter import SUBSCRIBER_SUMMARY_PROJECTION, MongoAdapter
+from ..adapters.redis_adapter import (
+    TIMESERIES_MAX_POINTS,
+    TIMESERIES_RESOLUTIONS,
+    RedisAdapter,
+)
+from .slice_service import SliceConfig, SliceType
 
 logger = structlog.get_logger(__name__)
 
@@ -28,6 +34,8 @@ class UEService:
         """
         self.mongo_adapter = mongo_adapter
         self.redis_adapter = redis_adapter
+        # 每個 IMSI 進行中的快取未命中載入任務
+        self._inflight_ue_info: Dict[str, asyncio.Task] = {}
 
     async def get_ue_info(self, imsi: str) -> Optional[Dict[str, Any]]:
         """
@@ -46,29 +54,54 @@ class UEService:
                 logger.debug("從快取取得 UE 資訊", imsi=imsi)
                 return cached_info
 
-            # 從資料庫取得用戶資訊
-            subscriber = await self.mongo_adapter.get_subscriber(imsi)
-            if not subscriber:
-                logger.warning("找不到 UE", imsi=imsi)
-                return None
-
-            # 轉換為標準格式
-            ue_info = self._convert_subscriber_to_ue_info(subscriber)
-
-            # 檢查線上狀態
-            is_online = await self.redis_adapter.is_ue_online(imsi)
-            ue_info["status"] = "online" if is_online else "registered"
-
-            # 快取結果
-            await self.redis_adapter.cache_ue_info(imsi, ue_info)
+            # 同一 IMSI 的並發未命中共用同一個後端載入
+            task = self._inflight_ue_info.get(imsi)
+            if task is None:
+                task = asyncio.create_task(self._load_ue_info(imsi))
+                self._inflight_ue_info[imsi] = task
+                task.add_done_callback(lambda _: self._inflight_ue_info.pop(imsi, None))
+            else:
+                logger.debug("等待進行中的 UE 資訊載入", imsi=imsi)
 
-            logger.info("取得 UE 資訊成功", imsi=imsi)
-            return ue_info
+            # shield 避免單一呼叫者取消時中斷其他等待者的載入
+            return await asyncio.shield(task)
 
         except Exception as e:
             logger.error("取得 UE 資訊失敗", imsi=imsi, error=str(e))
             raise
 
+    async def _load_ue_info(self, imsi: str) -> Optional[Dict[str, Any]]:
+        """
+        由 MongoDB 與 Redis 載入 UE 資訊並寫入快取
+
+        Args:
+            imsi: UE IMSI
+
+        Returns:
+            UE 資訊，如果不存在則回傳 None
+        """
+        # 先記下快取版本，載入期間若有 write-through 或失效則不寫回
+        version = await self.redis_adapter.get_ue_info_version(imsi)
+
+        # 從資料庫取得用戶資訊
+        subscriber = await self.mongo_adapter.get_subscriber(imsi)
+        if not subscriber:
+            logger.warning("找不到 UE", imsi=imsi)
+            return None
+
+        # 轉換為標準格式
+        ue_info = self._convert_subscriber_to_ue_info(subscriber)
+
+        # 檢查線上狀態
+        is_online = await self.redis_adapter.is_ue_online(imsi)
+        ue_info["status"] = "online" if is_online else "registered"
+
+        # 快取結果
+        await self.redis_adapter.cache_ue_info_if_unchanged(imsi, ue_info, version)
+
+        logger.info("取得 UE 資訊成功", imsi=imsi)
+        return ue_info
+
     async def get_ue_stats(self, imsi: str) -> Optional[Dict[str, Any]]:
         """
         取得 UE 統計資訊
@@ -105,6 +138,99 @@ class UEService:
             logger.error("取得 UE 統計失敗", imsi=imsi, error=str(e))
             raise
 
+    async def get_ue_timeseries(
+        self,
+        imsi: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        resolution: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        取得 UE 的 RTT 與流量時間序列
+
+        Args:
+            imsi: UE IMSI
+            start: 起始時間，預設為結束時間前 1 小時
+            end: 結束時間，預設為現在
+            resolution: 解析度 (1s、1m 或 1h)，未指定時自動選擇
+
+        Returns:
+            包含解析度與資料點的字典
+
+        Raises:
+            ValueError: 時間範圍或解析度無效
+        """
+        now = int(datetime.now().timestamp())
+        end_ts = int(end.timestamp()) if end else now
+        start_ts = int(start.timestamp()) if start else end_ts - 3600
+
+        if start_ts > end_ts:
+            raise ValueError("start 必須早於 end")
+
+        if resolution is None:
+            resolution = self.redis_adapter.select_timeseries_resolution(
+                start_ts, end_ts, now
+            )
+        elif resolution not in TIMESERIES_RESOLUTIONS:
+            raise ValueError(
+                f"不支援的解析度: {resolution}，"
+                f"可用值為 {', '.join(TIMESERIES_RESOLUTIONS)}"
+            )
+
+        step = TIMESERIES_RESOLUTIONS[resolution]["step"]
+        if (end_ts - start_ts) // step + 1 > TIMESERIES_MAX_POINTS:
+            raise ValueError(
+                f"查詢範圍超過 {TIMESERIES_MAX_POINTS} 個資料點，請改用較粗的解析度"
+            )
+
+        try:
+            buckets = await self.redis_adapter.get_timeseries(
+                "ue", imsi, start_ts, end_ts, resolution
+            )
+
+            points = []
+            for bucket in buckets:
+                rtt_count = bucket.get("rtt_count", 0)
+                bytes_uploaded = bucket.get("bytes_uploaded", 0)
+                bytes_downloaded = bucket.get("bytes_downloaded", 0)
+                points.append(
+                    {
+                        "timestamp": datetime.fromtimestamp(
+                            bucket["timestamp"]
+                        ).isoformat(),
+                        "rtt_avg_ms": (
+                            bucket.get("rtt_sum", 0.0) / rtt_count
+                            if rtt_count
+                            else None
+                        ),
+                        "rtt_samples": rtt_count,
+                        "bytes_uploaded": bytes_uploaded,
+                        "bytes_downloaded": bytes_downloaded,
+                        "throughput_bps": (bytes_uploaded + bytes_downloaded)
+                        * 8
+                        / step,
+                    }
+                )
+
+            logger.debug(
+                "取得 UE 時間序列成功",
+                imsi=imsi,
+                resolution=resolution,
+                points=len(points),
+            )
+            return {
+                "imsi": imsi,
+                "resolution": resolution,
+                "step_seconds": step,
+                "start": datetime.fromtimestamp(start_ts).isoformat(),
+                "end": datetime.fromtimestamp(end_ts).isoformat(),
+                "points": points,
+            }
+
+        except Exception as e:
+            logger.error("取得 UE 時間序列失敗", imsi=imsi, error=str(e))
+            raise
+
     async def list_all_ues(self) -> List[Dict[str, Any]]:
         """
         列出所有 UE
@@ -114,17 +240,11 @@ class UEService:
         """
         try:
             # 從資料庫取得所有用戶
-            subscribers = await self.mongo_adapter.list_subscribers()
-
-            ue_list = []
-            for subscriber in subscribers:
-                ue_info = self._convert_subscriber_to_ue_info(subscriber)
-
-                # 檢查線上狀態
-                is_online = await self.redis_adapter.is_ue_online(ue_info["imsi"])
-                ue_info["status"] = "online" if is_online else "registered"
+            subscribers = await self.mongo_adapter.list_subscribers(
+                projection=SUBSCRIBER_SUMMARY_PROJECTION
+            )
 
-                ue_list.append(ue_info)
+            ue_list = await self._build_ue_info_list(subscribers)
 
             logger.info("列出所有 UE 成功", count=len(ue_list))
             return ue_list
@@ -133,6 +253,145 @@ class UEService:
             logger.error("列出所有 UE 失敗", error=str(e))
             raise
 
+    async def list_ues(
+        self, limit: int = 100, after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        分頁列出 UE
+
+        Args:
+            limit: 每頁筆數
+            after: 分頁游標 (上一頁回傳的 next_cursor)
+
+        Returns:
+            包含 UE 列表與下一頁游標的字典
+        """
+        try:
+            # 多取一筆以判斷是否還有下一頁
+            subscribers = await self.mongo_adapter.list_subscribers(
+                limit=limit + 1, after=after, projection=SUBSCRIBER_SUMMARY_PROJECTION
+            )
+
+            has_more = len(subscribers) > limit
+            ue_list = await self._build_ue_info_list(subscribers[:limit])
+            next_cursor = ue_list[-1]["imsi"] if has_more and ue_list else None
+
+            logger.info(
+                "分頁列出 UE 成功", count=len(ue_list), after=after, limit=limit
+            )
+            return {
+                "ues": ue_list,
+                "count": len(ue_list),
+                "limit": limit,
+                "next_cursor": next_cursor,
+            }
+
+        except Exception as e:
+            logger.error("分頁列出 UE 失敗", after=after, limit=limit, error=str(e))
+            raise
+
+    async def iter_ue_batches(
+        self, batch_size: int = 500
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        逐批產生所有 UE 的資訊，供串流匯出使用
+
+        Args:
+            batch_size: 每批次的 UE 數量
+
+        Yields:
+            UE 資訊批次
+        """
+        exported = 0
+        try:
+            async for subscribers in self.mongo_adapter.iter_subscriber_batches(
+                batch_size=batch_size, projection=SUBSCRIBER_SUMMARY_PROJECTION
+            ):
+                ue_list = await self._build_ue_info_list(subscribers)
+                exported += len(ue_list)
+                yield ue_list
+
+            logger.info("匯出所有 UE 完成", count=exported)
+
+        except Exception as e:
+            logger.error("匯出 UE 失敗", exported=exported, error=str(e))
+            raise
+
+    async def _build_ue_info_list(
+        self, subscribers: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        將用戶資料轉換為 UE 資訊並批次填入線上狀態
+
+        Args:
+            subscribers: 資料庫中的用戶資料列表
+
+        Returns:
+            UE 資訊列表
+        """
+        ue_list = [
+            self._convert_subscriber_to_ue_info(subscriber)
+            for subscriber in subscribers
+        ]
+
+        # 批次檢查線上狀態
+        online_statuses = await self.redis_adapter.get_ue_online_statuses(
+            [ue_info["imsi"] for ue_info in ue_list]
+        )
+        for ue_info in ue_list:
+            is_online = online_statuses.get(ue_info["imsi"], False)
+            ue_info["status"] = "online" if is_online else "registered"
+
+        return ue_list
+
+    async def bulk_register_ues(
+        self, registrations: List[Dict[str, Any]], chunk_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        批次註冊 UE
+
+        Args:
+            registrations: 已驗證的註冊資料列表，每筆包含 imsi、key、opc、
+                apn 與 slice_type
+            chunk_size: 每段寫入 MongoDB 的用戶數量
+
+        Returns:
+            批次註冊結果，包含逐筆結果
+        """
+        try:
+            subscribers = []
+            for registration in registrations:
+                slice_config = SliceConfig.get_config(
+                    SliceType(registration["slice_type"])
+                )
+                subscribers.append(
+                    {
+                        "imsi": registration["imsi"],
+                        "key": registration["key"],
+                        "opc": registration["opc"],
+                        "apn": registration.get("apn", "internet"),
+                        "sst": slice_config["sst"],
+                        "sd": slice_config["sd"],
+                    }
+                )
+
+            results = await self.mongo_adapter.bulk_create_subscribers(
+                subscribers, chunk_size=chunk_size
+            )
+
+            created = sum(1 for result in results if result["success"])
+            logger.info("批次註冊 UE 完成", total=len(results), created=created)
+            return {
+                "total": len(results),
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            }
+
+        except Exception as e:
+            logger.error("批次註冊 UE 失敗", count=len(registrations), error=str(e))
+            raise
+
     async def update_ue_online_status(self, imsi: str, online: bool) -> None:
         """
         更新 UE 線上狀態
@@ -144,8 +403,13 @@ class UEService:
         try:
             await self.redis_adapter.set_ue_online_status(imsi, online)
 
-            # 清除快取，強制下次查詢時重新載入
-            await self.redis_adapter.client.delete(f"ue:info:{imsi}")
+            # 以版本號 WATCH 更新快取中的狀態；快取不存在或期間有其他寫入
+            # (例如切片切換) 時改為清除，避免以舊的切片資訊覆蓋新值
+            updated = await self.redis_adapter.update_cached_ue_info(
+                imsi, {"status": "online" if online else "registered"}
+            )
+            if not updated:
+                await self.redis_adapter.invalidate_ue_info([imsi])
 
             logger.info("UE 線上狀態已更新", imsi=imsi, online=online)
 
@@ -154,33 +418,86 @@ class UEService:
             raise
 
     async def update_ue_traffic_stats(
-        self, imsi: str, bytes_uploaded: int = 0, bytes_downloaded: int = 0
+        self,
+        imsi: str,
+        bytes_uploaded: int = 0,
+        bytes_downloaded: int = 0,
+        connection_time: int = 0,
     ) -> None:
         """
-        更新 UE 流量統計
+        累加 UE 流量統計
 
         Args:
             imsi: UE IMSI
-            bytes_uploaded: 上傳位元組數
-            bytes_downloaded: 下載位元組數
+            bytes_uploaded: 新增的上傳位元組數
+            bytes_downloaded: 新增的下載位元組數
+            connection_time: 新增的連線時間 (秒)
         """
         try:
-            stats_update = {}
+            increments = self._traffic_increments(
+                bytes_uploaded, bytes_downloaded, connection_time
+            )
 
-            if bytes_uploaded > 0:
-                stats_update["bytes_uploaded"] = bytes_uploaded
+            if increments:
+                await self.redis_adapter.increment_ue_stats(imsi, increments)
+                logger.debug("UE 流量統計已更新", imsi=imsi, **increments)
 
-            if bytes_downloaded > 0:
-                stats_update["bytes_downloaded"] = bytes_downloaded
+        except Exception as e:
+            logger.error("更新 UE 流量統計失敗", imsi=imsi, error=str(e))
+            raise
+
+    async def update_ue_traffic_stats_batch(
+        self, traffic_updates: List[Dict[str, Any]]
+    ) -> int:
+        """
+        批次累加多個 UE 的流量統計 (例如匯入 UPF 計數器)
 
-            if stats_update:
-                await self.redis_adapter.update_ue_stats(imsi, stats_update)
-                logger.debug("UE 流量統計已更新", imsi=imsi, **stats_update)
+        同一 IMSI 的多筆增量會先合併，再以單一 Redis pipeline 寫入。
+
+        Args:
+            traffic_updates: 增量列表，每筆包含 imsi 以及 bytes_uploaded、
+                bytes_downloaded、connection_time 中的任意欄位
+
+        Returns:
+            實際更新的 UE 數量
+        """
+        try:
+            increments_by_imsi: Dict[str, Dict[str, int]] = {}
+            for update in traffic_updates:
+                increments = self._traffic_increments(
+                    update.get("bytes_uploaded", 0),
+                    update.get("bytes_downloaded", 0),
+                    update.get("connection_time", 0),
+                )
+                if not increments:
+                    continue
+
+                merged = increments_by_imsi.setdefault(update["imsi"], {})
+                for field, delta in increments.items():
+                    merged[field] = merged.get(field, 0) + delta
+
+            await self.redis_adapter.increment_ue_stats_batch(increments_by_imsi)
+            logger.debug("UE 流量統計已批次更新", count=len(increments_by_imsi))
+            return len(increments_by_imsi)
 
         except Exception as e:
-            logger.error("更新 UE 流量統計失敗", imsi=imsi, error=str(e))
+            logger.error(
+                "批次更新 UE 流量統計失敗", count=len(traffic_updates), error=str(e)
+            )
             raise
 
+    @staticmethod
+    def _traffic_increments(
+        bytes_uploaded: int, bytes_downloaded: int, connection_time: int
+    ) -> Dict[str, int]:
+        """過濾出大於零的流量與連線時間增量"""
+        increments = {
+            "bytes_uploaded": bytes_uploaded,
+            "bytes_downloaded": bytes_downloaded,
+            "connection_time": connection_time,
+        }
+        return {field: delta for field, delta in increments.items() if delta > 0}
+
     async def record_ue_rtt(self, imsi: str, rtt_ms: float, slice_type: str) -> None:
         """
         記錄 UE RTT 測量結果
@@ -200,6 +517,26 @@ class UEService:
             logger.error("記錄 UE RTT 失敗", imsi=imsi, rtt_ms=rtt_ms, error=str(e))
             raise
 
+    async def record_ue_rtt_batch(self, samples: List[Dict[str, Any]]) -> None:
+        """
+        批次記錄多個 UE 的 RTT 測量結果
+
+        Args:
+            samples: 樣本列表，每筆包含 imsi、rtt_ms 與 slice_type
+        """
+        try:
+            await self.redis_adapter.update_rtt_measurements(
+                [
+                    (sample["imsi"], sample["rtt_ms"], sample["slice_type"])
+                    for sample in samples
+                ]
+            )
+            logger.info("UE RTT 已批次記錄", count=len(samples))
+
+        except Exception as e:
+            logger.error("批次記錄 UE RTT 失敗", count=len(samples), error=str(e))
+            raise
+
     async def get_ue_slice_history(self, imsi: str) -> List[Dict[str, Any]]:
         """
         取得 UE Slice 切換歷史
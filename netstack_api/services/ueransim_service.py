@@ -5,13 +5,19 @@ UERANSIM動態配置生成服務
 """
 
 import asyncio
-import yaml
-import math
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import numpy as np
 import structlog
 
 from ..models.ueransim_models import (
+    DeltaThresholds,
+    HandoverParameters,
     UERANSIMConfigRequest,
     UERANSIMConfigResponse,
     ScenarioType,
@@ -21,7 +27,18 @@ from ..models.ueransim_models import (
     SatellitePosition,
     UAVPosition,
     NetworkParameters,
+    SatellitePassSimulationRequest,
+    pass_simulation_step_count,
 )
+from ..utils.cache import LocalTTLCache
+from .satellite_geometry import (
+    compute_position_links,
+    ecef_to_geodetic,
+    free_space_path_loss_db,
+    link_geometry_from_ecef,
+    propagate_circular_orbit,
+)
+from .ueransim_templates import Slot, YAMLTemplate
 
 logger = structlog.get_logger(__name__)
 
@@ -29,9 +46,65 @@ logger = structlog.get_logger(__name__)
 class UERANSIMConfigService:
     """UERANSIM動態配置生成服務"""
 
-    def __init__(self):
+    # YAML中來自GNBConfig/UEConfig的欄位
+    GNB_YAML_FIELDS = (
+        "mcc",
+        "mnc",
+        "nci",
+        "idLength",
+        "tac",
+        "linkIp",
+        "ngapIp",
+        "gtpIp",
+        "frequency",
+        "txPower",
+    )
+    UE_YAML_FIELDS = ("supi", "mcc", "mnc", "op", "amf", "imei")
+
+    # 缺少編隊數據時使用的默認3機編隊
+    FALLBACK_FORMATION = {
+        "size": 3,
+        "type": "default_triangle",
+        "ues": [
+            {
+                "supi": f"imsi-99970000000000{i}",
+                "role": "leader" if i == 1 else "follower",
+                "mcc": 999,
+                "mnc": 70,
+                "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
+                "op": "E8ED289DEBA952E4283B54E88E6183CA",
+                "amf": "8000",
+                "imei": f"35693803564380{i}",
+                "initial_slice": "01:111111" if i == 1 else "02:222222",
+            }
+            for i in range(1, 4)
+        ],
+    }
+
+    def __init__(
+        self,
+        config_cache_max_entries: int = 1024,
+        config_cache_ttl: float = 300.0,
+        max_workers: Optional[int] = None,
+        position_state_max_entries: int = 10000,
+        position_state_ttl: float = 3600.0,
+    ):
         self.logger = logger.bind(service="ueransim_config_service")
 
+        # 位置更新增量模式的基準：每組衛星/UAV最後送出的配置與鏈路參數
+        self._position_states = LocalTTLCache(
+            max_entries=position_state_max_entries, ttl=position_state_ttl
+        )
+
+        # 批次生成使用的行程池（None 為 CPU 核心數，0 則在事件迴圈中生成）
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        # 以正規化請求內容為鍵的配置快取，相同請求直接回傳先前的結果
+        self._config_cache = LocalTTLCache(
+            max_entries=config_cache_max_entries, ttl=config_cache_ttl
+        )
+
         # 配置模板
         self.gnb_template = {
             "mcc": 999,
@@ -74,36 +147,263 @@ class UERANSIMConfigService:
             ],
         }
 
+        self._compile_yaml_templates()
+
+    def _compile_yaml_templates(self):
+        """預編譯YAML模板，渲染時只代入變動欄位"""
+        gnb_fields = {key: Slot(key) for key in self.GNB_YAML_FIELDS}
+        ue_fields = {key: Slot(key) for key in self.UE_YAML_FIELDS}
+
+        gnb_link = YAMLTemplate(gnb_fields)
+        gnb_full = YAMLTemplate(
+            {
+                **gnb_fields,
+                "plmns": [
+                    {
+                        **plmn,
+                        "mcc": Slot("mcc"),
+                        "mnc": Slot("mnc"),
+                        "tac": Slot("tac"),
+                    }
+                    for plmn in self.gnb_template["plmns"]
+                ],
+            }
+        )
+        ue_full = YAMLTemplate({**self.ue_template, **ue_fields})
+        formation_ue = YAMLTemplate(
+            {
+                **ue_fields,
+                "key": self.ue_template["key"],
+                "initial_slice": Slot("initial_slice"),
+            }
+        )
+        header = {
+            "scenario": Slot("scenario"),
+            "generation_time": Slot("generation_time"),
+        }
+
+        self._yaml_template = YAMLTemplate(
+            {**header, "gnb": Slot("gnb", gnb_full), "ue": Slot("ue", ue_full)}
+        )
+        self._handover_yaml_template = YAMLTemplate(
+            {
+                **header,
+                "handover_config": {
+                    "source_gnb": Slot("source_gnb", gnb_link),
+                    "target_gnb": Slot("target_gnb", gnb_link),
+                },
+                "ue": Slot("ue", ue_full),
+            }
+        )
+        self._formation_yaml_template = YAMLTemplate(
+            {
+                **header,
+                "gnb": Slot("gnb", gnb_link),
+                "formation": {
+                    "size": Slot("size"),
+                    "ues": Slot("ues", formation_ue, many=True),
+                },
+            }
+        )
+        self._fallback_formation_yaml_template = YAMLTemplate(
+            {
+                **header,
+                "warning": "This is a fallback configuration due to missing UAV formation data",
+                "gnb": Slot("gnb", gnb_link),
+                "formation": self.FALLBACK_FORMATION,
+            }
+        )
+
     async def generate_config(
         self, request: UERANSIMConfigRequest
     ) -> UERANSIMConfigResponse:
-        """生成UERANSIM配置"""
+        """
+        生成UERANSIM配置
+
+        內容相同的請求直接回傳快取中的配置，不重新計算幾何與YAML。
+        """
         try:
+            # 位置更新會更新增量基準，結果也取決於上次配置，不使用內容快取
+            cacheable = not self._tracks_position_state(request)
+            if cacheable:
+                cache_key = self._config_cache_key(request)
+                cached = self._config_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+
             self.logger.info("開始生成UERANSIM配置", scenario=request.scenario.value)
 
             # 根據場景類型選擇生成方法
             if request.scenario == ScenarioType.LEO_SATELLITE_PASS:
-                return await self._generate_satellite_pass_config(request)
+                result = await self._generate_satellite_pass_config(request)
             elif request.scenario == ScenarioType.UAV_FORMATION_FLIGHT:
-                return await self._generate_formation_flight_config(request)
+                result = await self._generate_formation_flight_config(request)
             elif request.scenario == ScenarioType.HANDOVER_BETWEEN_SATELLITES:
-                return await self._generate_handover_config(request)
+                result = await self._generate_handover_config(request)
             elif request.scenario == ScenarioType.POSITION_UPDATE:
-                return await self._generate_position_update_config(request)
+                result = await self._generate_position_update_config(request)
             else:
-                return await self._generate_default_config(request)
+                result = await self._generate_default_config(request)
+
+            if result.success and cacheable:
+                self._config_cache.set(cache_key, result)
+            return result
 
         except Exception as e:
             self.logger.error("配置生成失敗", error=str(e))
-            return UERANSIMConfigResponse(
-                success=False,
-                scenario_type=request.scenario.value,
-                scenario_info=ScenarioInfo(
-                    scenario_type=request.scenario.value,
-                    generation_time=datetime.utcnow().isoformat(),
-                ),
-                message=f"配置生成失敗: {str(e)}",
+            return self._failure_response(request, e)
+
+    async def generate_configs(
+        self, requests: Sequence[UERANSIMConfigRequest]
+    ) -> AsyncIterator[Tuple[int, UERANSIMConfigResponse]]:
+        """
+        批次生成UERANSIM配置，依完成順序逐筆產生結果
+
+        快取命中的請求立即回傳；其餘請求交由行程池平行計算幾何與YAML，
+        事件迴圈不被阻塞。同一批次中內容相同的請求只計算一次。
+        位置更新請求會讀寫本行程保存的增量基準，依序在事件迴圈中處理。
+
+        Args:
+            requests: 配置生成請求列表
+
+        Yields:
+            (請求在列表中的索引, 生成結果)
+        """
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+
+        hits: List[Tuple[int, UERANSIMConfigResponse]] = []
+        misses: Dict[str, Tuple[UERANSIMConfigRequest, List[int]]] = {}
+        inline: List[Tuple[int, UERANSIMConfigRequest]] = []
+        for index, request in enumerate(requests):
+            if self._tracks_position_state(request):
+                # 增量基準保存在本行程，需依請求順序處理
+                inline.append((index, request))
+                continue
+            cache_key = self._config_cache_key(request)
+            cached = self._config_cache.get(cache_key)
+            if cached is not None:
+                hits.append((index, cached))
+            elif cache_key in misses:
+                misses[cache_key][1].append(index)
+            else:
+                misses[cache_key] = (request, [index])
+
+        if executor is None:
+            for index, result in hits:
+                yield index, result
+            for index, request in inline:
+                yield index, await self.generate_config(request)
+            for request, indices in misses.values():
+                result = await self.generate_config(request)
+                for index in indices:
+                    yield index, result
+            return
+
+        # 先送出所有計算工作，再回傳快取命中的結果
+        pending = {}
+        for cache_key, (request, indices) in misses.items():
+            executor, future = self._submit_to_worker(loop, request)
+            pending[future] = (cache_key, request, indices, executor, False)
+        try:
+            for index, result in hits:
+                yield index, result
+            for index, request in inline:
+                yield index, await self.generate_config(request)
+
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    cache_key, request, indices, executor, retried = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        self._discard_executor(executor)
+                        if not retried:
+                            # 以新的行程池重試一次
+                            executor, future = self._submit_to_worker(loop, request)
+                            pending[future] = (
+                                cache_key,
+                                request,
+                                indices,
+                                executor,
+                                True,
+                            )
+                            continue
+                        self.logger.warning(
+                            "行程池重試失敗，改於本行程生成配置", error=str(e)
+                        )
+                        result = await self.generate_config(request)
+                    except Exception as e:
+                        self.logger.error("工作行程配置生成失敗", error=str(e))
+                        result = self._failure_response(request, e)
+                    else:
+                        if result.success:
+                            self._config_cache.set(cache_key, result)
+
+                    for index in indices:
+                        yield index, result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """取得批次生成用的行程池，首次使用時建立"""
+        if self.max_workers == 0:
+            return None
+        if self._executor is None:
+            # 以 spawn 建立工作行程，避免複製父行程的事件迴圈與連線狀態
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
             )
+            self.logger.info("UERANSIM配置行程池已建立", max_workers=self.max_workers)
+        return self._executor
+
+    def _submit_to_worker(
+        self, loop: asyncio.AbstractEventLoop, request: UERANSIMConfigRequest
+    ) -> Tuple[ProcessPoolExecutor, asyncio.Future]:
+        """送出單一配置至行程池，行程池已損壞時重建一次後再送出"""
+        executor = self._get_executor()
+        try:
+            future = loop.run_in_executor(executor, _generate_config_in_worker, request)
+        except BrokenProcessPool:
+            # 工作行程在前一批次後異常結束，行程池已無法再接受工作
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, _generate_config_in_worker, request)
+        return executor, future
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """捨棄已損壞的行程池，下次使用時重新建立"""
+        executor.shutdown(wait=False)
+        if self._executor is executor:
+            self._executor = None
+            self.logger.warning("UERANSIM配置行程池已損壞，將重新建立")
+
+    def shutdown(self) -> None:
+        """關閉行程池並取消尚未開始的工作"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.logger.info("UERANSIM配置行程池已關閉")
+
+    @staticmethod
+    def _failure_response(
+        request: UERANSIMConfigRequest, error: Exception
+    ) -> UERANSIMConfigResponse:
+        """建立配置生成失敗的回應"""
+        return UERANSIMConfigResponse(
+            success=False,
+            scenario_type=request.scenario.value,
+            scenario_info=ScenarioInfo(
+                scenario_type=request.scenario.value,
+                generation_time=datetime.utcnow().isoformat(),
+            ),
+            message=f"配置生成失敗: {str(error)}",
+        )
 
     async def _generate_satellite_pass_config(
         self, request: UERANSIMConfigRequest
@@ -120,30 +420,10 @@ class UERANSIMConfigService:
         signal_loss = self._calculate_path_loss(distance_km, network_params.frequency)
 
         # 動態調整功率和頻率
-        tx_power = min(30, max(10, 23 + signal_loss - 100))  # 根據路徑損耗調整
+        tx_power = float(self._adjust_tx_power(signal_loss))
 
-        # 生成gNB配置（代表衛星）
-        gnb_config = GNBConfig(
-            mcc=999,
-            mnc=70,
-            nci=f"0x{satellite.id[-8:].zfill(8)}" if satellite else "0x00000010",
-            frequency=network_params.frequency,
-            tx_power=int(tx_power),
-            link_ip=(
-                self._generate_ip_from_position(satellite)
-                if satellite
-                else "172.17.0.1"
-            ),
-        )
-
-        # 生成UE配置（代表UAV）
-        ue_config = UEConfig(
-            supi=(
-                f"imsi-999700000{uav.id[-6:].zfill(6)}"
-                if uav
-                else "imsi-999700000000001"
-            ),
-            imei=f"35693803{uav.id[-8:].zfill(8)}" if uav else "356938035643803",
+        gnb_config, ue_config = self._build_satellite_pass_configs(
+            satellite, uav, network_params, tx_power
         )
 
         # 生成YAML配置
@@ -171,6 +451,145 @@ class UERANSIMConfigService:
             message="LEO衛星過境配置生成成功",
         )
 
+    def _build_satellite_pass_configs(
+        self,
+        satellite: Optional[SatellitePosition],
+        uav: Optional[UAVPosition],
+        network_params: NetworkParameters,
+        tx_power: float,
+    ) -> Tuple[GNBConfig, UEConfig]:
+        """建立衛星過境場景的gNB與UE配置"""
+        # 生成gNB配置（代表衛星）
+        gnb_config = GNBConfig(
+            mcc=999,
+            mnc=70,
+            nci=f"0x{satellite.id[-8:].zfill(8)}" if satellite else "0x00000010",
+            frequency=network_params.frequency,
+            tx_power=int(tx_power),
+            link_ip=(
+                self._generate_ip_from_position(satellite)
+                if satellite
+                else "172.17.0.1"
+            ),
+        )
+
+        # 生成UE配置（代表UAV）
+        ue_config = UEConfig(
+            supi=(
+                f"imsi-999700000{uav.id[-6:].zfill(6)}"
+                if uav
+                else "imsi-999700000000001"
+            ),
+            imei=f"35693803{uav.id[-8:].zfill(8)}" if uav else "356938035643803",
+        )
+
+        return gnb_config, ue_config
+
+    async def iter_satellite_pass(
+        self, request: SatellitePassSimulationRequest, chunk_steps: int = 1000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        逐批產生LEO衛星過境期間每個時間步的gNB/UE參數
+
+        每批次以向量化方式一次傳播 chunk_steps 個時間點的衛星軌道並計算鏈路，
+        記憶體用量只與 chunk_steps 有關，與模擬總步數無關。
+
+        Args:
+            request: 過境模擬請求
+            chunk_steps: 每批次的時間步數
+
+        Yields:
+            每批次的時間步參數列表
+        """
+        orbit = request.orbit
+        uav = request.uav
+        network_params = request.network_params or NetworkParameters()
+        start_time = request.start_time or datetime.utcnow()
+        step_seconds = request.step_ms / 1000
+        total_steps = pass_simulation_step_count(
+            request.duration_seconds, request.step_ms
+        )
+
+        nci = f"0x{request.satellite_id[-8:].zfill(8)}"
+        ue_params = {
+            "supi": f"imsi-999700000{uav.id[-6:].zfill(6)}",
+            "imei": f"35693803{uav.id[-8:].zfill(8)}",
+        }
+
+        for first in range(0, total_steps, chunk_steps):
+            steps = np.arange(first, min(first + chunk_steps, total_steps))
+            offsets = steps * step_seconds
+
+            sat_ecef = propagate_circular_orbit(
+                offsets,
+                orbit.altitude,
+                orbit.inclination,
+                orbit.raan,
+                orbit.arg_latitude,
+            )
+            links = link_geometry_from_ecef(
+                sat_ecef,
+                uav.latitude,
+                uav.longitude,
+                uav.altitude / 1000,
+                network_params.frequency,
+            )
+            sat_lat, sat_lon, sat_alt = ecef_to_geodetic(sat_ecef)
+            tx_power = self._adjust_tx_power(links["path_loss_db"])
+            visible = links["elevation_deg"] >= request.min_elevation
+
+            columns = zip(
+                steps.tolist(),
+                offsets.tolist(),
+                np.round(sat_lat, 5).tolist(),
+                np.round(sat_lon, 5).tolist(),
+                np.round(sat_alt, 3).tolist(),
+                np.round(links["distance_km"], 3).tolist(),
+                np.round(links["elevation_deg"], 3).tolist(),
+                np.round(links["azimuth_deg"], 3).tolist(),
+                np.round(links["path_loss_db"], 3).tolist(),
+                tx_power.astype(int).tolist(),
+                visible.tolist(),
+            )
+            yield [
+                {
+                    "step": step,
+                    "offset_seconds": round(offset, 3),
+                    "timestamp": (start_time + timedelta(seconds=offset)).isoformat(),
+                    "satellite": {
+                        "id": request.satellite_id,
+                        "latitude": lat,
+                        "longitude": lon,
+                        "altitude": alt,
+                    },
+                    "distance_km": distance,
+                    "elevation_deg": elevation,
+                    "azimuth_deg": azimuth,
+                    "path_loss_db": loss,
+                    "visible": is_visible,
+                    "gnb": {
+                        "nci": nci,
+                        "frequency": network_params.frequency,
+                        "tx_power": power,
+                        "link_ip": self._link_ip_from_coordinates(lat, lon),
+                    },
+                    "ue": ue_params,
+                }
+                for (
+                    step,
+                    offset,
+                    lat,
+                    lon,
+                    alt,
+                    distance,
+                    elevation,
+                    azimuth,
+                    loss,
+                    power,
+                    is_visible,
+                ) in columns
+            ]
+
     async def _generate_formation_flight_config(
         self, request: UERANSIMConfigRequest
     ) -> UERANSIMConfigResponse:
@@ -227,6 +646,16 @@ class UERANSIMConfigService:
             center_lat = 25.0
             center_lon = 121.0
 
+        # 一次計算所有衛星 × UAV 的鏈路幾何並選擇服務衛星
+        satellites = request.visible_satellites or ([satellite] if satellite else [])
+        network_info = (
+            self._calculate_formation_links(
+                satellites, formation, network_params.frequency
+            )
+            if satellites and formation
+            else None
+        )
+
         # 生成YAML配置（確保總是有配置）
         config_yaml = None
         try:
@@ -264,6 +693,7 @@ class UERANSIMConfigService:
                     "coordination_required": network_params.coordination_required,
                     "is_default_formation": not bool(formation),
                 },
+                network_info=network_info,
             ),
             message=f"UAV編隊配置生成成功，包含{len(ue_configs)}個UE{'（默認配置）' if not formation else ''}",
         )
@@ -276,6 +706,7 @@ class UERANSIMConfigService:
         target_sat = request.target_satellite
         uav = request.uav
         handover_params = request.handover_params
+        network_params = request.network_params or NetworkParameters()
 
         # 生成兩個gNB配置
         gnb_configs = []
@@ -344,6 +775,9 @@ class UERANSIMConfigService:
                         handover_params.trigger_threshold if handover_params else -90
                     ),
                     "hysteresis": handover_params.hysteresis if handover_params else 3,
+                    **self._calculate_handover_links(
+                        source_sat, target_sat, uav, network_params.frequency
+                    ),
                 },
             ),
             message="衛星切換配置生成成功",
@@ -352,8 +786,129 @@ class UERANSIMConfigService:
     async def _generate_position_update_config(
         self, request: UERANSIMConfigRequest
     ) -> UERANSIMConfigResponse:
-        """生成位置更新場景配置"""
-        return await self._generate_satellite_pass_config(request)
+        """
+        生成位置更新場景配置
+
+        增量模式且已有同一組衛星/UAV的基準時，只重新計算鏈路參數並回傳差異；
+        否則生成完整配置，並將其記錄為之後增量比對的基準。
+        """
+        satellite = request.satellite
+        uav = request.uav
+        if not satellite or not uav:
+            return await self._generate_satellite_pass_config(request)
+
+        network_params = request.network_params or NetworkParameters()
+        state_key = f"{satellite.id}:{uav.id}"
+        baseline = self._position_states.get(state_key) if request.delta else None
+        if baseline is not None:
+            return self._generate_position_delta(request, state_key, baseline)
+
+        result = await self._generate_satellite_pass_config(request)
+        self._position_states.set(
+            state_key,
+            {
+                "gnb": self._gnb_yaml_values(result.gnb_config),
+                "ue": self._ue_yaml_values(result.ue_config),
+                "link": self._calculate_position_link(
+                    satellite, uav, network_params.frequency
+                ),
+            },
+        )
+        return result
+
+    def _generate_position_delta(
+        self,
+        request: UERANSIMConfigRequest,
+        state_key: str,
+        baseline: Dict[str, Dict[str, Any]],
+    ) -> UERANSIMConfigResponse:
+        """
+        生成相對基準配置的增量更新
+
+        gNB/UE欄位有任何變動即列入差異；鏈路參數只在變化達到閾值時列入，
+        未列入的欄位保留原基準，因此小幅變化會累積到超過閾值為止。
+        差異為空時回傳空的 config_patch，下游無需重新載入。
+        """
+        satellite = request.satellite
+        uav = request.uav
+        network_params = request.network_params or NetworkParameters()
+        thresholds = request.delta_thresholds or DeltaThresholds()
+
+        link = self._calculate_position_link(satellite, uav, network_params.frequency)
+        gnb_config, ue_config = self._build_satellite_pass_configs(
+            satellite,
+            uav,
+            network_params,
+            float(self._adjust_tx_power(link["path_loss_db"])),
+        )
+        current = {
+            "gnb": self._gnb_yaml_values(gnb_config),
+            "ue": self._ue_yaml_values(ue_config),
+        }
+
+        patch = {}
+        for section, values in current.items():
+            changes = {
+                key: value
+                for key, value in values.items()
+                if baseline[section].get(key) != value
+            }
+            if changes:
+                patch[section] = changes
+        link_changes = {
+            key: value
+            for key, value in link.items()
+            if abs(value - baseline["link"][key]) >= getattr(thresholds, key)
+        }
+        if link_changes:
+            patch["link"] = link_changes
+
+        if patch:
+            self._position_states.set(
+                state_key,
+                {
+                    section: {**baseline[section], **patch.get(section, {})}
+                    for section in ("gnb", "ue", "link")
+                },
+            )
+
+        return UERANSIMConfigResponse(
+            success=True,
+            scenario_type=request.scenario.value,
+            config_patch=patch,
+            scenario_info=ScenarioInfo(
+                scenario_type=request.scenario.value,
+                generation_time=datetime.utcnow().isoformat(),
+                satellite_info=satellite.dict(),
+                uav_info=uav.dict(),
+                network_info=link,
+            ),
+            message=(
+                "位置更新增量配置生成成功"
+                if patch
+                else "位置變化低於閾值，無需更新配置"
+            ),
+        )
+
+    @staticmethod
+    def _tracks_position_state(request: UERANSIMConfigRequest) -> bool:
+        """是否為會讀寫增量基準的位置更新請求"""
+        return (
+            request.scenario == ScenarioType.POSITION_UPDATE
+            and request.satellite is not None
+            and request.uav is not None
+        )
+
+    def _calculate_position_link(
+        self, satellite: SatellitePosition, uav: UAVPosition, frequency_mhz: int
+    ) -> Dict[str, float]:
+        """計算單一衛星/UAV組合的鏈路參數"""
+        links = compute_position_links([satellite], [uav], frequency_mhz)
+        return {
+            "distance_km": round(float(links["distance_km"][0, 0]), 3),
+            "elevation_deg": round(float(links["elevation_deg"][0, 0]), 3),
+            "path_loss_db": round(float(links["path_loss_db"][0, 0]), 3),
+        }
 
     async def _generate_default_config(
         self, request: UERANSIMConfigRequest
@@ -377,253 +932,206 @@ class UERANSIMConfigService:
     def _calculate_distance(
         self, satellite: SatellitePosition, uav: UAVPosition
     ) -> float:
-        """計算衛星和UAV之間的距離（公里）"""
-        # 簡化的3D距離計算
-        lat_diff = math.radians(satellite.latitude - uav.latitude)
-        lon_diff = math.radians(satellite.longitude - uav.longitude)
-        alt_diff = satellite.altitude - (uav.altitude / 1000)  # 轉換為公里
+        """計算衛星和UAV之間的斜距（公里，WGS84 ECEF）"""
+        links = compute_position_links([satellite], [uav], frequency_mhz=1.0)
+        return float(links["distance_km"][0, 0])
 
-        # 地面距離
-        earth_radius = 6371  # 地球半徑（公里）
-        surface_dist = earth_radius * math.sqrt(lat_diff**2 + lon_diff**2)
+    def _calculate_path_loss(self, distance_km: float, frequency_mhz: int) -> float:
+        """計算自由空間路徑損耗（dB）"""
+        return float(free_space_path_loss_db(distance_km, frequency_mhz))
 
-        # 3D距離
-        distance = math.sqrt(surface_dist**2 + alt_diff**2)
-        return distance
+    @staticmethod
+    def _adjust_tx_power(path_loss_db: np.ndarray) -> np.ndarray:
+        """根據路徑損耗調整發射功率（dBm，限制在 10-30 之間）"""
+        return np.clip(23 + np.asarray(path_loss_db) - 100, 10, 30)
 
-    def _calculate_path_loss(self, distance_km: float, frequency_mhz: int) -> float:
-        """計算路徑損耗（dB）"""
-        # 自由空間路徑損耗公式
-        if distance_km <= 0:
-            return 0
+    def _calculate_formation_links(
+        self,
+        satellites: Sequence[SatellitePosition],
+        formation: Sequence[UAVPosition],
+        frequency_mhz: int,
+    ) -> Dict[str, Any]:
+        """
+        計算編隊中每架UAV的服務衛星與鏈路參數
 
-        path_loss = (
-            20 * math.log10(distance_km * 1000) + 20 * math.log10(frequency_mhz) + 32.45
-        )
-        return path_loss
+        以批次幾何引擎一次計算所有衛星 × UAV 組合，
+        每架UAV選擇仰角最高的衛星作為服務衛星。
+        """
+        links = compute_position_links(satellites, formation, frequency_mhz)
+        serving = np.argmax(links["elevation_deg"], axis=0)
+        columns = np.arange(len(formation))
+
+        distance = links["distance_km"][serving, columns]
+        elevation = links["elevation_deg"][serving, columns]
+        path_loss = links["path_loss_db"][serving, columns]
+
+        return {
+            "visible_satellites": len(satellites),
+            "path_loss_db": {
+                "min": float(path_loss.min()),
+                "max": float(path_loss.max()),
+                "mean": float(path_loss.mean()),
+            },
+            "uav_links": [
+                {
+                    "uav_id": uav.id,
+                    "serving_satellite": satellites[sat_index].id,
+                    "distance_km": round(float(distance[i]), 3),
+                    "elevation_deg": round(float(elevation[i]), 3),
+                    "path_loss_db": round(float(path_loss[i]), 3),
+                }
+                for i, (uav, sat_index) in enumerate(zip(formation, serving))
+            ],
+        }
+
+    def _calculate_handover_links(
+        self,
+        source_sat: Optional[SatellitePosition],
+        target_sat: Optional[SatellitePosition],
+        uav: Optional[UAVPosition],
+        frequency_mhz: int,
+    ) -> Dict[str, Any]:
+        """計算UAV到源衛星與目標衛星的鏈路參數"""
+        satellites = {
+            role: sat
+            for role, sat in (("source_link", source_sat), ("target_link", target_sat))
+            if sat
+        }
+        if not uav or not satellites:
+            return {}
+
+        links = compute_position_links(list(satellites.values()), [uav], frequency_mhz)
+        return {
+            role: {
+                "distance_km": round(float(links["distance_km"][i, 0]), 3),
+                "elevation_deg": round(float(links["elevation_deg"][i, 0]), 3),
+                "path_loss_db": round(float(links["path_loss_db"][i, 0]), 3),
+            }
+            for i, role in enumerate(satellites)
+        }
 
     def _generate_ip_from_position(self, position: SatellitePosition) -> str:
         """根據衛星位置生成IP地址"""
-        # 將緯度經度轉換為IP地址的簡化方法
-        lat_int = int((position.latitude + 90) * 255 / 180)
-        lon_int = int((position.longitude + 180) * 255 / 360)
+        return self._link_ip_from_coordinates(position.latitude, position.longitude)
+
+    @staticmethod
+    def _link_ip_from_coordinates(latitude: float, longitude: float) -> str:
+        """將緯度經度轉換為IP地址的簡化方法"""
+        lat_int = int((latitude + 90) * 255 / 180)
+        lon_int = int((longitude + 180) * 255 / 360)
         return f"172.{lat_int}.{lon_int}.1"
 
+    @staticmethod
+    def _config_cache_key(request: UERANSIMConfigRequest) -> str:
+        """
+        計算請求的內容定址快取鍵
+
+        省略的選填欄位與其默認值視為相同，欄位順序不影響結果。
+        """
+        normalized = request.dict(exclude_none=True)
+        for field, model in (
+            ("network_params", NetworkParameters),
+            ("handover_params", HandoverParameters),
+        ):
+            params = getattr(request, field) or model()
+            # 重新驗證以套用型別轉換（默認值不經過驗證）
+            normalized[field] = model(**params.dict()).dict(exclude_none=True)
+        payload = json.dumps(
+            normalized, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _gnb_yaml_values(gnb_config: GNBConfig) -> Dict[str, Any]:
+        """gNB模板的欄位值"""
+        return {
+            "mcc": gnb_config.mcc,
+            "mnc": gnb_config.mnc,
+            "nci": gnb_config.nci,
+            "idLength": gnb_config.id_length,
+            "tac": gnb_config.tac,
+            "linkIp": gnb_config.link_ip,
+            "ngapIp": gnb_config.ngap_ip,
+            "gtpIp": gnb_config.gtp_ip,
+            "frequency": gnb_config.frequency,
+            "txPower": gnb_config.tx_power,
+        }
+
+    @staticmethod
+    def _ue_yaml_values(ue_config: UEConfig) -> Dict[str, Any]:
+        """UE模板的欄位值"""
+        return {
+            "supi": ue_config.supi,
+            "mcc": ue_config.mcc,
+            "mnc": ue_config.mnc,
+            "op": ue_config.op,
+            "amf": ue_config.amf,
+            "imei": ue_config.imei,
+        }
+
     def _generate_yaml_config(
         self, gnb_config: GNBConfig, ue_config: UEConfig, scenario: ScenarioType
     ) -> str:
         """生成YAML格式的配置"""
-        config_dict = {
-            "scenario": scenario.value,
-            "generation_time": datetime.utcnow().isoformat(),
-            "gnb": {
-                "mcc": gnb_config.mcc,
-                "mnc": gnb_config.mnc,
-                "nci": gnb_config.nci,
-                "idLength": gnb_config.id_length,
-                "tac": gnb_config.tac,
-                "linkIp": gnb_config.link_ip,
-                "ngapIp": gnb_config.ngap_ip,
-                "gtpIp": gnb_config.gtp_ip,
-                "frequency": gnb_config.frequency,
-                "txPower": gnb_config.tx_power,
-                "plmns": [
-                    {
-                        "mcc": gnb_config.mcc,
-                        "mnc": gnb_config.mnc,
-                        "tac": gnb_config.tac,
-                        "nssai": [
-                            {"sst": 1, "sd": "0x111111"},
-                            {"sst": 2, "sd": "0x222222"},
-                            {"sst": 3, "sd": "0x333333"},
-                        ],
-                    }
-                ],
-            },
-            "ue": {
-                "supi": ue_config.supi,
-                "mcc": ue_config.mcc,
-                "mnc": ue_config.mnc,
-                "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
-                "op": ue_config.op,
-                "amf": ue_config.amf,
-                "imei": ue_config.imei,
-                "imeisv": "4370816125816151",
-                "sessions": [
-                    {
-                        "type": "IPv4",
-                        "apn": "internet",
-                        "slice": {"sst": 1, "sd": "0x111111"},
-                    }
-                ],
-            },
-        }
-
-        return yaml.dump(config_dict, default_flow_style=False, allow_unicode=True)
+        return self._yaml_template.render(
+            {
+                "scenario": scenario.value,
+                "generation_time": datetime.utcnow().isoformat(),
+                "gnb": self._gnb_yaml_values(gnb_config),
+                "ue": self._ue_yaml_values(ue_config),
+            }
+        )
 
     def _generate_handover_yaml_config(
         self, gnb_configs: List[GNBConfig], ue_config: UEConfig, scenario: ScenarioType
     ) -> str:
         """生成切換場景的YAML格式配置"""
-        config_dict = {
-            "scenario": scenario.value,
-            "generation_time": datetime.utcnow().isoformat(),
-            "handover_config": {
+        return self._handover_yaml_template.render(
+            {
+                "scenario": scenario.value,
+                "generation_time": datetime.utcnow().isoformat(),
                 "source_gnb": (
-                    {
-                        "mcc": gnb_configs[0].mcc,
-                        "mnc": gnb_configs[0].mnc,
-                        "nci": gnb_configs[0].nci,
-                        "idLength": gnb_configs[0].id_length,
-                        "tac": gnb_configs[0].tac,
-                        "linkIp": gnb_configs[0].link_ip,
-                        "ngapIp": gnb_configs[0].ngap_ip,
-                        "gtpIp": gnb_configs[0].gtp_ip,
-                        "frequency": gnb_configs[0].frequency,
-                        "txPower": gnb_configs[0].tx_power,
-                    }
+                    self._gnb_yaml_values(gnb_configs[0])
                     if len(gnb_configs) > 0
                     else None
                 ),
                 "target_gnb": (
-                    {
-                        "mcc": gnb_configs[1].mcc,
-                        "mnc": gnb_configs[1].mnc,
-                        "nci": gnb_configs[1].nci,
-                        "idLength": gnb_configs[1].id_length,
-                        "tac": gnb_configs[1].tac,
-                        "linkIp": gnb_configs[1].link_ip,
-                        "ngapIp": gnb_configs[1].ngap_ip,
-                        "gtpIp": gnb_configs[1].gtp_ip,
-                        "frequency": gnb_configs[1].frequency,
-                        "txPower": gnb_configs[1].tx_power,
-                    }
+                    self._gnb_yaml_values(gnb_configs[1])
                     if len(gnb_configs) > 1
                     else None
                 ),
-            },
-            "ue": {
-                "supi": ue_config.supi,
-                "mcc": ue_config.mcc,
-                "mnc": ue_config.mnc,
-                "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
-                "op": ue_config.op,
-                "amf": ue_config.amf,
-                "imei": ue_config.imei,
-                "imeisv": "4370816125816151",
-                "sessions": [
-                    {
-                        "type": "IPv4",
-                        "apn": "internet",
-                        "slice": {"sst": 1, "sd": "0x111111"},
-                    }
-                ],
-            },
-        }
-
-        return yaml.dump(config_dict, default_flow_style=False, allow_unicode=True)
+                "ue": self._ue_yaml_values(ue_config),
+            }
+        )
 
     def _generate_formation_yaml_config(
         self, gnb_config: GNBConfig, ue_configs: List[UEConfig], scenario: ScenarioType
     ) -> str:
         """生成編隊場景的YAML格式配置"""
-        config_dict = {
-            "scenario": scenario.value,
-            "generation_time": datetime.utcnow().isoformat(),
-            "gnb": {
-                "mcc": gnb_config.mcc,
-                "mnc": gnb_config.mnc,
-                "nci": gnb_config.nci,
-                "idLength": gnb_config.id_length,
-                "tac": gnb_config.tac,
-                "linkIp": gnb_config.link_ip,
-                "ngapIp": gnb_config.ngap_ip,
-                "gtpIp": gnb_config.gtp_ip,
-                "frequency": gnb_config.frequency,
-                "txPower": gnb_config.tx_power,
-            },
-            "formation": {
+        return self._formation_yaml_template.render(
+            {
+                "scenario": scenario.value,
+                "generation_time": datetime.utcnow().isoformat(),
+                "gnb": self._gnb_yaml_values(gnb_config),
                 "size": len(ue_configs),
                 "ues": [
-                    {
-                        "supi": ue.supi,
-                        "mcc": ue.mcc,
-                        "mnc": ue.mnc,
-                        "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
-                        "op": ue.op,
-                        "amf": ue.amf,
-                        "imei": ue.imei,
-                        "initial_slice": ue.initial_slice,
-                    }
+                    {**self._ue_yaml_values(ue), "initial_slice": ue.initial_slice}
                     for ue in ue_configs
                 ],
-            },
-        }
-
-        return yaml.dump(config_dict, default_flow_style=False, allow_unicode=True)
+            }
+        )
 
     def _generate_fallback_formation_config(
         self, gnb_config: GNBConfig, scenario: ScenarioType
     ) -> str:
         """生成備用編隊配置"""
-        fallback_config = {
-            "scenario": scenario.value,
-            "generation_time": datetime.utcnow().isoformat(),
-            "warning": "This is a fallback configuration due to missing UAV formation data",
-            "gnb": {
-                "mcc": gnb_config.mcc,
-                "mnc": gnb_config.mnc,
-                "nci": gnb_config.nci,
-                "idLength": gnb_config.id_length,
-                "tac": gnb_config.tac,
-                "linkIp": gnb_config.link_ip,
-                "ngapIp": gnb_config.ngap_ip,
-                "gtpIp": gnb_config.gtp_ip,
-                "frequency": gnb_config.frequency,
-                "txPower": gnb_config.tx_power,
-            },
-            "formation": {
-                "size": 3,
-                "type": "default_triangle",
-                "ues": [
-                    {
-                        "supi": "imsi-999700000000001",
-                        "role": "leader",
-                        "mcc": 999,
-                        "mnc": 70,
-                        "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
-                        "op": "E8ED289DEBA952E4283B54E88E6183CA",
-                        "amf": "8000",
-                        "imei": "356938035643801",
-                        "initial_slice": "01:111111",
-                    },
-                    {
-                        "supi": "imsi-999700000000002",
-                        "role": "follower",
-                        "mcc": 999,
-                        "mnc": 70,
-                        "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
-                        "op": "E8ED289DEBA952E4283B54E88E6183CA",
-                        "amf": "8000",
-                        "imei": "356938035643802",
-                        "initial_slice": "02:222222",
-                    },
-                    {
-                        "supi": "imsi-999700000000003",
-                        "role": "follower",
-                        "mcc": 999,
-                        "mnc": 70,
-                        "key": "465B5CE8B199B49FAA5F0A2EE238A6BC",
-                        "op": "E8ED289DEBA952E4283B54E88E6183CA",
-                        "amf": "8000",
-                        "imei": "356938035643803",
-                        "initial_slice": "02:222222",
-                    },
-                ],
-            },
-        }
-
-        return yaml.dump(fallback_config, default_flow_style=False, allow_unicode=True)
+        return self._fallback_formation_yaml_template.render(
+            {
+                "scenario": scenario.value,
+                "generation_time": datetime.utcnow().isoformat(),
+                "gnb": self._gnb_yaml_values(gnb_config),
+            }
+        )
 
     async def get_available_templates(self) -> List[Dict]:
         """獲取可用的配置模板"""
@@ -662,3 +1170,20 @@ class UERANSIMConfigService:
         ]
 
         return templates
+
+
+# 工作行程內的服務實例與事件迴圈，於首次執行工作時建立
+_worker_service: Optional[UERANSIMConfigService] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _generate_config_in_worker(
+    request: UERANSIMConfigRequest,
+) -> UERANSIMConfigResponse:
+    """在行程池的工作行程中生成單一配置"""
+    global _worker_service, _worker_loop
+    if _worker_service is None:
+        # 快取由父行程負責，工作行程不重複保存
+        _worker_service = UERANSIMConfigService(config_cache_max_entries=0)
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop.run_until_complete(_worker_service.generate_config(request))
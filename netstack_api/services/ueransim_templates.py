@@ -0,0 +1,168 @@
+"""
+UERANSIM YAML 預編譯模板
+
+模板骨架在建立時只以 PyYAML 序列化一次，輸出依插槽位置切成固定片段，
+渲染時只需把各插槽的值轉成 YAML 純量後串接，不必每次重建巢狀字典並
+執行完整的 yaml.dump。巢狀模板 (單一映射或映射列表) 依 PyYAML 預設的
+區塊縮排規則插入，輸出與直接 yaml.dump 完整字典相同。
+
+無法保證與 yaml.dump 輸出一致的值 (含空白或過長的字串) 會退回完整序列化。
+"""
+
+import functools
+import re
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as YAMLDumper
+except ImportError:  # pragma: no cover - 未編譯 LibYAML 時使用純 Python 版本
+    from yaml import SafeDumper as YAMLDumper
+
+_SLOT_PATTERN = re.compile(r"__slot_(\d+)__")
+# 可安全以獨立序列化結果代入的最大字串長度 (避免依欄位位置折行)
+_MAX_INLINE_STRING = 64
+
+
+def dump_yaml(data: Any) -> str:
+    """以 LibYAML (若可用) 序列化為區塊風格 YAML"""
+    return yaml.dump(
+        data, Dumper=YAMLDumper, default_flow_style=False, allow_unicode=True
+    )
+
+
+class _UnsafeScalar(Exception):
+    """純量無法直接代入模板"""
+
+
+@functools.lru_cache(maxsize=4096)
+def _dump_scalar(value_type: type, token: Optional[str], value: Any) -> str:
+    text = dump_yaml(value)
+    if text.endswith("\n...\n"):
+        text = text[:-5]
+    text = text.rstrip("\n")
+    if "\n" in text:
+        raise _UnsafeScalar(value)
+    return text
+
+
+def render_scalar(value: Any) -> str:
+    """將單一純量轉為 YAML 表示"""
+    if value is None:
+        return "null"
+    if type(value) is int:
+        return str(value)
+    if isinstance(value, str) and (
+        len(value) > _MAX_INLINE_STRING or any(ch.isspace() for ch in value)
+    ):
+        raise _UnsafeScalar(value)
+    # 以型別區分快取鍵，避免 True/1/1.0 共用同一項目；浮點數另以 repr 區分，
+    # 避免相等但輸出不同的 0.0 與 -0.0 共用同一項目
+    token = repr(value) if type(value) is float else None
+    return _dump_scalar(type(value), token, value)
+
+
+class Slot:
+    """
+    模板插槽
+
+    Args:
+        name: 渲染時取值的鍵
+        template: 巢狀模板，值為其參數字典 (可為 None)
+        many: 值為巢狀模板參數字典的列表
+    """
+
+    def __init__(
+        self, name: str, template: Optional["YAMLTemplate"] = None, many: bool = False
+    ):
+        self.name = name
+        self.template = template
+        self.many = many
+
+
+class YAMLTemplate:
+    """預編譯的 YAML 映射模板"""
+
+    def __init__(self, skeleton: Dict[str, Any]):
+        self.skeleton = skeleton
+        self._slots: List[Slot] = []
+
+        text = dump_yaml(self._mark(skeleton))
+        parts = _SLOT_PATTERN.split(text)
+        self._literals = parts[0::2]
+        self._order = [self._slots[int(index)] for index in parts[1::2]]
+        # 插槽所在鍵的欄位，巢狀區塊依此縮排
+        self._columns = []
+        for literal in self._literals[:-1]:
+            line = literal.rsplit("\n", 1)[-1]
+            self._columns.append(len(line) - len(line.lstrip(" -")))
+
+    def _mark(self, node: Any) -> Any:
+        """以哨兵字串取代骨架中的插槽"""
+        if isinstance(node, Slot):
+            self._slots.append(node)
+            return f"__slot_{len(self._slots) - 1}__"
+        if isinstance(node, dict):
+            return {key: self._mark(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [self._mark(value) for value in node]
+        return node
+
+    def fill(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """產生代入插槽值後的完整字典"""
+        return self._fill(self.skeleton, values)
+
+    def _fill(self, node: Any, values: Dict[str, Any]) -> Any:
+        if isinstance(node, Slot):
+            value = values[node.name]
+            if node.template is None or value is None:
+                return value
+            if node.many:
+                return [node.template.fill(item) for item in value]
+            return node.template.fill(value)
+        if isinstance(node, dict):
+            return {key: self._fill(value, values) for key, value in node.items()}
+        if isinstance(node, list):
+            return [self._fill(value, values) for value in node]
+        return node
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """渲染為 YAML 字串，無法直接代入時退回完整序列化"""
+        try:
+            return self._render(values)
+        except _UnsafeScalar:
+            return dump_yaml(self.fill(values))
+
+    def _render(self, values: Dict[str, Any]) -> str:
+        out = []
+        for literal, slot, column in zip(self._literals, self._order, self._columns):
+            value = values[slot.name]
+            if slot.template is None or value is None:
+                out.append(literal)
+                out.append(render_scalar(value))
+            elif slot.many:
+                if not value:
+                    out.append(literal)
+                    out.append("[]")
+                    continue
+                # 映射列表不額外縮排，與鍵同欄並以 "- " 開頭
+                block = "".join(
+                    _indent(slot.template._render(item), column, "- ", "  ")
+                    for item in value
+                )
+                out.append(literal[:-1])
+                out.append("\n" + block[:-1])
+            else:
+                block = _indent(slot.template._render(value), column + 2, "", "")
+                out.append(literal[:-1])
+                out.append("\n" + block[:-1])
+        out.append(self._literals[-1])
+        return "".join(out)
+
+
+def _indent(text: str, column: int, first: str, rest: str) -> str:
+    """將區塊文字縮排至指定欄位，首行與其餘行可使用不同前綴"""
+    pad = " " * column
+    lines = text.splitlines(True)
+    return "".join([pad + first + lines[0]] + [pad + rest + line for line in lines[1:]])
@@ -0,0 +1,52 @@
+"""
+行程內快取工具
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class LocalTTLCache:
+    """
+    行程內的 LRU + TTL 快取
+
+    超過 max_entries 時淘汰最久未使用的項目，項目在 ttl 秒後過期。
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """取得未過期的項目並標記為最近使用"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """寫入項目，必要時淘汰最久未使用的項目"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        """移除項目"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """清空快取"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
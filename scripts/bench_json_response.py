@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+API 回應 JSON 序列化效能測試
+
+比較 CustomJSONResponse (標準函式庫 json + CustomJSONEncoder) 與
+FastJSONResponse (已安裝 orjson 時使用 orjson) 序列化 UE 列表的耗時。
+
+使用方式:
+    python scripts/bench_json_response.py
+    python scripts/bench_json_response.py --ues 10000 --rounds 20
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from netstack_api.main import (  # noqa: E402
+    CustomJSONResponse,
+    FastJSONResponse,
+    orjson,
+)
+
+
+def build_ue_page(count: int) -> dict:
+    """建立與 GET /api/v1/ue 相同結構的 UE 列表"""
+    created = datetime(2025, 1, 1, 12, 0, 0)
+    ues = [
+        {
+            "imsi": f"99970{i:010d}",
+            "apn": "internet",
+            "slice": {"sst": 1, "sd": "0x111111", "slice_type": "eMBB"},
+            "status": "online" if i % 2 else "registered",
+            "ip_address": None,
+            "last_seen": created + timedelta(seconds=i),
+            "created_at": created.isoformat(),
+        }
+        for i in range(count)
+    ]
+    return {"ues": ues, "count": count, "limit": count, "next_cursor": None}
+
+
+def bench(response_class, content: dict, rounds: int) -> float:
+    """回傳單次 render 的中位數耗時 (毫秒)"""
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response_class(content=content)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API 回應 JSON 序列化效能測試")
+    parser.add_argument("--ues", type=int, default=10000, help="UE 數量")
+    parser.add_argument("--rounds", type=int, default=20, help="重複次數")
+    args = parser.parse_args()
+
+    content = build_ue_page(args.ues)
+    baseline = bench(CustomJSONResponse, content, args.rounds)
+    fast = bench(FastJSONResponse, content, args.rounds)
+
+    print(f"UE 數量: {args.ues}，重複 {args.rounds} 次 (中位數)")
+    engine = "orjson" if orjson is not None else "json fallback"
+    print(f"CustomJSONResponse (json): {baseline:8.2f} ms")
+    print(f"FastJSONResponse ({engine}): {fast:8.2f} ms")
+    print(f"加速倍數: {baseline / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Redis 快取內容序列化效能測試
+
+比較各序列化格式對 UE 資訊與切換歷史記錄的編碼/解碼耗時與內容大小。
+指定 --redis-url 時會實際寫入 Redis，並以 MEMORY USAGE 量測每個 UE 的記憶體用量。
+
+使用方式:
+    python scripts/bench_redis_serializers.py
+    python scripts/bench_redis_serializers.py --count 100000 --redis-url redis://localhost:6379
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from netstack_api.adapters.redis_serializers import (  # noqa: E402
+    SERIALIZERS,
+    decode_payload,
+    get_serializer,
+)
+
+SAMPLE_PAYLOADS = {
+    "ue_info": {
+        "imsi": "999700000000001",
+        "apn": "internet",
+        "slice": {"sst": 1, "sd": "0x111111", "slice_type": "eMBB"},
+        "status": "online",
+        "ip_address": None,
+        "last_seen": None,
+        "created_at": datetime(2025, 1, 1, 12, 0, 0).isoformat(),
+    },
+    "switch_record": {
+        "imsi": "999700000000001",
+        "from_slice": "eMBB",
+        "to_slice": "uRLLC",
+        "timestamp": datetime(2025, 1, 1, 12, 0, 0).isoformat(),
+    },
+}
+
+
+def bench_cpu(name: str, payload: dict, count: int) -> dict:
+    """量測單一格式的編碼/解碼耗時 (每筆微秒)"""
+    serializer = get_serializer(name)
+    encoded = serializer.encode(payload)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        serializer.encode(payload)
+    encode_us = (time.perf_counter() - start) / count * 1e6
+
+    start = time.perf_counter()
+    for _ in range(count):
+        decode_payload(encoded)
+    decode_us = (time.perf_counter() - start) / count * 1e6
+
+    return {"size": len(encoded), "encode_us": encode_us, "decode_us": decode_us}
+
+
+async def bench_memory(redis_url: str, name: str, payload: dict, count: int) -> float:
+    """寫入 count 個 UE 資訊並回傳每個鍵的平均 MEMORY USAGE (位元組)"""
+    import redis.asyncio as redis
+
+    client = redis.from_url(redis_url, decode_responses=False)
+    serializer = get_serializer(name)
+    prefix = f"bench:serializer:{name}:"
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for i in range(count):
+                pipe.set(
+                    f"{prefix}{i}", serializer.encode({**payload, "imsi": f"{i:015d}"})
+                )
+            await pipe.execute()
+
+        sample = range(0, count, max(1, count // 1000))
+        async with client.pipeline(transaction=False) as pipe:
+            for i in sample:
+                pipe.memory_usage(f"{prefix}{i}")
+            usages = await pipe.execute()
+
+        return statistics.mean(usages)
+    finally:
+        keys = [f"{prefix}{i}" for i in range(count)]
+        for start in range(0, len(keys), 1000):
+            await client.delete(*keys[start : start + 1000])
+        await client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis 快取內容序列化效能測試")
+    parser.add_argument("--count", type=int, default=100000, help="每項測試的次數")
+    parser.add_argument("--redis-url", help="量測 Redis 記憶體用量時使用的連接字串")
+    args = parser.parse_args()
+
+    for payload_name, payload in SAMPLE_PAYLOADS.items():
+        print(f"\n== {payload_name} ({args.count} 次) ==")
+        print(f"{'format':<10}{'bytes':>8}{'encode µs':>12}{'decode µs':>12}", end="")
+        print(f"{'redis B/UE':>12}" if args.redis_url else "")
+
+        for name in SERIALIZERS:
+            if get_serializer(name).name != name:
+                print(f"{name:<10}  (未安裝，略過)")
+                continue
+
+            result = bench_cpu(name, payload, args.count)
+            line = (
+                f"{name:<10}{result['size']:>8}"
+                f"{result['encode_us']:>12.2f}{result['decode_us']:>12.2f}"
+            )
+            if args.redis_url and payload_name == "ue_info":
+                memory = asyncio.run(
+                    bench_memory(args.redis_url, name, payload, args.count)
+                )
+                line += f"{memory:>12.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
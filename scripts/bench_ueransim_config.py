@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+UERANSIM YAML 配置生成效能測試
+
+比較三種 YAML 產生方式的每秒配置數：
+完整 yaml.dump (純 Python Dumper，舊版做法)、完整 yaml.dump (LibYAML
+CSafeDumper，若可用) 與預編譯模板渲染；並量測 generate_config 在
+快取未命中與命中時的每秒配置數。
+
+使用方式:
+    python scripts/bench_ueransim_config.py
+    python scripts/bench_ueransim_config.py --count 20000 --formation-size 5
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from netstack_api.models.ueransim_models import (  # noqa: E402
+    GNBConfig,
+    SatellitePosition,
+    ScenarioType,
+    UAVPosition,
+    UEConfig,
+    UERANSIMConfigRequest,
+)
+from netstack_api.services.ueransim_service import UERANSIMConfigService  # noqa: E402
+from netstack_api.services.ueransim_templates import YAMLDumper, dump_yaml  # noqa: E402
+
+
+def rate(func, count: int) -> float:
+    """回傳每秒執行次數"""
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return count / (time.perf_counter() - start)
+
+
+def build_values(service: UERANSIMConfigService, formation_size: int) -> dict:
+    """建立編隊場景模板的欄位值"""
+    gnb = GNBConfig(nci="0x00000001", link_ip="172.150.221.1", tx_power=27)
+    ues = [
+        UEConfig(
+            supi=f"imsi-99970000{i + 1:07d}",
+            imei=f"35693803{i + 1:08d}",
+            initial_slice="01:111111" if i == 0 else "02:222222",
+        )
+        for i in range(formation_size)
+    ]
+    return {
+        "scenario": ScenarioType.UAV_FORMATION_FLIGHT.value,
+        "generation_time": "2025-01-01T12:00:00.000000",
+        "gnb": service._gnb_yaml_values(gnb),
+        "size": len(ues),
+        "ues": [
+            {**service._ue_yaml_values(ue), "initial_slice": ue.initial_slice}
+            for ue in ues
+        ],
+    }
+
+
+def build_request(i: int) -> UERANSIMConfigRequest:
+    """建立第 i 個LEO衛星過境請求 (UAV 位置各不相同)"""
+    return UERANSIMConfigRequest(
+        scenario=ScenarioType.LEO_SATELLITE_PASS,
+        satellite=SatellitePosition(
+            id="SAT-LEO-001", latitude=25.0, longitude=121.0, altitude=550
+        ),
+        uav=UAVPosition(
+            id="UAV-001",
+            latitude=25.0 + i * 1e-5,
+            longitude=121.5,
+            altitude=100,
+        ),
+    )
+
+
+async def bench_generate(service: UERANSIMConfigService, count: int) -> tuple:
+    """回傳 generate_config 快取未命中與命中的每秒配置數"""
+    requests = [build_request(i) for i in range(count)]
+
+    start = time.perf_counter()
+    for request in requests:
+        await service.generate_config(request)
+    cold = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for request in requests:
+        await service.generate_config(request)
+    warm = count / (time.perf_counter() - start)
+    return cold, warm
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="UERANSIM YAML 配置生成效能測試")
+    parser.add_argument("--count", type=int, default=5000, help="每項測試的次數")
+    parser.add_argument("--formation-size", type=int, default=3, help="編隊UAV數量")
+    args = parser.parse_args()
+
+    service = UERANSIMConfigService(config_cache_max_entries=args.count)
+    template = service._formation_yaml_template
+    values = build_values(service, args.formation_size)
+    config = template.fill(values)
+
+    assert template.render(values) == yaml.dump(
+        config, default_flow_style=False, allow_unicode=True
+    ), "模板輸出與 yaml.dump 不一致"
+
+    results = {
+        "yaml.dump (Dumper)": rate(
+            lambda _: yaml.dump(config, default_flow_style=False, allow_unicode=True),
+            args.count,
+        ),
+        f"yaml.dump ({YAMLDumper.__name__})": rate(
+            lambda _: dump_yaml(config), args.count
+        ),
+        "預編譯模板": rate(lambda _: template.render(values), args.count),
+    }
+    cold, warm = asyncio.run(bench_generate(service, args.count))
+    results["generate_config (未命中)"] = cold
+    results["generate_config (快取命中)"] = warm
+
+    print(f"編隊 {args.formation_size} 架 UAV，每項 {args.count} 次")
+    baseline = results["yaml.dump (Dumper)"]
+    for name, configs_per_second in results.items():
+        print(
+            f"{name:<28}{configs_per_second:>12.0f} configs/s"
+            f"{configs_per_second / baseline:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+pytest 共用設定
+
+讓測試可以直接匯入 netstack_api (與 scripts/ 下的腳本相同做法)。
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
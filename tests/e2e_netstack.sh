@@ -219,13 +219,14 @@ test_list_ues() {
     log_debug "列出 UE 回應: ${body:0:100}... (HTTP 狀態碼: $http_code)"
     
     if [ "$http_code" == "200" ]; then
-        # 檢查是否為有效的 JSON 並包含陣列
-        if echo "$body" | jq -e '. | if type=="array" then true else false end' >/dev/null 2>&1; then
-            ue_count=$(echo "$body" | jq '. | length')
-            log_info "✅ 成功列出 UE，共 $ue_count 個"
+        # 檢查是否為有效的 JSON 並包含 ues 陣列
+        if echo "$body" | jq -e '.ues | if type=="array" then true else false end' >/dev/null 2>&1; then
+            ue_count=$(echo "$body" | jq '.ues | length')
+            next_cursor=$(echo "$body" | jq -r '.next_cursor')
+            log_info "✅ 成功列出 UE，本頁共 $ue_count 個 (next_cursor: $next_cursor)"
             return 0
         else
-            log_error "❌ 回應不是一個有效的 JSON 陣列"
+            log_error "❌ 回應不包含有效的 ues 陣列"
             echo "回應正文: $body"
             return 1
         fi
@@ -0,0 +1,28 @@
+"""
+健康檢查端點的回應內容
+"""
+
+from fastapi.testclient import TestClient
+
+from netstack_api.main import app
+
+
+class SnapshotHealthService:
+    """回傳固定健康快照的健康檢查服務"""
+
+    async def check_system_health(self):
+        return {
+            "overall_status": "healthy",
+            "timestamp": "2025-01-01T12:00:00",
+            "services": {"redis": {"status": "healthy", "response_time": 0.02}},
+            "snapshot_age": 1.234,
+        }
+
+
+def test_health_response_includes_snapshot_age(monkeypatch):
+    monkeypatch.setattr(app.state, "health_service", SnapshotHealthService(), False)
+
+    response = TestClient(app).get("/health")
+
+    assert response.status_code == 200
+    assert response.json()["snapshot_age"] == 1.234
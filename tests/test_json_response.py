@@ -0,0 +1,115 @@
+"""
+FastJSONResponse / dumps_json 與 CustomJSONResponse 的輸出比對
+
+以各高頻端點實際回傳的內容結構，確認 orjson 與標準函式庫的輸出位元組
+相同，並明確驗證兩者已知的差異 (非有限浮點數與指數寫法)。
+"""
+
+import json
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+from netstack_api import main
+from netstack_api.adapters.redis_adapter import RTTSketch
+from netstack_api.main import CustomJSONResponse, FastJSONResponse, dumps_json
+from netstack_api.services.slice_service import SliceType
+
+
+def ue_info(i: int) -> dict:
+    """GET /api/v1/ue/{imsi} 與 NDJSON 匯出的 UE 資訊"""
+    return {
+        "imsi": f"99970{i:010d}",
+        "apn": "internet",
+        "slice": {"sst": 1, "sd": "0x111111", "slice_type": SliceType.EMBB.value},
+        "status": "online" if i % 2 else "registered",
+        "ip_address": None,
+        "last_seen": datetime(2025, 1, 1, 12, 0, i % 60, i * 1000 % 1000000),
+        "created_at": datetime(2025, 1, 1, 12, 0, 0).isoformat(),
+    }
+
+
+def ue_page() -> dict:
+    """GET /api/v1/ue 的分頁回應"""
+    ues = [ue_info(i) for i in range(50)]
+    return {"ues": ues, "count": len(ues), "limit": 50, "next_cursor": ues[-1]["imsi"]}
+
+
+def slice_statistics() -> dict:
+    """GET /api/v1/slice/statistics 的回應 (含 RTT 分位數浮點數)"""
+    rng = random.Random(0)
+    statistics = {}
+    for slice_type in SliceType:
+        sketch = RTTSketch()
+        samples = [rng.lognormvariate(3, 0.8) for _ in range(1000)]
+        fields = {"count": len(samples), "sum": sum(samples)}
+        for value in samples:
+            bucket = sketch.bucket_of(value)
+            fields[bucket] = fields.get(bucket, 0) + 1
+        sketch.merge_fields(fields)
+        statistics[slice_type.value] = {
+            "slice_type": slice_type.value,
+            "active_ues": rng.randint(0, 10000),
+            "switches_24h": rng.randint(0, 500),
+            "rtt_ms": {**sketch.summary(), "window_seconds": 300},
+        }
+    return {
+        "success": True,
+        "statistics": statistics,
+        "timestamp": datetime(2025, 1, 1, 12, 0, 0, 123456).isoformat(),
+    }
+
+
+ENDPOINT_PAYLOADS = {
+    "ue_info": ue_info(1),
+    "ue_list": ue_page(),
+    "slice_statistics": slice_statistics(),
+    "unicode_and_keys": {"名稱": "長機-01", 1: "int key", "nested": [1, 2.5, True]},
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def json_backend(request, monkeypatch):
+    """分別以 orjson 與標準函式庫實作執行測試"""
+    if request.param == "orjson":
+        if main.orjson is None:
+            pytest.skip("未安裝 orjson")
+    else:
+        monkeypatch.setattr(main, "orjson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("name", ENDPOINT_PAYLOADS)
+def test_endpoint_payloads_match_custom_response(json_backend, name):
+    content = ENDPOINT_PAYLOADS[name]
+    assert (
+        FastJSONResponse(content=content).body
+        == CustomJSONResponse(content=content).body
+    )
+
+
+def test_ndjson_export_lines_match_custom_response(json_backend):
+    for i in range(20):
+        assert dumps_json(ue_info(i)) == CustomJSONResponse(content=ue_info(i)).body
+
+
+@pytest.mark.parametrize("value", [math.nan, math.inf, -math.inf])
+def test_non_finite_floats_become_null(json_backend, value):
+    content = {"rtt_ms": {"avg": value, "p99": 12.5}, "samples": [value]}
+
+    # CustomJSONResponse 拒絕非有限浮點數，FastJSONResponse 一律輸出 null
+    with pytest.raises(ValueError):
+        CustomJSONResponse(content=content)
+    assert json.loads(FastJSONResponse(content=content).body) == {
+        "rtt_ms": {"avg": None, "p99": 12.5},
+        "samples": [None],
+    }
+
+
+@pytest.mark.parametrize("value", [1e16, 1e-5, 2.5e-7, 1e22, 0.1, 1 / 3])
+def test_float_values_round_trip(json_backend, value):
+    # 指數寫法可能不同 (orjson 為 1e16，標準函式庫為 1e+16)，但數值必須相同
+    body = FastJSONResponse(content={"value": value}).body
+    assert json.loads(body)["value"] == value
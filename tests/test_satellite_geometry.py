@@ -0,0 +1,39 @@
+"""
+衛星幾何計算的座標轉換
+
+驗證 ECEF 與大地座標互轉在赤道、中緯度與極區 (含極點) 都能還原。
+"""
+
+import numpy as np
+import pytest
+
+from netstack_api.services.satellite_geometry import (
+    WGS84_A_KM,
+    WGS84_F,
+    ecef_to_geodetic,
+    geodetic_to_ecef,
+)
+
+LATITUDES = [0.0, 25.0, 45.0, -60.0, 89.9, 89.99, 89.9999, 90.0, -89.9999, -90.0]
+ALTITUDES_KM = [0.0, 0.1, 550.0, 1200.0]
+
+
+@pytest.mark.parametrize("latitude", LATITUDES)
+def test_geodetic_round_trip(latitude):
+    lat, lon, alt = ecef_to_geodetic(
+        geodetic_to_ecef(np.full(4, latitude), np.full(4, 121.0), ALTITUDES_KM)
+    )
+    np.testing.assert_allclose(lat, latitude, atol=1e-6)
+    np.testing.assert_allclose(alt, ALTITUDES_KM, atol=1e-6)
+    if abs(latitude) < 90:
+        np.testing.assert_allclose(lon, 121.0, atol=1e-6)
+
+
+def test_altitude_above_pole():
+    polar_radius = WGS84_A_KM * (1 - WGS84_F)
+    radius = WGS84_A_KM + 550
+
+    for z in (radius, -radius):
+        lat, _, alt = ecef_to_geodetic(np.array([0.0, 0.0, z]))
+        assert lat == pytest.approx(np.sign(z) * 90)
+        assert alt == pytest.approx(radius - polar_radius, abs=1e-6)
@@ -0,0 +1,89 @@
+"""
+LEO衛星過境模擬的時間步數上限
+
+驗證請求模型的上限檢查與 iter_satellite_pass 實際產生的步數使用相同計算
+(包含起點)。
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from netstack_api.main import app
+from netstack_api.models.ueransim_models import (
+    MAX_PASS_SIMULATION_STEPS,
+    OrbitParameters,
+    SatellitePassSimulationRequest,
+    UAVPosition,
+    pass_simulation_step_count,
+)
+from netstack_api.services.ueransim_service import UERANSIMConfigService
+
+UAV = {"id": "UAV-001", "latitude": 25.0, "longitude": 121.5, "altitude": 100}
+
+
+def build_request(duration_seconds: float, step_ms: int):
+    return SatellitePassSimulationRequest(
+        orbit=OrbitParameters(),
+        uav=UAVPosition(**UAV),
+        duration_seconds=duration_seconds,
+        step_ms=step_ms,
+    )
+
+
+def count_steps(request: SatellitePassSimulationRequest) -> int:
+    async def run():
+        service = UERANSIMConfigService(max_workers=0)
+        return sum([len(steps) async for steps in service.iter_satellite_pass(request)])
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "duration_seconds, step_ms", [(1.0, 100), (0.95, 100), (2.5, 1000)]
+)
+def test_step_count_matches_generated_steps(duration_seconds, step_ms):
+    request = build_request(duration_seconds, step_ms)
+    assert count_steps(request) == pass_simulation_step_count(duration_seconds, step_ms)
+
+
+def test_one_hour_at_10ms_exceeds_cap():
+    # 含起點共 360001 步，超過上限
+    assert pass_simulation_step_count(3600, 10) == MAX_PASS_SIMULATION_STEPS + 1
+    with pytest.raises(ValidationError):
+        build_request(3600, 10)
+
+    response = TestClient(app).post(
+        "/api/v1/ueransim/satellite-pass/simulate",
+        json={"orbit": {}, "uav": UAV, "duration_seconds": 3600, "step_ms": 10},
+    )
+    assert response.status_code == 422
+
+
+def test_step_count_at_cap_is_accepted():
+    duration_seconds = (MAX_PASS_SIMULATION_STEPS - 1) * 10 / 1000
+    assert pass_simulation_step_count(duration_seconds, 10) == MAX_PASS_SIMULATION_STEPS
+    request = build_request(duration_seconds, 10)
+    assert request.step_ms == 10
+
+
+def test_polar_orbit_reports_altitude_above_pole():
+    # 傾角 90°、緯度幅角 90° 時，起點位於北極正上方
+    request = SatellitePassSimulationRequest(
+        orbit=OrbitParameters(altitude=550, inclination=90, arg_latitude=90),
+        uav=UAVPosition(**UAV),
+        duration_seconds=1,
+        step_ms=1000,
+    )
+
+    async def first_step():
+        service = UERANSIMConfigService(max_workers=0)
+        async for steps in service.iter_satellite_pass(request):
+            return steps[0]
+
+    satellite = asyncio.run(first_step())["satellite"]
+    assert satellite["latitude"] == pytest.approx(90, abs=1e-4)
+    # 軌道半徑 (赤道半徑 + 550 公里) 減去極半徑
+    assert satellite["altitude"] == pytest.approx(571.385, abs=1e-3)
@@ -0,0 +1,73 @@
+"""
+UERANSIM 批次配置生成的行程池復原
+
+工作行程異常結束會使整個行程池損壞，之後的批次必須改用新的行程池。
+"""
+
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from netstack_api.models.ueransim_models import (
+    SatellitePosition,
+    ScenarioType,
+    UAVPosition,
+    UERANSIMConfigRequest,
+)
+from netstack_api.services.ueransim_service import UERANSIMConfigService
+
+
+def build_request(i: int) -> UERANSIMConfigRequest:
+    """建立第 i 個LEO衛星過境請求 (UAV 位置各不相同)"""
+    return UERANSIMConfigRequest(
+        scenario=ScenarioType.LEO_SATELLITE_PASS,
+        satellite=SatellitePosition(
+            id="SAT-LEO-001", latitude=25.0, longitude=121.0, altitude=550
+        ),
+        uav=UAVPosition(
+            id="UAV-001", latitude=25.0 + i * 1e-3, longitude=121.5, altitude=100
+        ),
+    )
+
+
+def run_batch(service: UERANSIMConfigService, requests) -> dict:
+    async def collect():
+        return {
+            index: result async for index, result in service.generate_configs(requests)
+        }
+
+    return asyncio.run(collect())
+
+
+@pytest.fixture
+def service():
+    service = UERANSIMConfigService(max_workers=1)
+    yield service
+    service.shutdown()
+
+
+def test_batch_after_broken_pool_succeeds(service):
+    assert all(r.success for r in run_batch(service, [build_request(0)]).values())
+    broken = service._executor
+
+    # 讓唯一的工作行程異常結束，行程池隨即損壞
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result(timeout=60)
+
+    results = run_batch(service, [build_request(i) for i in range(1, 5)])
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(result.success for result in results.values())
+    assert service._executor is not None and service._executor is not broken
+
+
+def test_pool_breaking_mid_batch_retries_pending_configs(service):
+    broken = service._get_executor()
+
+    # 工作行程在處理批次前先異常結束，已送出的配置需在新的行程池重試
+    broken.submit(os._exit, 1)
+    results = run_batch(service, [build_request(i) for i in range(10, 14)])
+    assert sorted(results) == [0, 1, 2, 3]
+    assert all(result.success for result in results.values())
+    assert service._executor is not broken
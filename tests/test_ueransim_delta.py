@@ -0,0 +1,157 @@
+"""
+位置更新增量配置 (config_patch) 的基準管理
+
+驗證首次請求回傳完整配置、低於閾值的變化累積到超過閾值才列入差異，
+且基準只推進已送出的鏈路欄位。
+"""
+
+import asyncio
+
+import pytest
+
+from netstack_api.models.ueransim_models import (
+    DeltaThresholds,
+    NetworkParameters,
+    SatellitePosition,
+    ScenarioType,
+    UAVPosition,
+    UERANSIMConfigRequest,
+)
+from netstack_api.services.ueransim_service import UERANSIMConfigService
+
+STATE_KEY = "SAT-LEO-001:UAV-001"
+SATELLITE = SatellitePosition(
+    id="SAT-LEO-001", latitude=25.0, longitude=121.0, altitude=550
+)
+# 只有仰角閾值足夠小，其餘鏈路欄位的變化都不會達到閾值
+ELEVATION_ONLY = DeltaThresholds(distance_km=100, path_loss_db=100, elevation_deg=0.01)
+
+
+def position_update(
+    latitude: float, delta: bool = True, thresholds: DeltaThresholds = None
+) -> UERANSIMConfigRequest:
+    return UERANSIMConfigRequest(
+        scenario=ScenarioType.POSITION_UPDATE,
+        satellite=SATELLITE,
+        uav=UAVPosition(id="UAV-001", latitude=latitude, longitude=121.5, altitude=100),
+        delta=delta,
+        delta_thresholds=thresholds,
+    )
+
+
+def satellite_pass(latitude: float) -> UERANSIMConfigRequest:
+    return UERANSIMConfigRequest(
+        scenario=ScenarioType.LEO_SATELLITE_PASS,
+        satellite=SATELLITE,
+        uav=UAVPosition(id="UAV-002", latitude=latitude, longitude=121.5, altitude=100),
+    )
+
+
+def generate(service: UERANSIMConfigService, request: UERANSIMConfigRequest):
+    return asyncio.run(service.generate_config(request))
+
+
+def link_at(service: UERANSIMConfigService, latitude: float) -> dict:
+    request = position_update(latitude)
+    return service._calculate_position_link(
+        request.satellite, request.uav, NetworkParameters().frequency
+    )
+
+
+@pytest.fixture
+def service():
+    return UERANSIMConfigService(max_workers=0)
+
+
+def test_first_request_returns_full_config(service):
+    result = generate(service, position_update(25.0))
+
+    assert result.success
+    assert result.config_patch is None
+    assert result.config_yaml
+    assert result.gnb_config is not None and result.ue_config is not None
+    assert service._position_states.get(STATE_KEY)["link"] == link_at(service, 25.0)
+
+
+def test_below_threshold_move_returns_empty_patch(service):
+    generate(service, position_update(25.0))
+    baseline = service._position_states.get(STATE_KEY)
+
+    result = generate(service, position_update(25.001))
+
+    assert result.success
+    assert result.config_patch == {}
+    assert result.config_yaml is None
+    assert service._position_states.get(STATE_KEY) == baseline
+
+
+def test_sub_threshold_moves_accumulate_until_threshold(service):
+    latitudes = [25.0, 25.01, 25.02, 25.03]
+    links = [link_at(service, latitude) for latitude in latitudes]
+    # 每一步的仰角變化都低於閾值，累積後才超過
+    for previous, current in zip(links, links[1:]):
+        assert abs(current["elevation_deg"] - previous["elevation_deg"]) < 0.01
+    assert abs(links[-1]["elevation_deg"] - links[0]["elevation_deg"]) >= 0.01
+
+    generate(service, position_update(latitudes[0], thresholds=ELEVATION_ONLY))
+    for latitude in latitudes[1:-1]:
+        result = generate(service, position_update(latitude, thresholds=ELEVATION_ONLY))
+        assert result.config_patch == {}
+
+    result = generate(
+        service, position_update(latitudes[-1], thresholds=ELEVATION_ONLY)
+    )
+    assert result.config_patch == {
+        "link": {"elevation_deg": links[-1]["elevation_deg"]}
+    }
+
+    # 基準只推進已送出的欄位，其餘鏈路欄位仍保留首次配置的值
+    baseline_link = service._position_states.get(STATE_KEY)["link"]
+    assert baseline_link["elevation_deg"] == links[-1]["elevation_deg"]
+    assert baseline_link["distance_km"] == links[0]["distance_km"]
+    assert baseline_link["path_loss_db"] == links[0]["path_loss_db"]
+
+
+def test_non_delta_request_resets_baseline(service):
+    generate(service, position_update(25.0, thresholds=ELEVATION_ONLY))
+
+    result = generate(service, position_update(25.03, delta=False))
+    assert result.config_patch is None
+    assert result.config_yaml
+    assert service._position_states.get(STATE_KEY)["link"] == link_at(service, 25.03)
+
+    # 新基準之後，同一位置的增量請求無需更新
+    result = generate(service, position_update(25.03, thresholds=ELEVATION_ONLY))
+    assert result.config_patch == {}
+
+
+def test_generate_configs_serves_position_updates_inline_in_order():
+    service = UERANSIMConfigService(max_workers=1)
+    requests = [
+        position_update(25.0, thresholds=ELEVATION_ONLY),
+        satellite_pass(25.0),
+        position_update(25.03, thresholds=ELEVATION_ONLY),
+        satellite_pass(25.1),
+        position_update(25.03, thresholds=ELEVATION_ONLY),
+    ]
+
+    async def collect():
+        return [item async for item in service.generate_configs(requests)]
+
+    try:
+        results = asyncio.run(collect())
+    finally:
+        service.shutdown()
+
+    order = [index for index, _ in results if index in (0, 2, 4)]
+    assert order == [0, 2, 4]
+
+    by_index = dict(results)
+    assert all(result.success for result in by_index.values())
+    assert by_index[0].config_patch is None
+    assert set(by_index[2].config_patch) == {"link"}
+    assert by_index[4].config_patch == {}
+    # 增量基準保存在本行程，代表位置更新未交由工作行程處理
+    assert service._position_states.get(STATE_KEY)["link"]["elevation_deg"] == (
+        by_index[2].config_patch["link"]["elevation_deg"]
+    )
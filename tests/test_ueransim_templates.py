@@ -0,0 +1,226 @@
+"""
+預編譯 YAML 模板與完整序列化的輸出比對
+
+對配置服務的四個模板，以各種需要引號、跳脫或折行的純量逐一代入所有
+插槽，確認 render() 與 dump_yaml(fill()) 以及舊版 yaml.dump 的輸出完全相同。
+"""
+
+import pytest
+import yaml
+
+from netstack_api.models.ueransim_models import GNBConfig, UEConfig
+from netstack_api.services.ueransim_service import UERANSIMConfigService
+from netstack_api.services.ueransim_templates import dump_yaml
+
+SERVICE = UERANSIMConfigService(max_workers=0)
+
+ADVERSARIAL_STRINGS = [
+    "",
+    " ",
+    "yes",
+    "No",
+    "on",
+    "OFF",
+    "y",
+    "n",
+    "true",
+    "False",
+    "null",
+    "NULL",
+    "~",
+    "0x-LEO-001",
+    "0x00000001",
+    "0x1F",
+    "0o17",
+    "017",
+    "08",
+    "1_000",
+    "+1",
+    "-1",
+    "1e3",
+    "1.5",
+    ".inf",
+    "-.Inf",
+    ".nan",
+    "12:30",
+    "1:20:30",
+    "2025-01-01",
+    "2025-01-01T12:00:00.000000",
+    "a: b",
+    "a:b",
+    "a #b",
+    "a#b",
+    "#comment",
+    "- x",
+    "-",
+    "--- x",
+    "...",
+    "? x",
+    ":",
+    ",",
+    "[x]",
+    "{x: y}",
+    "*alias",
+    "&anchor",
+    "!tag",
+    "|",
+    ">",
+    "'quoted'",
+    '"quoted"',
+    "%directive",
+    "@at",
+    "`tick",
+    "<<",
+    "=",
+    " leading",
+    "trailing ",
+    "a b",
+    "tab\there",
+    "line\nbreak",
+    "crlf\r\n",
+    "back\\slash",
+    "長機-01",
+    "imsi-999700000000001",
+    "172.17.0.1",
+    "x" * 64,
+    "x" * 65,
+    "word " * 20,
+]
+ADVERSARIAL_SCALARS = ADVERSARIAL_STRINGS + [
+    None,
+    True,
+    False,
+    0,
+    -1,
+    2**40,
+    0.0,
+    -0.0,
+    1.5,
+    1e20,
+    1e-7,
+    float("inf"),
+]
+
+
+def gnb_values() -> dict:
+    return SERVICE._gnb_yaml_values(
+        GNBConfig(nci="0x00000001", link_ip="172.150.221.1", tx_power=27)
+    )
+
+
+def ue_values(i: int = 0) -> dict:
+    return SERVICE._ue_yaml_values(
+        UEConfig(supi=f"imsi-99970000{i + 1:07d}", imei=f"35693803{i + 1:08d}")
+    )
+
+
+def formation_ue(i: int) -> dict:
+    return {**ue_values(i), "initial_slice": "01:111111" if i == 0 else "02:222222"}
+
+
+def with_scalar(values: dict, scalar) -> dict:
+    """將所有欄位都換成同一個純量"""
+    return {key: scalar for key in values}
+
+
+def template_cases(scalar):
+    """(名稱, 模板, 參數) 組合，所有插槽都代入指定純量"""
+    header = {"scenario": scalar, "generation_time": scalar}
+    gnb = with_scalar(gnb_values(), scalar)
+    ue = with_scalar(ue_values(), scalar)
+    ues = [with_scalar(formation_ue(i), scalar) for i in range(3)]
+    return [
+        ("basic", SERVICE._yaml_template, {**header, "gnb": gnb, "ue": ue}),
+        (
+            "handover",
+            SERVICE._handover_yaml_template,
+            {**header, "source_gnb": gnb, "target_gnb": gnb, "ue": ue},
+        ),
+        (
+            "formation",
+            SERVICE._formation_yaml_template,
+            {**header, "gnb": gnb, "size": scalar, "ues": ues},
+        ),
+        ("fallback", SERVICE._fallback_formation_yaml_template, {**header, "gnb": gnb}),
+    ]
+
+
+def structural_cases():
+    """空列表、缺少的巢狀模板等結構上的邊界情況"""
+    header = {"scenario": "leo_satellite_pass", "generation_time": "2025-01-01"}
+    return [
+        (
+            "handover_without_target",
+            SERVICE._handover_yaml_template,
+            {
+                **header,
+                "source_gnb": gnb_values(),
+                "target_gnb": None,
+                "ue": ue_values(),
+            },
+        ),
+        (
+            "handover_without_gnbs",
+            SERVICE._handover_yaml_template,
+            {**header, "source_gnb": None, "target_gnb": None, "ue": ue_values()},
+        ),
+        (
+            "formation_without_ues",
+            SERVICE._formation_yaml_template,
+            {**header, "gnb": gnb_values(), "size": 0, "ues": []},
+        ),
+        (
+            "formation_single_ue",
+            SERVICE._formation_yaml_template,
+            {**header, "gnb": gnb_values(), "size": 1, "ues": [formation_ue(0)]},
+        ),
+        (
+            "formation_five_ues",
+            SERVICE._formation_yaml_template,
+            {
+                **header,
+                "gnb": gnb_values(),
+                "size": 5,
+                "ues": [formation_ue(i) for i in range(5)],
+            },
+        ),
+    ]
+
+
+def assert_render_matches_dump(template, values):
+    config = template.fill(values)
+    rendered = template.render(values)
+    assert rendered == dump_yaml(config)
+    assert rendered == yaml.dump(config, default_flow_style=False, allow_unicode=True)
+
+
+@pytest.mark.parametrize("scalar", ADVERSARIAL_SCALARS, ids=repr)
+def test_render_matches_dump_for_adversarial_scalars(scalar):
+    for _, template, values in template_cases(scalar):
+        assert_render_matches_dump(template, values)
+
+
+@pytest.mark.parametrize(
+    "name, template, values",
+    structural_cases(),
+    ids=[case[0] for case in structural_cases()],
+)
+def test_render_matches_dump_for_structural_edge_cases(name, template, values):
+    assert_render_matches_dump(template, values)
+
+
+@pytest.mark.parametrize("scalar", ADVERSARIAL_STRINGS, ids=repr)
+def test_render_matches_dump_with_single_adversarial_field(scalar):
+    # 只替換單一欄位，確認插槽前後的固定片段不受影響
+    header = {"scenario": "leo_satellite_pass", "generation_time": "2025-01-01"}
+    for key in gnb_values():
+        gnb = {**gnb_values(), key: scalar}
+        assert_render_matches_dump(
+            SERVICE._yaml_template, {**header, "gnb": gnb, "ue": ue_values()}
+        )
+    for key in formation_ue(0):
+        ues = [formation_ue(0), {**formation_ue(1), key: scalar}]
+        assert_render_matches_dump(
+            SERVICE._formation_yaml_template,
+            {**header, "gnb": gnb_values(), "size": len(ues), "ues": ues},
+        )